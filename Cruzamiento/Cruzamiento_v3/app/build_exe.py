@@ -1,19 +1,112 @@
 import PyInstaller.__main__
+import hashlib
 import os
 import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
 
-def build():
-    print("Iniciando construccion de ejecutables...")
 
-    # Limpiar carpetas de build anteriores
+def _fast_rmtree(path):
+    """
+    Elimina un directorio completo delegando el recorrido a un proceso nativo
+    (rd /s /q en Windows, rm -rf en POSIX). Si falla, usa shutil.rmtree.
+    """
+    if os.name == 'nt':
+        cmd = ["cmd", "/c", "rd", "/s", "/q", path]
+    else:
+        cmd = ["rm", "-rf", path]
+
     try:
-        if os.path.exists("dist"):
-            shutil.rmtree("dist")
-        if os.path.exists("build"):
-            shutil.rmtree("build")
-    except Exception as e:
-        print(f"Advertencia: No se pudo limpiar carpeta dist/build completamente: {e}")
+        result = subprocess.run(cmd, check=False)
+        if result.returncode == 0 and not os.path.exists(path):
+            return
+    except OSError:
+        pass
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+# Entradas que determinan si hace falta reconstruir
+FINGERPRINT_DIRS = ("src", "assets", "models")
+FINGERPRINT_FILES = ("config_camera.json", "build_exe.py")
+FINGERPRINT_PATH = os.path.join("dist", ".build-fingerprint")
+APP_EXE_PATH = os.path.join("dist", "CruzamientoApp", "CruzamientoApp.exe")
 
+# Carpeta de UPX (https://upx.github.io); se puede sobrescribir con la variable UPX_DIR
+UPX_DIR = os.environ.get("UPX_DIR", "C:/tools/upx")
+# DLLs que se rompen al comprimirlas con UPX
+UPX_EXCLUDE = ("vcruntime140.dll", "python3*.dll", "qwindows.dll")
+
+
+def _size_options():
+    """
+    Opciones para reducir el tamaño del bundle: --strip si hay un 'strip'
+    (binutils) en el PATH y --upx-dir si UPX está instalado.
+    """
+    options = []
+    if shutil.which("strip"):
+        options.append('--strip')
+    if os.path.isdir(UPX_DIR):
+        options.append(f'--upx-dir={UPX_DIR}')
+        options.extend(f'--upx-exclude={dll}' for dll in UPX_EXCLUDE)
+    return options
+
+
+def _hash_tree(h, path):
+    """Agrega al hash la ruta, mtime y tamaño de cada archivo bajo path."""
+    try:
+        entries = sorted(os.scandir(path), key=lambda e: e.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name != "__pycache__":
+                _hash_tree(h, entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            st = entry.stat(follow_symlinks=False)
+            h.update(f"{entry.path}|{st.st_mtime_ns}|{st.st_size}\n".encode("utf-8"))
+
+
+def _compute_fingerprint():
+    """Huella de las entradas del build (archivos fuente + versión de Python)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(sys.version.encode("utf-8"))
+    for directory in FINGERPRINT_DIRS:
+        _hash_tree(h, directory)
+    for filename in FINGERPRINT_FILES:
+        try:
+            st = os.stat(filename)
+            h.update(f"{filename}|{st.st_mtime_ns}|{st.st_size}\n".encode("utf-8"))
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+def _is_up_to_date(fingerprint):
+    """True si el ejecutable existe y fue construido con la misma huella."""
+    if not os.path.exists(APP_EXE_PATH):
+        return False
+    try:
+        with open(FINGERPRINT_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+def _isolated_build_options(name):
+    """
+    workpath y caché de PyInstaller propios de cada construcción: corren en
+    paralelo y --clean borra la caché compartida que la otra está usando.
+    """
+    workpath = os.path.join("build", name)
+    # configure.get_config() lee PYINSTALLER_CONFIG_DIR en cada run() (proceso propio)
+    os.environ["PYINSTALLER_CONFIG_DIR"] = os.path.abspath(os.path.join(workpath, "cache"))
+    return [f'--workpath={workpath}']
+
+
+def _build_app():
+    """Construye la App Principal (CruzamientoApp)."""
     # Definir separador de ruta para add-data (; para Windows, : para Unix)
     sep = ";" 
     
@@ -25,7 +118,6 @@ def build():
         f"models{sep}models",
     ]
 
-    # --- 1. Construir App Principal (CruzamientoApp) ---
     print("\nConstruyendo App Principal (CruzamientoApp)...")
     
     # Usamos src/main.py como punto de entrada para asegurar paths correctos
@@ -42,11 +134,25 @@ def build():
         '--hidden-import=opencv-python',
         # Asegurar que src esta en el path
         '--paths=src',
+        # Excluir módulos que la app no usa (menor tamaño y arranque más rápido).
+        # No excluir email/html/unittest: requests, torch y numpy los importan.
+        '--exclude-module=tkinter',
+        '--exclude-module=test',
+        '--exclude-module=pip',
+        '--exclude-module=http.server',
+        '--exclude-module=matplotlib.tests',
+        '--exclude-module=scipy.tests',
+        '--exclude-module=PIL.ImageQt',
+        # Reducir tamaño de binarios (solo si las herramientas están disponibles)
+        *_size_options(),
+        *_isolated_build_options("CruzamientoApp"),
         '--clean',
         '--noconfirm', # Overwrite output directory
     ])
 
-    # --- 2. Construir Monitor PLC (plc_monitor.py) ---
+
+def _build_monitor():
+    """Construye el Monitor PLC (plc_monitor.py)."""
     print("\nConstruyendo Monitor PLC...")
     
     PyInstaller.__main__.run([
@@ -54,10 +160,42 @@ def build():
         '--name=plc_monitor',
         '--console',  # Monitor NECESITA consola
         '--icon=assets/icono.ico',
+        *_isolated_build_options("plc_monitor"),
         '--clean',
         '--noconfirm',
     ])
 
+
+def build(force=False):
+    print("Iniciando construccion de ejecutables...")
+
+    # Saltar la construcción si nada cambió desde el último build
+    fingerprint = _compute_fingerprint()
+    if not force and _is_up_to_date(fingerprint):
+        print("Sin cambios desde la ultima construccion: ejecutables al dia.")
+        print(f"(Use --force para reconstruir) -> {os.path.abspath(os.path.dirname(APP_EXE_PATH))}")
+        return
+
+    # Limpiar carpetas de build anteriores
+    try:
+        if os.path.exists("dist"):
+            _fast_rmtree("dist")
+        if os.path.exists("build"):
+            _fast_rmtree("build")
+    except Exception as e:
+        print(f"Advertencia: No se pudo limpiar carpeta dist/build completamente: {e}")
+
+    # Ambas construcciones escriben en carpetas distintas (dist/CruzamientoApp y
+    # dist/plc_monitor), así que se ejecutan en paralelo. Se usan procesos y no
+    # threads porque PyInstaller mantiene estado global en PyInstaller.__main__.
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(_build_app), executor.submit(_build_monitor)]
+        wait(futures)
+
+    # Propagar cualquier error de las construcciones
+    for future in futures:
+        future.result()
+
     print("\nConstruccion completada.")
     print("Organizando salida...")
     
@@ -69,12 +207,26 @@ def build():
     dest_dir = os.path.join("dist", "CruzamientoApp")
     
     if os.path.exists(source_monitor):
-        shutil.copy(source_monitor, dest_dir)
+        dest_monitor = os.path.join(dest_dir, "plc_monitor.exe")
+        if os.path.exists(dest_monitor):
+            os.remove(dest_monitor)
+        # Hardlink (sin copiar bytes) si ambos están en el mismo volumen
+        try:
+            os.link(source_monitor, dest_monitor)
+        except OSError:
+            shutil.copyfile(source_monitor, dest_monitor)
         print(f"   Copiado plc_monitor.exe a {dest_dir}")
     else:
         print("Advertencia: No se encontro plc_monitor.exe para mover.")
 
+    # Guardar huella para builds incrementales
+    try:
+        with open(FINGERPRINT_PATH, "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar la huella del build: {e}")
+
     print(f"\nListo! La aplicacion portable esta en: {os.path.abspath(dest_dir)}")
 
 if __name__ == "__main__":
-    build()
+    build(force="--force" in sys.argv)
@@ -6,24 +6,137 @@ del sistema incluyendo cámaras, modelo IA, ROI, medición y PLC.
 """
 
 import os
+import copy
+import stat
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field, fields
+from pathlib import Path
 from typing import ClassVar
 import sys
 
+# orjson es opcional: si no está instalado se usa el módulo json estándar
+try:
+    import orjson
+
+    def _json_loads(raw):
+        return orjson.loads(raw)
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+except ImportError:
+    def _json_loads(raw):
+        return json.loads(raw)
+
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+
+# ijson es opcional: permite leer un solo campo sin decodificar todo el archivo
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Centralizar el archivo de configuración en la carpeta del proyecto
-# Detectar si estamos corriendo compilado (frozen) o como script
-if getattr(sys, 'frozen', False):
-    # Si es un ejecutable (PyInstaller), el archivo está junto al .exe
-    base_dir = os.path.dirname(sys.executable)
-else:
-    # Si es script, estamos en src/config.py, así que subimos un nivel a app/
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Detectar si estamos corriendo compilado (frozen) o como script:
+# - Ejecutable (PyInstaller): el archivo está junto al .exe
+# - Script: estamos en src/config.py, así que subimos un nivel a app/
+_BASE_DIR = (
+    Path(sys.executable).parent if getattr(sys, 'frozen', False)
+    else Path(__file__).resolve().parent.parent
+)
+base_dir = str(_BASE_DIR)
+
+CONFIG_FILE = str(_BASE_DIR / "config_camera.json")
+
+# Cache de configuraciones cargadas, indexado por (ruta, mtime) del archivo
+_LOAD_CACHE: dict = {}
+
+# Nombres de clase que representan una pieza quebrada
+_BROKEN_CLASSES = frozenset({"quebrada", "pieza_quebrada", "broken"})
+
+# Valores por defecto para campos faltantes en archivos de configuración antiguos.
+# roi_scale_1/roi_scale_2 dependen de "roi_scale" y se resuelven en _apply_defaults.
+_CONFIG_DEFAULTS = {
+    # Cámaras
+    "cam2_ip": "192.168.1.65",
+    "cam1_tipo": "ip",
+    "cam2_tipo": "ip",
+    "cam1_webcam_idx": 0,
+    "cam2_webcam_idx": 1,
+    "cam1_archivo": "",
+    "cam2_archivo": "",
+    "cam1_target_fps": 15,
+    "cam2_target_fps": 15,
+    "cam1_prefer_substream": False,
+    "cam2_prefer_substream": False,
+
+    # ROI
+    "roi_offset_x_1": 0.0,
+    "roi_offset_x_2": 0.0,
+    "roi_points_cam1": [],
+
+    # PLC - Direcciones ordenadas
+    "plc_reg_addr_1": 22001,    # Cruzamiento
+    "plc_reg_addr_2": 22002,    # CruzyMnt
+    "plc_reg_addr_3": 22003,    # Montada
+    "plc_reg_addr_operador": 22004,    # Operador
+    "plc_reg_addr_pieza_quebrada": 22005,  # Pieza Quebrada
+    "plc_reg_addr_alaveo": 22006,      # Alaveo
 
-CONFIG_FILE = os.path.join(base_dir, "config_camera.json")
+    # PLC - Activación por clase (ordenadas por dirección PLC)
+    "plc_enable_cruzamiento": True,     # 22001
+    "plc_enable_cruzymnt": True,        # 22002
+    "plc_enable_montada": False,        # 22003
+    "plc_enable_operador": True,        # 22004
+    "alertar_pieza_quebrada": True,     # 22005
+    "plc_enable_alaveo": False,         # 22006
 
+    # Alertas
+    "operador_alert_enabled": True,
+    "operador_alert_color": "#FF0000",
+    "operador_alert_blink": True,
 
-@dataclass
+    # Medición
+    "medicion_enabled": True,
+    "medicion_units": "mm",
+    "escala_px_por_mm_cam1": 1.0,
+    "escala_px_por_mm_cam2": 1.0,
+    "mostrar_medidas_overlay": True,
+    "log_mediciones": True,
+
+    # Piezas quebradas
+    "detectar_piezas_quebradas": True,
+    "largo_minimo_pieza_mm": 50.0,
+    "min_fragmentos_quebrada": 2,
+
+    # Umbral de detección para activar PLC
+    "umbral_movimiento": 5,
+
+    # Grabación automática
+    "auto_recording_enabled": False,
+    "auto_record_duration_s": 10.0,
+    "save_detection_images": True,
+
+    # ByteTrack (seguimiento persistente)
+    "tracking_frame_rate": 30,
+    "tracking_track_thresh": 0.3,
+    "tracking_high_thresh": 0.5,
+    "tracking_match_thresh": 0.7,
+    "tracking_track_buffer": 60,
+
+    # Tracking simple en ROI
+    "simple_tracking_enabled": True,
+    "simple_tracking_max_distance": 200.0,
+    "simple_tracking_max_missing": 5,
+    "simple_tracking_roi_only": True,
+    "simple_tracking_show_trajectory": False,
+    "simple_tracking_continuous": True,
+    "simple_tracking_transfer_timeout": 10,
+}
+
+
+@dataclass(slots=True)
 class CamConfig:
     """
     Configuración completa del sistema de detección.
@@ -62,9 +175,26 @@ class CamConfig:
     cam1_archivo: str = ""
     cam2_archivo: str = ""
     
+    # FPS objetivo de decodificación por cámara (los frames intermedios se descartan sin decodificar)
+    cam1_target_fps: int = 15
+    cam2_target_fps: int = 15
+    
+    # Cámaras IP: usar el sub-stream de menor resolución (canal x02, p.ej. 101 -> 102)
+    cam1_prefer_substream: bool = False
+    cam2_prefer_substream: bool = False
+    
     # === CONFIGURACIÓN DEL MODELO IA ===
     model_path: str = r"app/models/best_Cruzamiento_v3.pt"
     min_confidence: float = 0.70
+    imgsz: int = 640  # Tamaño de entrada del modelo
+    use_tensorrt: bool = False  # Exportar/usar engine TensorRT (requiere GPU NVIDIA + tensorrt)
+    precision: str = "fp16"  # Precisión del engine TensorRT: fp32 | fp16 | int8 (calibra con detecciones/)
+    use_openvino: bool = False  # Sin CUDA: exportar/usar modelo OpenVINO INT8 (requiere openvino, calibra con detecciones/)
+    gpu_preprocess: bool = False  # Letterbox y normalización del ROI en GPU (requiere CUDA)
+    # Reutilizar el resultado anterior si el ROI casi no cambió (miniatura 8x8 en gris).
+    # Umbral = suma de diferencias absolutas de los 64 píxeles; 0 desactiva (p.ej. 128)
+    frame_skip_threshold: int = 0
+    frame_skip_max_reuse: int = 5  # Máx. frames seguidos sin inferencia (piezas lentas)
 
     # === UMBRAL DE DETECCIÓN PARA ACTIVAR PLC ===
     umbral_movimiento: int = 5
@@ -76,7 +206,7 @@ class CamConfig:
     roi_scale_2: float = 0.40
     roi_offset_x_1: float = 0.0
     roi_offset_x_2: float = 0.0
-    roi_points_cam1: list = None  # Lista de puntos [x, y] para polígono arbitrario
+    roi_points_cam1: list = field(default_factory=list)  # Lista de puntos [x, y] para polígono arbitrario
     
     # === CONFIGURACIÓN PLC ===
     plc_enabled: bool = False
@@ -162,6 +292,41 @@ class CamConfig:
     simple_tracking_continuous: bool = True       # Tracking continuo cross-camera (cámara 1 → cámara 2)
     simple_tracking_transfer_timeout: int = 10    # Frames máximos para esperar transfer entre cámaras
 
+    # Cache interno de get_plc_config_for_class (no se carga ni se guarda en JSON)
+    _plc_class_cache: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    # Nombres de campos válidos (se calcula una sola vez en la primera carga)
+    _VALID_KEYS: ClassVar[frozenset] = None
+
+    # Clase de detección -> (atributo de habilitación, atributo de dirección PLC)
+    _PLC_CLASS_TABLE: ClassVar[dict] = {
+        "operador": ("plc_enable_operador", "plc_reg_addr_operador"),
+        "cruzymont": ("plc_enable_cruzymnt", "plc_reg_addr_2"),
+        "alaveo": ("plc_enable_alaveo", "plc_reg_addr_alaveo"),
+        "pieza": ("plc_enable_pieza", "plc_reg_addr_pieza"),
+        **{name: ("alertar_pieza_quebrada", "plc_reg_addr_pieza_quebrada")
+           for name in _BROKEN_CLASSES},
+    }
+    # Prefijos evaluados solo si no hay coincidencia exacta
+    _PLC_CLASS_PREFIXES: ClassVar[tuple] = (
+        ("cruz", ("plc_enable_cruzamiento", "plc_reg_addr_1")),
+        ("monta", ("plc_enable_montada", "plc_reg_addr_3")),
+    )
+
+    def _clone(self) -> 'CamConfig':
+        """
+        Devuelve una copia con caches internos independientes. Las listas y
+        diccionarios (p.ej. roi_points_cam1) se copian en profundidad para no
+        compartirlos con la instancia cacheada.
+        """
+        clone = copy.copy(self)
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, (list, dict)):
+                setattr(clone, f.name, copy.deepcopy(value))
+        clone._plc_class_cache = {}
+        return clone
+
     @classmethod
     def load(cls, path: str = CONFIG_FILE) -> 'CamConfig':
         """
@@ -174,18 +339,36 @@ class CamConfig:
             Instancia de CamConfig con la configuración cargada
         """
         try:
+            # Reutilizar la instancia cacheada si el archivo no cambió desde la última carga
+            try:
+                key = (path, os.path.getmtime(path))
+            except OSError:
+                key = None
+            cached = _LOAD_CACHE.get(key) if key else None
+            if cached is not None:
+                return cached._clone()
+
             with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+                data = _json_loads(f.read())
             
             # Valores por defecto para retrocompatibilidad
             cls._apply_defaults(data)
             
             # Filtrar llaves que no existen en el dataclass para evitar errores
-            from dataclasses import fields
-            valid_keys = {f.name for f in fields(cls)}
+            if cls._VALID_KEYS is None:
+                cls._VALID_KEYS = frozenset(f.name for f in fields(cls) if f.init)
+            valid_keys = cls._VALID_KEYS
             filtered_data = {k: v for k, v in data.items() if k in valid_keys}
             
-            return cls(**filtered_data)
+            # Instanciar con defaults y asignar directo a los slots (evita el
+            # paso de ~70 kwargs por el __init__ generado)
+            config = cls()
+            for k, v in filtered_data.items():
+                setattr(config, k, v)
+            if key:
+                _LOAD_CACHE[key] = config
+                return config._clone()
+            return config
         except Exception as e:
             print(f"⚠️ Error cargando configuración desde {path}: {e}")
             # print("📋 Usando configuración por defecto") # Removed to avoid confusion if we catch it earlier
@@ -193,88 +376,49 @@ class CamConfig:
             return cls()
 
     @classmethod
-    def _apply_defaults(cls, data: dict) -> None:
-        """Aplica valores por defecto para campos faltantes."""
-        defaults = {
-            # Cámaras
-            "cam2_ip": "192.168.1.65",
-            "cam1_tipo": "ip",
-            "cam2_tipo": "ip",
-            "cam1_webcam_idx": 0,
-            "cam2_webcam_idx": 1,
-            "cam1_archivo": "",
-            "cam2_archivo": "",
-            
-            # ROI
-            "roi_scale_1": data.get("roi_scale", 0.40),
-            "roi_scale_2": data.get("roi_scale", 0.40),
-            "roi_offset_x_1": 0.0,
-            "roi_offset_x_1": 0.0,
-            "roi_offset_x_2": 0.0,
-            "roi_points_cam1": [],
-            
-            # PLC - Direcciones ordenadas
-            "plc_reg_addr_1": 22001,    # Cruzamiento
-            "plc_reg_addr_2": 22002,    # CruzyMnt
-            "plc_reg_addr_3": 22003,    # Montada
-            "plc_reg_addr_operador": 22004,    # Operador
-            "plc_reg_addr_pieza_quebrada": 22005,  # Pieza Quebrada
-            "plc_reg_addr_alaveo": 22006,      # Alaveo
-            
-            # PLC - Activación por clase (ordenadas por dirección PLC)
-            "plc_enable_cruzamiento": True,     # 22001
-            "plc_enable_cruzymnt": True,        # 22002
-            "plc_enable_montada": False,        # 22003
-            "plc_enable_operador": True,        # 22004
-            "alertar_pieza_quebrada": True,     # 22005
-            "plc_enable_alaveo": False,         # 22006
-            
-            # Alertas
-            "operador_alert_enabled": True,
-            "operador_alert_color": "#FF0000",
-            "operador_alert_blink": True,
-            
-            # Medición
-            "medicion_enabled": True,
-            "medicion_units": "mm",
-            "escala_px_por_mm_cam1": 1.0,
-            "escala_px_por_mm_cam2": 1.0,
-            "mostrar_medidas_overlay": True,
-            "log_mediciones": True,
+    def load_field(cls, path: str, field_name: str):
+        """
+        Lee un único campo de primer nivel del archivo de configuración.
+        
+        Con ijson instalado el archivo se parsea en streaming y la lectura se
+        detiene al encontrar el campo; si no, se decodifica el JSON completo.
+        
+        Args:
+            path: Ruta del archivo de configuración
+            field_name: Nombre del campo a leer
             
-            # Piezas quebradas
-            "detectar_piezas_quebradas": True,
-            "largo_minimo_pieza_mm": 50.0,
-            "min_fragmentos_quebrada": 2,
+        Returns:
+            Valor del campo, o el valor por defecto de CamConfig si no existe
+        """
+        missing = object()
+        value = missing
+        try:
+            if IJSON_AVAILABLE:
+                with open(path, "rb") as f:
+                    value = next(ijson.items(f, field_name, use_float=True), missing)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = _json_loads(f.read()).get(field_name, missing)
+        except Exception as e:
+            print(f"⚠️ Error leyendo '{field_name}' desde {path}: {e}")
 
-            # Umbral de detección para activar PLC
-            "umbral_movimiento": 5,
-            
-            # Grabación automática
-            "auto_recording_enabled": False,
-            "auto_record_duration_s": 10.0,
-            "save_detection_images": True,
-            
-            # ByteTrack (seguimiento persistente)
-            "tracking_frame_rate": 30,
-            "tracking_track_thresh": 0.3,
-            "tracking_high_thresh": 0.5,
-            "tracking_match_thresh": 0.7,
-            "tracking_track_buffer": 60,
-            
-            # Tracking simple en ROI
-            "simple_tracking_enabled": True,
-            "simple_tracking_max_distance": 200.0,
-            "simple_tracking_max_missing": 5,
-            "simple_tracking_roi_only": True,
-            "simple_tracking_show_trajectory": False,
-            "simple_tracking_continuous": True,
-            "simple_tracking_transfer_timeout": 10,
-        }
-        
-        for key, default_value in defaults.items():
+        if value is missing:
+            value = getattr(cls(), field_name, None)
+        return value
+
+    @classmethod
+    def _apply_defaults(cls, data: dict) -> None:
+        """Aplica valores por defecto para campos faltantes."""
+        for key, default_value in _CONFIG_DEFAULTS.items():
+            # Copiar listas para no compartir el mismo objeto entre cargas
+            if isinstance(default_value, list):
+                default_value = list(default_value)
             data.setdefault(key, default_value)
 
+        # ROI: por defecto hereda la escala legacy "roi_scale"
+        data.setdefault("roi_scale_1", data.get("roi_scale", 0.40))
+        data.setdefault("roi_scale_2", data.get("roi_scale", 0.40))
+
     def save(self, path: str = CONFIG_FILE) -> None:
         """
         Guarda la configuración en un archivo JSON.
@@ -282,9 +426,14 @@ class CamConfig:
         Args:
             path: Ruta donde guardar el archivo de configuración
         """
+        # El mtime puede no cambiar (resolución del sistema de archivos)
+        for key in [k for k in _LOAD_CACHE if k[0] == path]:
+            del _LOAD_CACHE[key]
         try:
             with open(path, "w", encoding="utf-8") as f:
-                json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+                data = asdict(self)
+                data.pop("_plc_class_cache", None)
+                f.write(_json_dumps(data))
             print(f"✅ Configuración guardada en: {path}")
         except Exception as e:
             print(f"❌ Error guardando configuración en {path}: {e}")
@@ -301,38 +450,8 @@ class CamConfig:
             - tipo: "ip", "webcam", "archivo"
             - configuración: dict con los parámetros específicos
         """
-        if cam_id == 1:
-            tipo = self.cam1_tipo
-            if tipo == "ip":
-                config = {
-                    "ip": self.cam_ip,
-                    "user": self.cam_user,
-                    "pass": self.cam_pass,
-                    "port": self.http_port,
-                    "rtsp_port": self.cam_port,
-                    "channel": self.channel
-                }
-            elif tipo == "webcam":
-                config = {"index": self.cam1_webcam_idx}
-            else:  # archivo
-                config = {"path": self.cam1_archivo}
-        else:  # cam_id == 2
-            tipo = self.cam2_tipo
-            if tipo == "ip":
-                config = {
-                    "ip": self.cam2_ip,
-                    "user": self.cam_user,
-                    "pass": self.cam_pass,
-                    "port": self.http_port,
-                    "rtsp_port": self.cam_port,
-                    "channel": self.channel
-                }
-            elif tipo == "webcam":
-                config = {"index": self.cam2_webcam_idx}
-            else:  # archivo
-                config = {"path": self.cam2_archivo}
-                
-        return tipo, config
+        config = self.get_camera_config(cam_id)
+        return config['tipo'], config
 
     def get_roi_config(self, cam_id: int) -> dict:
         """
@@ -363,41 +482,36 @@ class CamConfig:
             cam_id: ID de la cámara (1 o 2)
             
         Returns:
-            Dict con toda la configuración de la cámara
+            Dict con toda la configuración de la cámara. Para cámaras IP incluye
+            tanto las llaves de los lectores (user/pass/port) como sus alias
+            (usuario/password/puerto).
         """
-        tipo, config = self.get_camera_source(cam_id)
-        
-        # Agregar información adicional según el tipo
+        tipo = self.cam1_tipo if cam_id == 1 else self.cam2_tipo
+
         if tipo == "ip":
-            if cam_id == 1:
-                config.update({
-                    'tipo': 'ip',
-                    'ip': self.cam_ip,
-                    'puerto': self.http_port,
-                    'usuario': self.cam_user,
-                    'password': self.cam_pass,
-                    'channel': self.channel
-                })
-            else:
-                config.update({
-                    'tipo': 'ip', 
-                    'ip': self.cam2_ip,
-                    'puerto': self.http_port,
-                    'usuario': self.cam_user,
-                    'password': self.cam_pass,
-                    'channel': self.channel
-                })
+            return {
+                'tipo': 'ip',
+                'ip': self.cam_ip if cam_id == 1 else self.cam2_ip,
+                'user': self.cam_user,
+                'pass': self.cam_pass,
+                'port': self.http_port,
+                'rtsp_port': self.cam_port,
+                'channel': self.channel,
+                'prefer_substream': self.cam1_prefer_substream if cam_id == 1 else self.cam2_prefer_substream,
+                'puerto': self.http_port,
+                'usuario': self.cam_user,
+                'password': self.cam_pass
+            }
         elif tipo == "webcam":
-            config.update({
+            return {
                 'tipo': 'webcam',
-                'index': config.get('index', 0)
-            })
-        elif tipo == "archivo":
-            config.update({
-                'tipo': 'archivo'
-            })
-        
-        return config
+                'index': self.cam1_webcam_idx if cam_id == 1 else self.cam2_webcam_idx
+            }
+        else:  # archivo
+            return {
+                'tipo': tipo,
+                'path': self.cam1_archivo if cam_id == 1 else self.cam2_archivo
+            }
 
     def get_plc_config_for_class(self, class_name: str) -> dict:
         """
@@ -409,6 +523,11 @@ class CamConfig:
         Returns:
             Dict con enabled, address y otros parámetros
         """
+        cached = self._plc_class_cache.get(class_name)
+        if cached is not None:
+            return dict(cached)
+
+        raw_name = class_name
         class_name = class_name.lower().strip()
         
         config = {
@@ -419,43 +538,23 @@ class CamConfig:
             "cooldown_s": self.plc_cooldown_s
         }
         
-        if class_name == "operador":
-            config.update({
-                "enabled": self.plc_enable_operador,
-                "address": self.plc_reg_addr_operador
-            })
-        elif class_name == "cruzymont":
-            config.update({
-                "enabled": self.plc_enable_cruzymnt,
-                "address": self.plc_reg_addr_2
-            })
-        elif class_name.startswith("cruz"):  # cruzamiento, cruzamiento_xxx, etc.
-            config.update({
-                "enabled": self.plc_enable_cruzamiento,
-                "address": self.plc_reg_addr_1
-            })
-        elif class_name.startswith("monta"):  # montacargas, montada, etc.
-            config.update({
-                "enabled": self.plc_enable_montada,
-                "address": self.plc_reg_addr_3
-            })
-        elif class_name == "alaveo":
-            config.update({
-                "enabled": self.plc_enable_alaveo,
-                "address": self.plc_reg_addr_alaveo
-            })
-        elif class_name in ["quebrada", "pieza_quebrada", "broken"]:
-            config.update({
-                "enabled": self.alertar_pieza_quebrada,
-                "address": self.plc_reg_addr_pieza_quebrada
-            })
-        elif class_name == "pieza":
+        entry = self._PLC_CLASS_TABLE.get(class_name)
+        if entry is None:
+            # Prefijos: cruzamiento, cruzamiento_xxx, montacargas, montada, etc.
+            for prefix, prefix_entry in self._PLC_CLASS_PREFIXES:
+                if class_name.startswith(prefix):
+                    entry = prefix_entry
+                    break
+
+        if entry is not None:
+            enable_attr, addr_attr = entry
             config.update({
-                "enabled": self.plc_enable_pieza,
-                "address": self.plc_reg_addr_pieza
+                "enabled": getattr(self, enable_attr),
+                "address": getattr(self, addr_attr)
             })
             
-        return config
+        self._plc_class_cache[raw_name] = config
+        return dict(config)
 
     def validate(self) -> list:
         """
@@ -465,6 +564,15 @@ class CamConfig:
             Lista de strings con errores encontrados (vacía si no hay errores)
         """
         errors = []
+
+        def _is_file(p: str) -> bool:
+            # Un solo stat por ruta; rutas vacías no tocan el disco
+            if not p:
+                return False
+            try:
+                return stat.S_ISREG(os.stat(p).st_mode)
+            except (OSError, ValueError):
+                return False
         
         # Validar IPs
         if self.cam1_tipo == "ip" and not self.cam_ip:
@@ -473,13 +581,13 @@ class CamConfig:
             errors.append("IP de cámara 2 es requerida")
             
         # Validar archivos
-        if self.cam1_tipo == "archivo" and not os.path.isfile(self.cam1_archivo):
+        if self.cam1_tipo == "archivo" and not _is_file(self.cam1_archivo):
             errors.append(f"Archivo de cámara 1 no existe: {self.cam1_archivo}")
-        if self.cam2_tipo == "archivo" and not os.path.isfile(self.cam2_archivo):
+        if self.cam2_tipo == "archivo" and not _is_file(self.cam2_archivo):
             errors.append(f"Archivo de cámara 2 no existe: {self.cam2_archivo}")
             
         # Validar modelo
-        if not os.path.isfile(self.model_path):
+        if not _is_file(self.model_path):
             errors.append(f"Archivo de modelo no existe: {self.model_path}")
             
         # Validar rangos
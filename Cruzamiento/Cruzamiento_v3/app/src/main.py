@@ -1,15 +1,15 @@
 
 import sys
-import os
+from pathlib import Path
 
 # Add the project root to sys.path to ensure absolute imports work correctly
 # This is useful when running the script directly from the src directory or other contexts
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
+project_root = str(Path(__file__).resolve().parent.parent)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from src.ui.oper_window import run_app
-
 if __name__ == "__main__":
+    # Import diferido: la UI arrastra PySide6, OpenCV, torch y ultralytics,
+    # así que solo se carga cuando realmente se va a lanzar la aplicación
+    from src.ui.oper_window import run_app
     run_app()
@@ -11,15 +11,121 @@ Incluye threading para captura asíncrona y manejo de errores robusto.
 
 import os
 import time
+import logging
 import threading
-from typing import Optional, Tuple, Dict, Any
+from collections import deque
+from dataclasses import dataclass, field
+from urllib.parse import quote
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, Dict, Any, List
 import cv2
 import numpy as np
 import requests
-from requests.auth import HTTPBasicAuth, HTTPDigestAuth
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPDigestAuth
 
 from src.utils.utils import validar_ip, validar_puerto, validar_archivo_video
 
+# PyTurboJPEG es opcional: decodificación JPEG con SIMD (libjpeg-turbo)
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# PyAV es opcional: demux/decodificación del stream MJPEG HTTP en FFmpeg (C)
+try:
+    import av
+    PYAV_AVAILABLE = True
+except ImportError:
+    PYAV_AVAILABLE = False
+
+log = logging.getLogger("CameraHandler")
+
+# Opciones de FFmpeg para RTSP: TCP, análisis de stream corto para evitar la
+# espera de varios segundos de avformat_find_stream_info al conectar, timeout
+# de socket (stimeout, en µs) y demora máxima de reordenamiento
+FFMPEG_CAPTURE_OPTIONS = (
+    "rtsp_transport;tcp|analyzeduration;500000|probesize;500000"
+    "|stimeout;2000000|max_delay;500000"
+)
+
+# Timeouts de apertura/lectura de VideoCapture (ms): un stream detenido no
+# bloquea el thread lector indefinidamente
+CAPTURE_OPEN_TIMEOUT_MS = 5000
+CAPTURE_READ_TIMEOUT_MS = 2000
+
+# Cantidad de cámaras gestionadas (cam_id va de 1 a NUM_CAMERAS)
+NUM_CAMERAS = 2
+
+
+@dataclass
+class CamSlot:
+    """Estado de captura de una cámara."""
+    # Último frame publicado: slot de un elemento con (frame, timestamp, seq).
+    # Un único productor (thread lector) y lectores que solo toman la
+    # referencia; asignar/leer un elemento de lista es atómico bajo el GIL,
+    # así que no se necesitan locks.
+    frame_slot: list = field(default_factory=lambda: [None])
+    # Número de secuencia del último frame publicado (solo lo escribe el productor)
+    seq: int = 0
+    # Captura OpenCV activa (webcam/archivo)
+    cap: Optional[cv2.VideoCapture] = None
+    # Sesión HTTP (keep-alive / pool de conexiones)
+    session: Optional[requests.Session] = None
+    thread: Optional[threading.Thread] = None
+    # Decodificación en el pool: a lo sumo una tarea en curso y un JPEG
+    # pendiente (deque de 1 elemento: el más nuevo reemplaza al anterior)
+    decode_future: Optional[Future] = None
+    pending_jpeg: deque = field(default_factory=lambda: deque(maxlen=1))
+    # Posición hasta la que ya se buscó el EOI en el buffer MJPEG
+    scan_offset: int = 0
+    # URLs HTTP ({'mjpeg': [...], 'snapshot': [...]}), construidas una vez por cámara
+    urls: Optional[Dict[str, List[str]]] = None
+    # Forzar sub-stream (lo activa optimize_for_hikvision)
+    substream_override: bool = False
+
+
+def _stream_channel(config: dict, force_substream: bool = False) -> str:
+    """
+    Canal Hikvision a usar para una cámara IP. Con prefer_substream (o
+    force_substream) se pasa del stream principal al sub-stream del mismo
+    canal (101 -> 102, 201 -> 202), que llega a menor resolución y reduce el
+    costo de decodificación.
+    """
+    channel = str(config['channel'])
+    if not (force_substream or config.get('prefer_substream')):
+        return channel
+    try:
+        return str(int(channel) // 100 * 100 + 2)
+    except ValueError:
+        return channel
+
+
+def _open_ffmpeg_capture(source: str) -> cv2.VideoCapture:
+    """
+    Abre una captura FFmpeg pidiendo decodificación por hardware
+    (D3D11/VA-API/CUDA según la plataforma). Si OpenCV no lo soporta o la
+    apertura falla, reabre con decodificación por software. En ambos casos
+    se aplican timeouts de apertura y lectura (deben pasarse al abrir).
+    """
+    params = []
+    if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+        params += [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, CAPTURE_OPEN_TIMEOUT_MS,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, CAPTURE_READ_TIMEOUT_MS,
+        ]
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        # Con VIDEO_ACCELERATION_ANY no se fija CAP_PROP_HW_DEVICE:
+        # FFmpeg rechaza la combinación y no abre el stream
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, params + [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG, params)
+
 
 class CameraHandler:
     """
@@ -37,23 +143,34 @@ class CameraHandler:
         
         # Control de threads
         self.reader_running = False
-        self.reader_threads: Dict[int, threading.Thread] = {}
+        # Se activa en stop_cameras: corta al instante las esperas de los loops
+        self._stop_event = threading.Event()
         
-        # Frames actuales por cámara
-        self.last_frame1: Optional[np.ndarray] = None
-        self.last_frame2: Optional[np.ndarray] = None
+        # Estado por cámara: cams[cam_id - 1]
+        self.cams: List[CamSlot] = [CamSlot() for _ in range(NUM_CAMERAS)]
         
-        # Locks para acceso thread-safe
-        self.last_lock1 = threading.Lock()
-        self.last_lock2 = threading.Lock()
+        # Pool compartido para decodificar JPEG fuera de los threads lectores
+        self._decode_pool: Optional[ThreadPoolExecutor] = None
         
-        # Objetos de captura para webcam y archivos
-        self.cap1: Optional[cv2.VideoCapture] = None
-        self.cap2: Optional[cv2.VideoCapture] = None
+        # Modo de latencia (ver set_low_latency_mode)
+        self.low_latency_mode = False
+        self.target_fps = 15
+        self.max_frame_age = 0.5  # segundos; get_frames_optimized descarta frames más viejos
+        
+        # Decodificador libjpeg-turbo (None si no está instalado o falta la DLL)
+        self._tj = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self._tj = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️ TurboJPEG no disponible, usando cv2.imdecode: {e}")
         
         # Callbacks para estado
         self.status_callback = None
         
+        # Último instante y repeticiones omitidas por clave de _throttled_log
+        self._log_state: Dict[str, Tuple[float, int]] = {}
+        
     def set_status_callback(self, callback):
         """
         Establece callback para actualizaciones de estado.
@@ -70,9 +187,29 @@ class CameraHandler:
         else:
             print(f"📹 C{cam_id}: {message}")
     
+    def _cam(self, cam_id: int) -> CamSlot:
+        """Estado de la cámara cam_id (1..NUM_CAMERAS)."""
+        return self.cams[cam_id - 1]
+    
+    def _throttled_log(self, key: str, msg: str, level: int = logging.WARNING,
+                       min_interval: float = 1.0):
+        """
+        Registra un mensaje como máximo una vez por min_interval segundos por
+        clave. Evita que un stream degradado sature stdout desde los loops.
+        """
+        now = time.monotonic()
+        last, skipped = self._log_state.get(key, (0.0, 0))
+        if now - last < min_interval:
+            self._log_state[key] = (last, skipped + 1)
+            return
+        if skipped:
+            msg = f"{msg} (+{skipped} similares omitidos)"
+        self._log_state[key] = (now, 0)
+        log.log(level, msg)
+    
     def start_cameras(self) -> bool:
         """
-        Inicia la captura de ambas cámaras.
+        Inicia la captura de todas las cámaras.
         
         Returns:
             True si al menos una cámara se inició correctamente
@@ -82,12 +219,18 @@ class CameraHandler:
             return True
         
         self.reader_running = True
+        self._stop_event.clear()
+        
+        # Threads y no procesos: cv2.imdecode y TurboJPEG liberan el GIL durante
+        # la decodificación, así que las cámaras ya decodifican en paralelo sin
+        # copiar frames entre procesos
+        if self._decode_pool is None:
+            self._decode_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='jpeg')
         
         # Iniciar threads para cada cámara
-        success1 = self._start_camera_thread(1)
-        success2 = self._start_camera_thread(2)
+        started = [self._start_camera_thread(cam_id) for cam_id in range(1, len(self.cams) + 1)]
         
-        if success1 or success2:
+        if any(started):
             self._update_status(0, "🔄 Conectando cámaras...")
             return True
         else:
@@ -98,49 +241,52 @@ class CameraHandler:
     def stop_cameras(self):
         """Detiene la captura de todas las cámaras."""
         self.reader_running = False
+        self._stop_event.set()
         
         # Esperar que terminen los threads
-        for cam_id, thread in self.reader_threads.items():
-            if thread and thread.is_alive():
-                thread.join(timeout=2.0)
+        for cam_id, cam in enumerate(self.cams, start=1):
+            if cam.thread and cam.thread.is_alive():
+                cam.thread.join(timeout=2.0)
                 self._update_status(cam_id, "🔴 Thread detenido")
+            cam.thread = None
         
-        self.reader_threads.clear()
-        
-        # Limpiar frames
-        with self.last_lock1:
-            self.last_frame1 = None
-        with self.last_lock2:
-            self.last_frame2 = None
+        # Detener el pool de decodificación
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=True, cancel_futures=True)
+            self._decode_pool = None
         
-        # Liberar recursos de captura
-        if self.cap1:
-            self.cap1.release()
-            self.cap1 = None
-        if self.cap2:
-            self.cap2.release()
-            self.cap2 = None
+        for cam in self.cams:
+            # Cerrar sesión HTTP
+            if cam.session is not None:
+                try:
+                    cam.session.close()
+                except Exception:
+                    pass
+                cam.session = None
+            
+            # Descartar JPEGs pendientes y limpiar frames
+            cam.decode_future = None
+            cam.pending_jpeg.clear()
+            cam.frame_slot[0] = None
+            
+            # Liberar recursos de captura
+            if cam.cap:
+                cam.cap.release()
+                cam.cap = None
             
         self._update_status(0, "🔴 Cámaras detenidas")
     
-    def get_frames(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    def get_frames(self) -> Tuple[Optional[np.ndarray], ...]:
         """
-        Obtiene los frames actuales de ambas cámaras.
+        Obtiene los frames actuales de todas las cámaras.
         
         Returns:
-            Tupla (frame1, frame2) con copias de los frames actuales
+            Tupla (frame1, frame2) con los frames actuales. Los arrays son de
+            solo lectura (compartidos con otros consumidores); quien necesite
+            modificarlos debe llamar a .copy()
         """
-        frame1 = frame2 = None
-        
-        with self.last_lock1:
-            if self.last_frame1 is not None:
-                frame1 = self.last_frame1.copy()
-                
-        with self.last_lock2:
-            if self.last_frame2 is not None:
-                frame2 = self.last_frame2.copy()
-        
-        return frame1, frame2
+        return tuple(entry[0] if entry is not None else None
+                     for entry in (cam.frame_slot[0] for cam in self.cams))
     
     def get_frame(self, cam_id: int) -> Optional[np.ndarray]:
         """
@@ -150,16 +296,32 @@ class CameraHandler:
             cam_id: ID de la cámara (1 o 2)
             
         Returns:
-            Copia del frame actual o None si no disponible
-        """
-        if cam_id == 1:
-            with self.last_lock1:
-                return self.last_frame1.copy() if self.last_frame1 is not None else None
-        elif cam_id == 2:
-            with self.last_lock2:
-                return self.last_frame2.copy() if self.last_frame2 is not None else None
-        else:
+            Frame actual (solo lectura, usar .copy() para modificarlo) o None
+            si no disponible
+        """
+        if 1 <= cam_id <= len(self.cams):
+            entry = self._cam(cam_id).frame_slot[0]
+            return entry[0] if entry is not None else None
+        return None
+    
+    def get_frame_if_new(self, cam_id: int, last_seq: int) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Obtiene el frame actual solo si es más nuevo que el último procesado.
+        
+        Args:
+            cam_id: ID de la cámara (1 o 2)
+            last_seq: Número de secuencia del último frame que procesó el llamador
+            
+        Returns:
+            Tupla (frame, seq) si hay un frame nuevo (solo lectura), o None si
+            la cámara no publicó nada desde last_seq
+        """
+        if not 1 <= cam_id <= len(self.cams):
             return None
+        entry = self._cam(cam_id).frame_slot[0]
+        if entry is None or entry[2] == last_seq:
+            return None
+        return entry[0], entry[2]
     
     def is_running(self) -> bool:
         """
@@ -181,13 +343,13 @@ class CameraHandler:
             Dict con información de la cámara
         """
         tipo, config = self.config.get_camera_source(cam_id)
+        thread = self._cam(cam_id).thread
         
         info = {
             'id': cam_id,
             'type': tipo,
             'config': config,
-            'active': cam_id in self.reader_threads and 
-                     self.reader_threads[cam_id].is_alive() if self.reader_threads else False,
+            'active': thread is not None and thread.is_alive(),
             'has_frame': self.get_frame(cam_id) is not None
         }
         
@@ -207,7 +369,7 @@ class CameraHandler:
         # Obtener tipo de conexión desde la configuración
         conexion = getattr(self.config, f"cam{cam_id}_conexion", "http")
 
-        print(f"[DEBUG] Cámara {cam_id}: tipo={tipo}, conexion={conexion}")
+        log.debug(f"Cámara {cam_id}: tipo={tipo}, conexion={conexion}")
 
         if tipo in ["none", "disabled", ""]:
             return False
@@ -216,6 +378,10 @@ class CameraHandler:
             if tipo == "ip":
                 if not self._validate_ip_config(config):
                     return False
+                # Sesión compartida por todas las peticiones HTTP de esta cámara
+                # (también la usa el fallback RTSP -> HTTP)
+                self._cam(cam_id).session = self._create_session(config)
+                self._cam(cam_id).urls = self._build_http_urls(cam_id, config)
                 if conexion.lower() == "rtsp":
                     thread = threading.Thread(
                         target=self._reader_loop_rtsp,
@@ -224,7 +390,7 @@ class CameraHandler:
                     )
                 else:
                     thread = threading.Thread(
-                        target=self._reader_loop_http,
+                        target=self._reader_loop_http_pyav if PYAV_AVAILABLE else self._reader_loop_http,
                         args=(cam_id, config),
                         daemon=True
                     )
@@ -248,7 +414,7 @@ class CameraHandler:
                 self._update_status(cam_id, f"❌ Tipo de cámara no soportado: {tipo}")
                 return False
             
-            self.reader_threads[cam_id] = thread
+            self._cam(cam_id).thread = thread
             thread.start()
             self._update_status(cam_id, f"🚀 Thread {tipo} iniciado")
             return True
@@ -260,6 +426,7 @@ class CameraHandler:
     
     def _reader_loop_rtsp(self, cam_id: int, config: dict):
         """Loop de captura para cámaras IP vía RTSP (TCP)."""
+        self._pin_reader_thread(cam_id)
         ip = config['ip']
         user = config['user']
         password = config['pass']
@@ -267,7 +434,7 @@ class CameraHandler:
         port = config.get('rtsp_port', 554)
         if port == 80: port = 554 # Corrección de seguridad si viene mal configurado
         
-        channel = config['channel']
+        channel = _stream_channel(config, self._cam(cam_id).substream_override)
         
         # Construir URL RTSP
         rtsp_url = f"rtsp://{user}:{password}@{ip}:{port}/Streaming/Channels/{channel}"
@@ -276,65 +443,158 @@ class CameraHandler:
         max_delay = 10.0
         fail_count = 0
         max_fails = 5 # Si falla 5 veces seguidas, caer a HTTP
+        frame_interval = 1.0 / self._get_target_fps(cam_id)
         
         self._update_status(cam_id, f"🔄 Conectando RTSP ({ip}:{port})...")
-        print(f"[DEBUG] RTSP URL: rtsp://{user}:***@{ip}:{port}/Streaming/Channels/{channel}")
+        log.debug(f"RTSP URL: rtsp://{user}:***@{ip}:{port}/Streaming/Channels/{channel}")
         
         while self.reader_running:
             try:
                 # Si fallamos demasiadas veces, intentar fallback a HTTP
                 if fail_count >= max_fails:
                     self._update_status(cam_id, "⚠️ RTSP inestable, cambiando a HTTP/Snapshot...")
-                    print(f"⚠️ Fallback activado para Cam {cam_id}")
+                    log.warning(f"⚠️ Fallback activado para Cam {cam_id}")
                     self._reader_loop_http(cam_id, config)
                     return # Salir del loop RTSP si entramos a HTTP
                 
-                # Forzar TCP para estabilidad
-                if os.name == 'nt':
-                     os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "rtsp_transport;tcp"
+                # Forzar TCP para estabilidad (debe fijarse antes de abrir)
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = FFMPEG_CAPTURE_OPTIONS
                 
-                cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+                cap = _open_ffmpeg_capture(rtsp_url)
                 
                 if not cap.isOpened():
                     self._update_status(cam_id, "❌ Error abriendo RTSP")
                     fail_count += 1
-                    time.sleep(reconnect_delay)
+                    if self._stop_event.wait(reconnect_delay):
+                        break
                     reconnect_delay = min(reconnect_delay * 2, max_delay)
                     continue
                 
                 self._update_status(cam_id, "🚀 RTSP Conectado (TCP)")
+                log.info(f"RTSP C{cam_id}: canal {channel}, "
+                         f"{int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
                 fail_count = 0 # Reset contador
                 reconnect_delay = 1.0
                 
                 # Intentar setear buffer bajo
                 cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
                 
+                # grab() continuo mantiene el buffer drenado; solo se decodifica
+                # (retrieve) a la tasa objetivo
+                last_retrieve = 0.0
                 while self.reader_running and cap.isOpened():
-                    ret, frame = cap.read()
+                    if not cap.grab():
+                        self._throttled_log(f"rtsp{cam_id}", f"⚠️ RTSP C{cam_id}: Frame perdido")
+                        break
+                    
+                    now = time.monotonic()
+                    if now - last_retrieve < frame_interval:
+                        continue
                     
+                    ret, frame = cap.retrieve()
                     if ret and frame is not None:
-                        if cam_id == 1:
-                            with self.last_lock1:
-                                self.last_frame1 = frame
-                        else:
-                            with self.last_lock2:
-                                self.last_frame2 = frame
+                        last_retrieve = now
+                        self._publish_frame(cam_id, frame)
                         fail_count = 0 # Éxito continuo
                     else:
-                        print(f"⚠️ RTSP C{cam_id}: Frame perdido")
+                        self._throttled_log(f"rtsp{cam_id}", f"⚠️ RTSP C{cam_id}: Frame perdido")
                         break
                 
                 cap.release()
                 if self.reader_running:
                     self._update_status(cam_id, "🔄 Reconectando RTSP...")
                     fail_count += 1
-                    time.sleep(1.0)
+                    if self._stop_event.wait(1.0):
+                        break
                     
             except Exception as e:
                 self._update_status(cam_id, f"❌ Error RTSP: {e}")
-                time.sleep(reconnect_delay)
+                if self._stop_event.wait(reconnect_delay):
+                    break
                 fail_count += 1
 
+    def _pin_reader_thread(self, cam_id: int):
+        """
+        En modo baja latencia (solo Linux), fija el thread lector actual a un
+        núcleo propio y le sube la prioridad. Los núcleos 0 y el último quedan
+        libres para la GUI y el detector. En otros sistemas no hace nada.
+        """
+        if not self.low_latency_mode or not hasattr(os, 'sched_setaffinity'):
+            return
+        cpu_count = os.cpu_count() or 1
+        if cpu_count < 4:
+            return
+        core = 1 + (cam_id - 1) % (cpu_count - 2)
+        try:
+            # pid 0 = thread que llama (en Linux la afinidad es por thread)
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            log.debug(f"No se pudo fijar afinidad C{cam_id}: {e}")
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), -5)
+        except OSError as e:
+            # Requiere privilegios (CAP_SYS_NICE)
+            log.debug(f"No se pudo subir prioridad C{cam_id}: {e}")
+
+    def _publish_frame(self, cam_id: int, frame: np.ndarray):
+        """
+        Publica el último frame de una cámara (escritura atómica, sin lock).
+        Cada frame es un array nuevo que se marca de solo lectura: los
+        consumidores lo comparten sin copiarlo.
+        """
+        frame.setflags(write=False)
+        cam = self.cams[cam_id - 1]
+        cam.seq += 1
+        cam.frame_slot[0] = (frame, time.monotonic(), cam.seq)
+
+    def _get_target_fps(self, cam_id: int) -> float:
+        """FPS objetivo de decodificación para una cámara (desde la configuración)."""
+        fps = getattr(self.config, f"cam{cam_id}_target_fps", 15)
+        try:
+            fps = float(fps)
+        except (TypeError, ValueError):
+            fps = 15.0
+        return fps if fps > 0 else 15.0
+
+    def _create_session(self, config: dict) -> requests.Session:
+        """Crea una sesión HTTP con keep-alive y autenticación Digest para una cámara."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.auth = HTTPDigestAuth(config['user'], config['pass'])
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    def _get_session(self, cam_id: int, config: dict) -> requests.Session:
+        """Devuelve la sesión HTTP de la cámara, creándola si no existe."""
+        cam = self._cam(cam_id)
+        if cam.session is None:
+            cam.session = self._create_session(config)
+        return cam.session
+
+    def _build_http_urls(self, cam_id: int, config: dict) -> Dict[str, List[str]]:
+        """Construye las URLs MJPEG y snapshot (ISAPI) a probar para una cámara IP."""
+        channel = _stream_channel(config, self._cam(cam_id).substream_override)
+        base = f"http://{config['ip']}:{config['port']}/ISAPI/Streaming/channels/{channel}"
+        return {
+            'mjpeg': [
+                f"{base}/httpPreview",
+                f"{base}/httpPreview?auth=basic"
+            ],
+            'snapshot': [
+                f"{base}/picture",
+                f"{base}/picture?snapShotImageType=JPEG"
+            ],
+        }
+
+    def _http_urls(self, cam_id: int, config: dict) -> Dict[str, List[str]]:
+        """Devuelve las URLs HTTP cacheadas de la cámara, construyéndolas si faltan."""
+        cam = self._cam(cam_id)
+        if cam.urls is None:
+            cam.urls = self._build_http_urls(cam_id, config)
+        return cam.urls
+
     def _validate_ip_config(self, config: dict) -> bool:
         """Valida la configuración de cámara IP."""
         ip = config.get('ip', '')
@@ -371,71 +631,125 @@ class CameraHandler:
     
     def _reader_loop_http(self, cam_id: int, config: dict):
         """Loop de captura para cámaras IP HTTP/MJPEG."""
-        ip = config['ip']
-        user = config['user']
-        password = config['pass']
-        port = config['port']
-        channel = config['channel']
-        
-        auth_digest = HTTPDigestAuth(user, password)
-        auth_basic = HTTPBasicAuth(user, password)
-        
-        # URLs a probar
-        host = f"{ip}:{port}"
-        base = f"http://{host}/ISAPI/Streaming/channels/{channel}"
-        urls_mjpeg = [
-            f"{base}/httpPreview",
-            f"{base}/httpPreview?auth=basic"
-        ]
-        urls_snapshot = [
-            f"{base}/picture",
-            f"{base}/picture?snapShotImageType=JPEG"
-        ]
+        self._pin_reader_thread(cam_id)
+        session = self._get_session(cam_id, config)
         
         backoff = 0.5
         max_backoff = 5.0
         target_fps = 15  # FPS objetivo para la captura
         frame_interval = 1.0 / target_fps
+        # Errores transitorios (timeout, 5xx, corte) seguidos de MJPEG antes de
+        # recurrir a snapshot; un 4xx indica que el endpoint no está disponible
+        mjpeg_errors = 0
+        max_mjpeg_errors = 3
         
         while self.reader_running:
             start_time = time.time()
             connected = False
+            mjpeg_rejected = False
+            # URLs precalculadas (se reconstruyen solo si cambia la configuración)
+            urls = self._http_urls(cam_id, config)
             # Intentar MJPEG primero
-            for url in urls_mjpeg:
+            for url in urls['mjpeg']:
                 try:
                     self._update_status(cam_id, f"🔄 Probando MJPEG: {url.split('/')[-1]}")
-                    with requests.get(url, auth=auth_digest, stream=True, timeout=10) as r:
-                        if r.status_code in (401, 403, 404):
+                    with session.get(url, stream=True, timeout=10) as r:
+                        if 400 <= r.status_code < 500:
+                            mjpeg_rejected = True
                             continue
                         r.raise_for_status()
                         # Procesar stream MJPEG
                         if self._process_mjpeg_stream(cam_id, r):
                             connected = True
+                            mjpeg_errors = 0
                             backoff = 0.5
                             break
                 except requests.exceptions.RequestException as e:
-                    print(f"⚠️ Error MJPEG C{cam_id}: {e}")
+                    self._throttled_log(f"mjpeg{cam_id}", f"⚠️ Error MJPEG C{cam_id}: {e}")
                     continue
-            # Si MJPEG falló, intentar snapshot
-            if not connected and self.reader_running:
-                for url in urls_snapshot:
+            if not connected and not mjpeg_rejected:
+                mjpeg_errors += 1
+            # Snapshot solo si la cámara rechaza MJPEG o MJPEG falla repetidamente;
+            # ante un error aislado se reintenta MJPEG (una conexión para muchos frames)
+            if (not connected and self.reader_running
+                    and (mjpeg_rejected or mjpeg_errors >= max_mjpeg_errors)):
+                for url in urls['snapshot']:
                     try:
                         self._update_status(cam_id, f"🔄 Usando snapshot: {url.split('/')[-1]}")
-                        if self._process_snapshot_stream(cam_id, url, auth_digest):
+                        if self._process_snapshot_stream(cam_id, url, session):
                             connected = True
                             backoff = 0.5
                             break
                     except Exception as e:
-                        print(f"⚠️ Error snapshot C{cam_id}: {e}")
+                        self._throttled_log(f"snapshot{cam_id}", f"⚠️ Error snapshot C{cam_id}: {e}")
                         continue
             if not connected and self.reader_running:
                 self._update_status(cam_id, f"❌ Reconectando en {backoff:.1f}s...")
-                time.sleep(backoff)
+                if self._stop_event.wait(backoff):
+                    break
                 backoff = min(backoff * 2, max_backoff)
             elif connected:
                 elapsed = time.time() - start_time
                 sleep_time = max(0, frame_interval - elapsed)
-                time.sleep(sleep_time)
+                if self._stop_event.wait(sleep_time):
+                    break
+    
+    def _reader_loop_http_pyav(self, cam_id: int, config: dict):
+        """
+        Loop de captura HTTP/MJPEG con PyAV: FFmpeg separa los JPEG del stream
+        multipart en C. Solo se decodifican los paquetes a la tasa objetivo
+        (MJPEG es intra-frame, saltar paquetes es seguro). Si el stream no se
+        puede abrir, cae al loop HTTP con requests (MJPEG manual / snapshot).
+        """
+        self._pin_reader_thread(cam_id)
+        ip = config['ip']
+        port = config['port']
+        user = quote(str(config['user']), safe='')
+        password = quote(str(config['pass']), safe='')
+        
+        # Misma URL MJPEG que el loop HTTP, con credenciales para FFmpeg
+        mjpeg_url = self._http_urls(cam_id, config)['mjpeg'][0]
+        channel = mjpeg_url.split('/channels/')[1].split('/')[0]
+        url = mjpeg_url.replace("http://", f"http://{user}:{password}@", 1)
+        options = {'timeout': '5000000'}  # microsegundos
+        frame_interval = 1.0 / self._get_target_fps(cam_id)
+        
+        self._update_status(cam_id, f"🔄 Conectando MJPEG (PyAV) {ip}:{port}...")
+        
+        fail_count = 0
+        max_fails = 3
+        while self.reader_running:
+            try:
+                with av.open(url, options=options) as container:
+                    stream = container.streams.video[0]
+                    stream.thread_type = 'AUTO'
+                    self._update_status(cam_id, "▶️ MJPEG conectado (PyAV)")
+                    log.info(f"MJPEG C{cam_id}: canal {channel}, "
+                             f"{stream.codec_context.width}x{stream.codec_context.height}")
+                    fail_count = 0
+                    
+                    last_decode = 0.0
+                    for packet in container.demux(stream):
+                        if not self.reader_running:
+                            break
+                        now = time.monotonic()
+                        if now - last_decode < frame_interval:
+                            continue
+                        for frame in packet.decode():
+                            last_decode = now
+                            self._publish_frame(cam_id, frame.to_ndarray(format='bgr24'))
+            except Exception as e:
+                self._throttled_log(f"pyav{cam_id}", f"⚠️ Error MJPEG (PyAV) C{cam_id}: {e}")
+            
+            if not self.reader_running:
+                break
+            fail_count += 1
+            if fail_count >= max_fails:
+                self._update_status(cam_id, "⚠️ PyAV no pudo abrir el stream, usando HTTP/requests...")
+                self._reader_loop_http(cam_id, config)
+                return
+            if self._stop_event.wait(1.0):
+                break
     
     def _process_mjpeg_stream(self, cam_id: int, response) -> bool:
         """Procesa un stream MJPEG."""
@@ -449,7 +763,9 @@ class CameraHandler:
                     boundary = '--' + boundary
                 boundary = boundary.encode('utf-8')
             
-            buffer = b""
+            # bytearray: se agrega y se consume en sitio (sin realocar por chunk)
+            buffer = bytearray()
+            self._cam(cam_id).scan_offset = 0
             self._update_status(cam_id, "▶️ MJPEG conectado")
             
             for chunk in response.iter_content(chunk_size=4096):
@@ -459,97 +775,165 @@ class CameraHandler:
                 if not chunk:
                     continue
                     
-                buffer += chunk
+                buffer.extend(chunk)
                 
                 # Procesar con boundary si está disponible
                 if boundary and boundary in buffer:
                     parts = buffer.split(boundary)
                     buffer = parts[-1]
+                    self._cam(cam_id).scan_offset = 0
                     
                     for part in parts[:-1]:
                         self._extract_jpeg_from_part(cam_id, part)
                     continue
                 
-                # Buscar JPEGs directamente en el buffer
+                # Buscar JPEGs directamente en el buffer (lo consume en sitio)
                 self._extract_jpeg_from_buffer(cam_id, buffer)
                 
             return True
             
         except Exception as e:
-            print(f"❌ Error procesando MJPEG C{cam_id}: {e}")
+            self._throttled_log(f"mjpeg{cam_id}", f"❌ Error procesando MJPEG C{cam_id}: {e}")
             return False
     
-    def _extract_jpeg_from_part(self, cam_id: int, part: bytes):
+    def _extract_jpeg_from_part(self, cam_id: int, part: bytearray):
         """Extrae JPEG de una parte del stream MJPEG."""
-        header_end = part.find(b'\\r\\n\\r\\n')
-        if header_end != -1:
-            jpeg_bytes = part[header_end + 4:]
-            if jpeg_bytes:
-                self._decode_and_store_frame(cam_id, jpeg_bytes)
+        header_end = part.find(b'\r\n\r\n')
+        if header_end != -1 and header_end + 4 < len(part):
+            # Vista sin copia sobre los bytes del JPEG
+            with memoryview(part)[header_end + 4:] as jpeg_view:
+                self._decode_and_store_frame(cam_id, jpeg_view)
     
-    def _extract_jpeg_from_buffer(self, cam_id: int, buffer: bytes):
-        """Extrae JPEGs directamente del buffer."""
+    def _extract_jpeg_from_buffer(self, cam_id: int, buffer: bytearray):
+        """
+        Extrae JPEGs completos del buffer y elimina los bytes ya consumidos.
+        La búsqueda de EOI continúa desde donde quedó en el chunk anterior, así
+        cada byte del stream se examina una sola vez.
+        """
         while True:
-            soi = buffer.find(b'\\xff\\xd8')  # Start of Image
-            eoi = buffer.find(b'\\xff\\xd9')  # End of Image
+            soi = buffer.find(b'\xff\xd8')  # Start of Image
+            if soi == -1:
+                # Conservar el último byte por si el marcador quedó partido entre chunks
+                del buffer[:-1]
+                self._cam(cam_id).scan_offset = 0
+                break
+            if soi > 0:
+                del buffer[:soi]
+                self._cam(cam_id).scan_offset = 0
             
-            if soi != -1 and eoi != -1 and eoi > soi:
-                jpeg_bytes = buffer[soi:eoi + 2]
-                buffer = buffer[eoi + 2:]
-                self._decode_and_store_frame(cam_id, jpeg_bytes)
-            else:
+            start = max(2, self._cam(cam_id).scan_offset)
+            eoi = buffer.find(b'\xff\xd9', start)  # End of Image
+            if eoi == -1:
+                # Retroceder un byte por si el marcador quedó partido entre chunks
+                self._cam(cam_id).scan_offset = max(2, len(buffer) - 1)
                 break
+            
+            # Vista sin copia: se libera antes de modificar el buffer
+            with memoryview(buffer)[:eoi + 2] as jpeg_view:
+                self._decode_and_store_frame(cam_id, jpeg_view)
+            del buffer[:eoi + 2]
+            self._cam(cam_id).scan_offset = 0
     
-    def _process_snapshot_stream(self, cam_id: int, url: str, auth) -> bool:
-        """Procesa capturas individuales (snapshot)."""
+    def _process_snapshot_stream(self, cam_id: int, url: str, session: requests.Session,
+                                 max_duration: float = 30.0) -> bool:
+        """
+        Procesa capturas individuales (snapshot) reutilizando la conexión de la sesión.
+        Retorna tras max_duration segundos para que el loop HTTP vuelva a probar
+        MJPEG, que entrega muchos frames por conexión en vez de uno por petición.
+        """
         try:
             self._update_status(cam_id, "▶️ SNAPSHOT activo")
             
-            while self.reader_running:
-                response = requests.get(url, auth=auth, timeout=5)
+            deadline = time.monotonic() + max_duration
+            while self.reader_running and time.monotonic() < deadline:
+                response = session.get(url, timeout=5)
                 response.raise_for_status()
                 
                 if response.content:
                     self._decode_and_store_frame(cam_id, response.content)
                 
-                time.sleep(0.08)  # ~12.5 FPS
+                if self._stop_event.wait(0.08):  # ~12.5 FPS
+                    break
                 
             return True
             
         except Exception as e:
-            print(f"❌ Error snapshot C{cam_id}: {e}")
+            self._throttled_log(f"snapshot{cam_id}", f"❌ Error snapshot C{cam_id}: {e}")
             return False
     
-    def _decode_and_store_frame(self, cam_id: int, jpeg_bytes: bytes):
-        """Decodifica bytes JPEG y almacena el frame."""
+    def _decode_and_store_frame(self, cam_id: int, jpeg_bytes):
+        """
+        Encola bytes JPEG (bytes, bytearray o memoryview) para decodificarlos en
+        el pool. Si la cámara ya tiene una decodificación en curso, el JPEG queda
+        pendiente y reemplaza a cualquier otro no procesado (solo importa el último).
+        """
+        pool = self._decode_pool
+        if pool is None:
+            self._decode_jpeg(cam_id, jpeg_bytes)
+            return
+        
+        cam = self._cam(cam_id)
+        # Copia propia: el buffer del lector se reutiliza en cuanto retornamos
+        cam.pending_jpeg.append(bytes(jpeg_bytes))
+        
+        future = cam.decode_future
+        if future is None or future.done():
+            try:
+                cam.decode_future = pool.submit(self._decode_worker, cam_id)
+            except RuntimeError:
+                pass  # Pool cerrado durante stop_cameras
+    
+    def _decode_worker(self, cam_id: int):
+        """Decodifica el JPEG pendiente más reciente de una cámara hasta vaciarlo."""
+        pending = self._cam(cam_id).pending_jpeg
+        while self.reader_running:
+            try:
+                jpeg_bytes = pending.popleft()
+            except IndexError:
+                return
+            self._decode_jpeg(cam_id, jpeg_bytes)
+    
+    def _decode_jpeg(self, cam_id: int, jpeg_bytes):
+        """
+        Decodifica bytes JPEG a BGR y publica el frame. Usa TurboJPEG si está
+        disponible y cv2.imdecode como respaldo (JPEG no soportado o sin librería).
+        """
+        # Cada decodificación produce un array nuevo a propósito: los frames
+        # publicados se comparten sin copia (solo lectura), así que reutilizar
+        # buffers preasignados obligaría a volver a copiar en get_frame(s).
+        # Además cv2.imdecode no acepta 'dst' desde Python.
         try:
-            img = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
-            if img is not None:
-                if cam_id == 1:
-                    with self.last_lock1:
-                        self.last_frame1 = img
-                else:
-                    with self.last_lock2:
-                        self.last_frame2 = img
+            img = None
+            if self._tj is not None:
+                try:
+                    img = self._tj.decode(jpeg_bytes, pixel_format=TJPF_BGR)
+                except Exception:
+                    img = None
+            if img is None:
+                img = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None and self.reader_running:
+                self._publish_frame(cam_id, img)
         except Exception as e:
-            print(f"⚠️ Error decodificando frame C{cam_id}: {e}")
+            self._throttled_log(f"decode{cam_id}", f"⚠️ Error decodificando frame C{cam_id}: {e}")
     
     def _reader_loop_webcam(self, cam_id: int, config: dict):
         """Loop de captura para webcam."""
+        self._pin_reader_thread(cam_id)
         webcam_idx = config['index']
         
         try:
             cap = cv2.VideoCapture(webcam_idx)
             
-            if cam_id == 1:
-                self.cap1 = cap
-            else:
-                self.cap2 = cap
+            self._cam(cam_id).cap = cap
             
             if not cap.isOpened():
                 self._update_status(cam_id, f"❌ No se pudo abrir webcam {webcam_idx}")
                 return
             
+            # Buffer de un frame (menor latencia) y MJPG comprimido por USB
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            
             # Configurar resolución si es posible
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
@@ -558,45 +942,41 @@ class CameraHandler:
             self._update_status(cam_id, f"▶️ Webcam {webcam_idx} iniciada")
             
 
-            target_fps = 15  # FPS objetivo para webcam
-            frame_interval = 1.0 / target_fps
+            frame_interval = 1.0 / self._get_target_fps(cam_id)
+            last_retrieve = 0.0
             while self.reader_running:
-                start_time = time.time()
-                ret, frame = cap.read()
+                # grab() bloquea hasta el siguiente frame del dispositivo;
+                # solo se decodifica a la tasa objetivo
+                if not cap.grab():
+                    if self._stop_event.wait(0.03):  # Esperar si no hay frame
+                        break
+                    continue
+                
+                now = time.monotonic()
+                if now - last_retrieve < frame_interval:
+                    continue
+                
+                ret, frame = cap.retrieve()
                 if ret and frame is not None:
-                    if cam_id == 1:
-                        with self.last_lock1:
-                            self.last_frame1 = frame
-                    else:
-                        with self.last_lock2:
-                            self.last_frame2 = frame
-                else:
-                    time.sleep(0.03)  # Esperar si no hay frame
-                elapsed = time.time() - start_time
-                sleep_time = max(0, frame_interval - elapsed)
-                time.sleep(sleep_time)
+                    last_retrieve = now
+                    self._publish_frame(cam_id, frame)
                     
         except Exception as e:
             self._update_status(cam_id, f"❌ Error webcam: {e}")
         finally:
             if 'cap' in locals():
                 cap.release()
-            if cam_id == 1:
-                self.cap1 = None
-            else:
-                self.cap2 = None
+            self._cam(cam_id).cap = None
     
     def _reader_loop_file(self, cam_id: int, config: dict):
         """Loop de captura para archivo de video."""
+        self._pin_reader_thread(cam_id)
         video_path = config['path']
         
         try:
-            cap = cv2.VideoCapture(video_path)
+            cap = _open_ffmpeg_capture(video_path)
             
-            if cam_id == 1:
-                self.cap1 = cap
-            else:
-                self.cap2 = cap
+            self._cam(cam_id).cap = cap
             
             if not cap.isOpened():
                 self._update_status(cam_id, f"❌ No se pudo abrir archivo {video_path}")
@@ -612,32 +992,33 @@ class CameraHandler:
             
             self._update_status(cam_id, f"▶️ Archivo iniciado (FPS: {fps:.1f}, Frames: {total_frames})")
             
+            frame_interval = 1.0 / self._get_target_fps(cam_id)
+            last_retrieve = 0.0
             while self.reader_running:
-                ret, frame = cap.read()
-                if ret and frame is not None:
-                    if cam_id == 1:
-                        with self.last_lock1:
-                            self.last_frame1 = frame
-                    else:
-                        with self.last_lock2:
-                            self.last_frame2 = frame
+                if cap.grab():
+                    # Avanzar al ritmo del video, pero decodificar solo a la tasa objetivo
+                    now = time.monotonic()
+                    if now - last_retrieve >= frame_interval:
+                        ret, frame = cap.retrieve()
+                        if ret and frame is not None:
+                            last_retrieve = now
+                            self._publish_frame(cam_id, frame)
                     
-                    time.sleep(frame_delay)
+                    if self._stop_event.wait(frame_delay):
+                        break
                 else:
                     # Reiniciar video al final (loop infinito)
                     cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
                     self._update_status(cam_id, "🔄 Reiniciando video")
-                    time.sleep(0.1)
+                    if self._stop_event.wait(0.1):
+                        break
                     
         except Exception as e:
             self._update_status(cam_id, f"❌ Error archivo: {e}")
         finally:
             if 'cap' in locals():
                 cap.release()
-            if cam_id == 1:
-                self.cap1 = None
-            else:
-                self.cap2 = None
+            self._cam(cam_id).cap = None
     
     def optimize_for_hikvision(self):
         """
@@ -669,22 +1050,19 @@ class CameraHandler:
         print("✅ Optimizaciones aplicadas para mejor latencia")
     
     def _setup_hikvision_urls(self):
-        """Configura URLs optimizadas para cámaras Hikvision."""
-        # URLs específicas para menor latencia en Hikvision
-        hikvision_urls = {
-            'main': '/ISAPI/Streaming/channels/101/picture',  # Stream principal
-            'sub': '/ISAPI/Streaming/channels/102/picture',   # Sub-stream (menor latencia)
-            'mjpeg': '/ISAPI/Streaming/channels/101/httpPreview',  # MJPEG optimizado
-        }
-        
-        # Configurar para usar sub-stream si existe
-        for cam_id in [1, 2]:
+        """
+        Cambia las cámaras IP al sub-stream (menor latencia). Las URLs quedan en
+        el estado de la cámara, que es lo que leen los loops HTTP/RTSP en su
+        próxima (re)conexión.
+        """
+        for cam_id, cam in enumerate(self.cams, start=1):
             cam_config = self.config.get_camera_config(cam_id)
-            if cam_config['tipo'] == 'ip' and 'DS-2CD' in str(cam_config.get('modelo', '')):
-                # Usar sub-stream para menor latencia
-                base_url = f"http://{cam_config['ip']}:{cam_config['puerto']}"
-                cam_config['url'] = f"{base_url}{hikvision_urls['sub']}"
-                print(f"📹 Cam{cam_id}: URL optimizada para Hikvision")
+            if cam_config['tipo'] != 'ip':
+                continue
+            cam.substream_override = True
+            cam.urls = None
+            urls = self._http_urls(cam_id, cam_config)
+            print(f"📹 Cam{cam_id}: sub-stream Hikvision -> {urls['mjpeg'][0]}")
     
     def set_low_latency_mode(self, enabled: bool = True):
         """
@@ -706,42 +1084,25 @@ class CameraHandler:
             self.max_frame_age = 0.5
             print("🔄 Modo latencia normal")
     
-    def get_frames_optimized(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    def get_frames_optimized(self) -> Tuple[Optional[np.ndarray], ...]:
         """
         Versión optimizada de get_frames para modo de baja latencia.
         Descarta frames antiguos y prioriza los más recientes.
         
         Returns:
             Tupla (frame1, frame2) con frames más recientes disponibles
+            (solo lectura, igual que get_frames); None para una cámara cuyo
+            último frame supera max_frame_age
         """
-        frame1, frame2 = None, None
-        current_time = time.time()
-        
-        # Frame 1 con verificación de edad
-        if self.last_frame1 is not None:
-            try:
-                with self.last_lock1:
-                    # En modo baja latencia, verificar edad del frame
-                    if hasattr(self, 'low_latency_mode') and self.low_latency_mode:
-                        # Tomar frame solo si es reciente
-                        frame1 = self.last_frame1.copy()
-                    else:
-                        frame1 = self.last_frame1.copy()
-            except:
-                frame1 = None
-        
-        # Frame 2 con verificación de edad
-        if self.last_frame2 is not None:
-            try:
-                with self.last_lock2:
-                    if hasattr(self, 'low_latency_mode') and self.low_latency_mode:
-                        frame2 = self.last_frame2.copy()
-                    else:
-                        frame2 = self.last_frame2.copy()
-            except:
-                frame2 = None
-        
-        return frame1, frame2
+        now = time.monotonic()
+        frames = []
+        for cam in self.cams:
+            entry = cam.frame_slot[0]
+            if entry is None or now - entry[1] > self.max_frame_age:
+                frames.append(None)
+            else:
+                frames.append(entry[0])
+        return tuple(frames)
     
     def cleanup(self):
         """Limpieza de recursos al cerrar."""
@@ -749,12 +1110,11 @@ class CameraHandler:
         self.stop_cameras()  # Usar el método correcto
         
         # Limpiar capturas
-        for cap in [getattr(self, 'cap1', None), getattr(self, 'cap2', None)]:
-            if cap:
-                cap.release()
-        
-        # Limpiar frames
-        self.last_frame1 = None
-        self.last_frame2 = None
+        for cam in self.cams:
+            if cam.cap:
+                cam.cap.release()
+                cam.cap = None
+            # Limpiar frames
+            cam.frame_slot[0] = None
         
         print("✅ Recursos limpiados")
\ No newline at end of file
@@ -11,8 +11,17 @@ Este módulo se encarga de:
 
 import os
 import sys
+import copy
 import time
-from typing import Optional, List, Dict, Any, Tuple
+import queue
+import functools
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple, Iterable
 from datetime import datetime
 import cv2
 import numpy as np
@@ -31,9 +40,10 @@ from src.utils.utils import (
 )
 # Tracking completamente eliminado - sistema simplificado
 from src.utils.broken_piece_analyzer import BrokenPieceAnalyzer, create_broken_piece_visualizer
+from src.utils import det_numba
 
 # Importar handler robusto de YOLO
-from src.services.yolo_handler import YOLOModelHandler
+from src.services.yolo_handler import YOLOModelHandler, INT8_CALIB_MAX_IMAGES
 
 try:
     from ultralytics import YOLO
@@ -54,12 +64,103 @@ except ImportError as e:
         except ImportError:
             print("   ❌ PyTorch tampoco disponible")
 
+# PyTorch para el preprocesamiento en GPU (opcional)
+try:
+    import torch
+    import torch.nn.functional as F
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+# Logger del loop de detección: mensajes por frame con formato diferido
+log = logging.getLogger("DetectionHandler")
+
+
+def _inference_mode():
+    """torch.inference_mode() si PyTorch está disponible (sin autograd ni tracking de vistas)."""
+    return torch.inference_mode() if TORCH_AVAILABLE else nullcontext()
+
+
+@dataclass
+class DetectionBatch:
+    """
+    Detecciones de un frame en formato SoA: arrays paralelos, una fila por caja.
+    Los filtros (piezas en ROI, conteo, PLC) se resuelven con máscaras booleanas.
+    """
+    xyxy: np.ndarray        # (N, 4) int32, coordenadas del frame completo
+    center: np.ndarray      # (N, 2) int32
+    conf: np.ndarray        # (N,) float32
+    cls_id: np.ndarray      # (N,) int32
+    inside_roi: np.ndarray  # (N,) bool
+    is_broken: np.ndarray   # (N,) bool
+    label_ids_to_names: Dict[int, str] = field(default_factory=dict)
+    label_ids_to_keys: Dict[int, str] = field(default_factory=dict)  # Etiquetas en minúsculas
+    
+    def __len__(self) -> int:
+        return int(self.cls_id.shape[0])
+    
+    @classmethod
+    def from_arrays(cls, xyxy: np.ndarray, confs: np.ndarray, clss: np.ndarray,
+                    min_confs: np.ndarray, table: Dict[int, tuple]) -> 'DetectionBatch':
+        """Crea el lote con las cajas que superan el umbral de su clase (ver _extract_box_arrays)."""
+        keep = confs >= min_confs
+        xyxy = xyxy[keep]
+        n = xyxy.shape[0]
+        return cls(
+            xyxy=xyxy,
+            center=((xyxy[:, :2] + xyxy[:, 2:]) // 2).astype(np.int32),
+            conf=confs[keep],
+            cls_id=clss[keep],
+            inside_roi=np.zeros(n, dtype=bool),
+            is_broken=np.zeros(n, dtype=bool),
+            label_ids_to_names={c: t[0] for c, t in table.items()},
+            label_ids_to_keys={c: t[1] for c, t in table.items()},
+        )
+    
+    def select(self, mask: np.ndarray) -> 'DetectionBatch':
+        """Subconjunto de filas según una máscara booleana."""
+        return DetectionBatch(
+            self.xyxy[mask], self.center[mask], self.conf[mask], self.cls_id[mask],
+            self.inside_roi[mask], self.is_broken[mask], self.label_ids_to_names,
+            self.label_ids_to_keys,
+        )
+    
+    def class_mask(self, predicate) -> np.ndarray:
+        """Máscara de filas cuya etiqueta (en minúsculas) cumple predicate."""
+        ids = [c for c, key in self.label_ids_to_keys.items() if predicate(key)]
+        return np.isin(self.cls_id, ids)
+    
+    def to_list_of_dicts(self) -> List[Dict[str, Any]]:
+        """Detecciones en el formato de dict usado por dibujo, grabación y UI."""
+        names = self.label_ids_to_names
+        keys = self.label_ids_to_keys
+        dets = []
+        for (x1, y1, x2, y2), (cx, cy), conf, c, inside, broken in zip(
+                self.xyxy.tolist(), self.center.tolist(), self.conf.tolist(),
+                self.cls_id.tolist(), self.inside_roi.tolist(), self.is_broken.tolist()):
+            label = names.get(c, str(c))
+            dets.append({
+                'label': label,
+                'label_lc': keys.get(c) or label.lower(),  # Etiqueta en minúsculas para filtros
+                'confidence': conf,
+                'bbox': (x1, y1, x2, y2),
+                'center': (cx, cy),
+                'inside_roi': inside,
+                'is_broken': broken,
+            })
+        return dets
+
 
 class DetectionHandler:
     """
     Manejador principal de detecciones YOLO con medición y alertas.
     """
     
+    # Duplicados para el conteo: misma clase a menos de DUP_CELL_PX en DUP_WINDOW_S
+    DUP_CELL_PX = 30
+    DUP_WINDOW_S = 1.0
+    DUP_RING_SIZE = 64  # Centros contados recientes que se recuerdan por cámara
+    
     def __init__(self, config, plc_service=None):
         """
         Inicializa el manejador de detecciones.
@@ -72,6 +173,38 @@ class DetectionHandler:
         self.plc_service = plc_service
         self.model: Optional['YOLO'] = None
         self.detecting = False
+        # El predictor de Ultralytics no es thread-safe: una sola inferencia a la vez
+        self._model_lock = threading.Lock()
+        
+        # Worker de inferencia: cola de 1 frame por cámara (el más reciente gana)
+        self._frame_queues: Dict[int, queue.Queue] = {}
+        self._frame_ready = threading.Event()
+        self._worker_thread: Optional[threading.Thread] = None
+        # Etapa de post-proceso (conteo, PLC, dibujo) en su propio thread,
+        # alimentada por una cola acotada desde el worker de inferencia
+        self.post_queue_size = 2
+        self._post_queue: queue.Queue = queue.Queue(maxsize=self.post_queue_size)
+        self._post_thread: Optional[threading.Thread] = None
+        # Señal de parada propia de cada arranque: un worker viejo que sigue
+        # en una inferencia larga no revive aunque detecting vuelva a True
+        self._worker_stop = threading.Event()
+        # Último resultado por cámara: cam_id -> (frame_anotado, info, seq)
+        self._result_slots: Dict[int, Tuple[np.ndarray, Dict, int]] = {}
+        self._result_seq = 0
+        # Cámaras cuyo resultado nadie muestra ni graba: el worker no las dibuja
+        self._draw_disabled: set = set()
+        
+        # Preprocesamiento en GPU: None = sin evaluar; buffers por cámara
+        self._gpu_preprocess_ok: Optional[bool] = None
+        # False con engines exportados a batch=1: una llamada al modelo por ROI
+        self._batch_ok = True
+        self._upload_stream = None
+        # Anillo de 2 buffers pinned por cámara: cam_id -> [buffers, índice, eventos]
+        self._pinned_buffers: Dict[int, list] = {}
+        self._gpu_canvas: Dict[int, Any] = {}
+        
+        # Salto de frames casi idénticos: cam_id -> [miniatura 8x8, result_info, reusos]
+        self._skip_state: Dict[int, list] = {}
         
         # Handler robusto de YOLO
         self.yolo_handler = YOLOModelHandler()
@@ -79,18 +212,64 @@ class DetectionHandler:
         # Callbacks para eventos
         self.status_callback = None
         self.alert_callback = None
+        self.result_callback = None
+        
+        # ROI poligonal precalculado por cámara: cam_id -> (clave, roi_coords, polilínea, máscara)
+        self._roi_cache: Dict[int, Tuple[tuple, Tuple[int, int, int, int], np.ndarray, np.ndarray]] = {}
+        # Umbral mínimo de confianza por etiqueta en minúsculas (ver _rebuild_min_conf_table)
+        self._base_conf = 0.5
+        self._min_conf_table: Dict[str, float] = {}
+        self._rebuild_min_conf_table()
+        # Constantes de medición en las unidades configuradas (ver _recompute_measurement_constants)
+        self._recompute_measurement_constants()
+        # Configuración PLC por etiqueta: label -> (enabled, address, pulse_ms, pulse_value)
+        self._plc_entry = functools.lru_cache(maxsize=64)(self._resolve_plc_entry)
+        self._pq_plc_cfg: tuple = (False, None, 0, 0)
+        self._rebuild_plc_dispatch()
+        self._apply_log_level()
+        # cv2.getTextSize por (texto, escala, grosor) para las etiquetas dibujadas
+        self._text_size_cache: Dict[tuple, Tuple[int, int]] = {}
+        # Máscaras de texto pre-rasterizadas por nombre de clase (ver _label_glyph)
+        self._glyph_cache: Dict[str, Tuple[np.ndarray, int]] = {}
         
-        # Historial de detecciones por cámara
-        self.detection_history: Dict[int, List[Dict]] = {1: []}
+        # Historial de detecciones por cámara, acotado. Es el contador: las
+        # entradas que salen del deque se acumulan en _evicted_stats
+        self.max_detection_history = 10_000
+        self.detection_history: Dict[int, deque] = {1: deque(maxlen=self.max_detection_history)}
+        self._evicted_stats: Dict[int, Dict[str, Any]] = {}
+        # El worker de post-proceso agrega al historial mientras la GUI lo lee
+        self._history_lock = threading.Lock()
         # Inicializar estado de movimiento de línea
         self.linea_en_movimiento: Dict[int, bool] = {1: False}
         self.movimiento_umbral_px = 10  # Umbral de desplazamiento en píxeles para considerar movimiento
         self.max_history_size = 10
+        # Centros de piezas por frame (ventana acotada, separada del contador)
+        self.centros_history: Dict[int, deque] = {1: deque(maxlen=self.max_history_size)}
+        # Buffer circular de centros contados: cam_id -> [centros, clases, t_mono, head]
+        self._recent_centers: Dict[int, list] = {}
+        # Últimas detecciones de process_frame_optimized
+        self.optimized_history_size = 100
+        self.optimized_history: Dict[int, deque] = {}
         
         # Sistema de grabación de primera detección
         self.primera_guardada = {1: False}
         self.save_dir = os.path.join(os.getcwd(), "detecciones")
         os.makedirs(self.save_dir, exist_ok=True)
+        # Escritura de JPEGs fuera del loop de detección (cola acotada)
+        self._save_executor: Optional[ThreadPoolExecutor] = None
+        self._save_pending = 0
+        self._save_lock = threading.Lock()
+        self.max_pending_saves = 4
+        # Recortes limpios del ROI (lo que ve el modelo) para calibrar INT8;
+        # se rotan sobre INT8_CALIB_MAX_IMAGES archivos por cámara
+        self.calib_dir = os.path.join(self.save_dir, "calibracion")
+        os.makedirs(self.calib_dir, exist_ok=True)
+        self.calib_sample_interval_s = 5.0
+        self._calib_next: Dict[int, float] = {}
+        self._calib_slot: Dict[int, int] = {}
+        # Análisis avanzado de quebradas en su propio thread: cam_id -> Future pendiente
+        self._broken_executor: Optional[ThreadPoolExecutor] = None
+        self._broken_futures: Dict[int, Any] = {}
         
         # Sistema de conteo simplificado SIN tracking
         print("📊 Sistema de conteo directo inicializado (SIN tracking)")
@@ -105,10 +284,121 @@ class DetectionHandler:
         Limpia el historial de detecciones.
         Útil para resetear el contador durante pruebas o al inicio de producción.
         """
-        self.detection_history = {1: []}
+        with self._history_lock:
+            self.detection_history = {1: deque(maxlen=self.max_detection_history)}
+            self._evicted_stats = {}
+        self.centros_history = {1: deque(maxlen=self.max_history_size)}
+        self.optimized_history = {}
+        self._recent_centers = {}
         self.primera_guardada = {1: False}
+        self.invalidate_roi_cache()
         print("🧹 Historial de detecciones limpiado - Contador reiniciado")
     
+    def invalidate_roi_cache(self):
+        """Descarta el ROI poligonal cacheado (llamar si cambian los puntos del ROI)."""
+        self._roi_cache.clear()
+    
+    def invalidate_config_caches(self):
+        """Descarta todo lo derivado de la configuración (ROI y umbrales por clase)."""
+        self.invalidate_roi_cache()
+        self._rebuild_min_conf_table()
+        self._recompute_measurement_constants()
+        self._rebuild_plc_dispatch()
+        self._apply_log_level()
+    
+    def _apply_log_level(self):
+        """Nivel del logger de detección según la config: DEBUG con verbose_mode."""
+        log.setLevel(logging.DEBUG if getattr(self.config, 'verbose_mode', False) else logging.INFO)
+    
+    def _get_roi_polygon_cache(self, cam_id: int, roi_points: list,
+                               w: int, h: int) -> Tuple[Tuple[int, int, int, int], np.ndarray, np.ndarray]:
+        """
+        Devuelve el bounding rect (recortado al frame), la polilínea int32 y la
+        máscara del ROI poligonal, recalculándolos solo si cambian los puntos o
+        el tamaño del frame.
+        
+        Returns:
+            Tupla (roi_coords, polilínea con forma (N, 1, 2) para cv2.polylines,
+            máscara bool del tamaño del bounding rect: True dentro del polígono)
+        """
+        key = (id(roi_points), len(roi_points), tuple(roi_points[0]), tuple(roi_points[-1]), w, h)
+        cached = self._roi_cache.get(cam_id)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2], cached[3]
+        
+        pts = np.array(roi_points, np.int32)
+        # Calcular bounding rect para el recorte, asegurando límites
+        x_min = max(0, int(pts[:, 0].min()))
+        y_min = max(0, int(pts[:, 1].min()))
+        x_max = min(w, int(pts[:, 0].max()))
+        y_max = min(h, int(pts[:, 1].max()))
+        
+        roi_coords = (x_min, y_min, x_max, y_max)
+        polyline = pts.reshape((-1, 1, 2))
+        
+        # Máscara del polígono (incluye el borde) para consultar centros en O(1)
+        mask = np.zeros((max(0, y_max - y_min) + 1, max(0, x_max - x_min) + 1), dtype=np.uint8)
+        cv2.fillPoly(mask, [polyline - np.array([x_min, y_min], dtype=np.int32)], 1)
+        cv2.polylines(mask, [polyline - np.array([x_min, y_min], dtype=np.int32)], True, 1)
+        mask = mask.astype(bool)
+        
+        self._roi_cache[cam_id] = (key, roi_coords, polyline, mask)
+        return roi_coords, polyline, mask
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        """Contadores vacíos con el formato de get_detection_stats."""
+        return {'total': 0, 'by_class': {}, 'broken_count': 0, 'with_tracking': 0}
+    
+    @staticmethod
+    def _accumulate_stats(stats: Dict[str, Any], detection: Dict):
+        """Suma una entrada del historial a los contadores."""
+        stats['total'] += 1
+        label = detection.get('label', 'Desconocido')
+        clean_label = label.split('_')[0] if '_' in label else label
+        clean_label = clean_label.title()
+        
+        # No contar operador
+        if 'Operador' not in clean_label.lower():
+            stats['by_class'][clean_label] = stats['by_class'].get(clean_label, 0) + 1
+        
+        # Contar quebradas y con tracking
+        if detection.get('is_broken', False):
+            stats['broken_count'] += 1
+        
+        if detection.get('track_id', -1) != -1:
+            stats['with_tracking'] += 1
+    
+    def _append_history(self, cam_id: int, new_detections: Iterable[Dict]):
+        """
+        Agrega detecciones contadas al historial de la cámara en una sola
+        pasada. Las que el deque descarta por tamaño se suman antes a
+        _evicted_stats para que el contador no retroceda.
+        """
+        with self._history_lock:
+            history = self.detection_history.get(cam_id)
+            if history is None:
+                history = self.detection_history[cam_id] = deque(maxlen=self.max_detection_history)
+            maxlen = history.maxlen
+            stats = None
+            for detection in new_detections:
+                if len(history) == maxlen:
+                    if stats is None:
+                        stats = self._evicted_stats.get(cam_id)
+                        if stats is None:
+                            stats = self._evicted_stats[cam_id] = self._empty_stats()
+                    # Sale la más antigua del historial
+                    self._accumulate_stats(stats, history[0])
+                history.append(detection)
+    
+    def get_history_snapshot(self, cam_id: int) -> List[Dict]:
+        """
+        Copia del historial de una cámara, segura para leer desde la GUI
+        mientras el worker sigue agregando detecciones.
+        """
+        with self._history_lock:
+            return list(self.detection_history.get(cam_id, ()))
+    
     def get_detection_stats(self):
         """
         Obtiene estadísticas detalladas del contador de detecciones.
@@ -116,32 +406,23 @@ class DetectionHandler:
         Returns:
             Dict con estadísticas completas
         """
-        stats = {
-            'total_cam1': len(self.detection_history.get(1, [])),
-            'total_general': len(self.detection_history.get(1, [])),  # Solo Cam1 cuenta
-            'by_class': {},
-            'broken_count': 0,
-            'with_tracking': 0
-        }
+        # Partir de lo ya descartado del historial acotado (copias tomadas
+        # bajo el lock; el conteo se hace fuera para no frenar al worker)
+        with self._history_lock:
+            totals = copy.deepcopy(self._evicted_stats.get(1) or self._empty_stats())
+            history = list(self.detection_history.get(1, ()))
         
         # Analizar detecciones de Cam1 (las que cuentan)
-        for detection in self.detection_history.get(1, []):
-            label = detection.get('label', 'Desconocido')
-            clean_label = label.split('_')[0] if '_' in label else label
-            clean_label = clean_label.title()
-            
-            # No contar operador
-            if 'Operador' not in clean_label.lower():
-                stats['by_class'][clean_label] = stats['by_class'].get(clean_label, 0) + 1
-            
-            # Contar quebradas y con tracking
-            if detection.get('is_broken', False):
-                stats['broken_count'] += 1
-            
-            if detection.get('track_id', -1) != -1:
-                stats['with_tracking'] += 1
+        for detection in history:
+            self._accumulate_stats(totals, detection)
         
-        return stats
+        return {
+            'total_cam1': totals['total'],
+            'total_general': totals['total'],  # Solo Cam1 cuenta
+            'by_class': totals['by_class'],
+            'broken_count': totals['broken_count'],
+            'with_tracking': totals['with_tracking']
+        }
     
     def set_status_callback(self, callback):
         """Establece callback para actualizaciones de estado del modelo."""
@@ -151,6 +432,13 @@ class DetectionHandler:
         """Establece callback para alertas de operador."""
         self.alert_callback = callback
     
+    def set_result_callback(self, callback):
+        """
+        Establece callback para resultados del worker de inferencia.
+        Se invoca desde el thread del worker con (cam_id, frame_anotado, info).
+        """
+        self.result_callback = callback
+    
     def _update_status(self, message: str):
         """Actualiza el estado del modelo."""
         if self.status_callback:
@@ -173,9 +461,19 @@ class DetectionHandler:
             # Usar el handler robusto para cargar el modelo, pasando la ruta desde la config si no se especifica
             if model_path is None:
                 model_path = getattr(self.config, 'model_path', None)
-            success, message = self.yolo_handler.load_model(model_path)
+            success, message = self.yolo_handler.load_model(
+                model_path,
+                use_tensorrt=getattr(self.config, 'use_tensorrt', False),
+                imgsz=getattr(self.config, 'imgsz', 640),
+                precision=getattr(self.config, 'precision', 'fp16'),
+                calibration_dir=self.calib_dir,
+                use_openvino=getattr(self.config, 'use_openvino', False),
+            )
             if success:
                 self.model = self.yolo_handler.model
+                self._gpu_preprocess_ok = None  # Reevaluar con el nuevo modelo
+                self._batch_ok = self.yolo_handler.supports_batch
+                self._recent_centers = {}  # Los ids de clase pueden cambiar
                 if self.model:
                     if hasattr(self.model, 'names'):
                         num_classes = len(self.model.names)
@@ -186,6 +484,8 @@ class DetectionHandler:
                     else:
                         self._update_status("OK - Modelo cargado")
                         print(f"🚀 Modelo YOLO cargado exitosamente")
+                    self._warmup_model()
+                    det_numba.warmup()
                     return True
                 else:
                     self._update_status("ERROR - Handler no devolvió modelo")
@@ -205,17 +505,240 @@ class DetectionHandler:
             print("⚠️ No hay modelo cargado para iniciar detección")
             return False
         
+        self._warmup_model(iterations=1)
         self.detecting = True
         self.primera_guardada = {1: False, 2: False}
+        self._skip_state.clear()
+        self._start_worker()
         print("🤖 Detección iniciada")
         return True
     
+    def _warmup_model(self, iterations: int = 3):
+        """
+        Ejecuta inferencias sobre una imagen negra del tamaño típico del ROI para
+        pagar el arranque en frío (contexto CUDA, autotune de cuDNN, engine)
+        antes del primer frame real.
+        
+        Args:
+            iterations: Cantidad de inferencias de calentamiento
+        """
+        if self.model is None:
+            return
+        
+        h, w, _ = shape = self._roi_bbox_shape(1)
+        dummy = np.zeros(shape, dtype=np.uint8)
+        
+        try:
+            elapsed = 0.0
+            with self._model_lock, _inference_mode():
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    self.model(dummy, verbose=False, conf=0.5)
+                    elapsed = time.perf_counter() - start
+            print(f"🔥 Modelo precalentado ({w}x{h}, última inferencia: {elapsed * 1000:.1f} ms)")
+        except Exception as e:
+            print(f"⚠️ Error en precalentamiento del modelo: {e}")
+        
+        if self._use_gpu_preprocess():
+            self._warmup_gpu_preprocess()
+    
+    def _roi_bbox_shape(self, cam_id: int) -> Tuple[int, int, int]:
+        """Shape (alto, ancho, 3) representativo del ROI: bounding box del polígono o imgsz cuadrado."""
+        imgsz = int(getattr(self.config, 'imgsz', 640))
+        h, w = imgsz, imgsz
+        roi_points = getattr(self.config, f'roi_points_cam{cam_id}', [])
+        if roi_points and len(roi_points) >= 3:
+            pts = np.asarray(roi_points, dtype=np.int32)
+            w = max(32, int(pts[:, 0].max() - pts[:, 0].min()))
+            h = max(32, int(pts[:, 1].max() - pts[:, 1].min()))
+        return h, w, 3
+    
+    def _warmup_gpu_preprocess(self):
+        """
+        Reserva los dos buffers pinned y el canvas de cada cámara con el tamaño
+        de su ROI e infiere una vez con entrada tensor: cudaHostAlloc y el
+        primer paso por el camino GPU no caen sobre frames reales.
+        """
+        try:
+            with self._model_lock, _inference_mode():
+                for cam_id in (1, 2):
+                    dummy = np.zeros(self._roi_bbox_shape(cam_id), dtype=np.uint8)
+                    for _ in range(2):  # Un llenado por slot del doble buffer
+                        tensor, _ = self._gpu_letterbox(dummy, cam_id)
+                    self.model(tensor, verbose=False, conf=0.5)
+            torch.cuda.synchronize()
+            print("🔥 Buffers pinned de subida a GPU reservados")
+        except Exception as e:
+            print(f"⚠️ Error reservando buffers pinned: {e}")
+    
     def stop_detection(self):
         """Detiene el sistema de detección."""
         self.detecting = False
+        self._stop_worker()
+        self._shutdown_save_executor()
+        self._shutdown_broken_executor()
         self.primera_guardada = {1: False, 2: False}
         print("🤖 Detección detenida")
     
+    # --- Worker de inferencia ---
+    
+    def _start_worker(self):
+        """Arranca los threads de inferencia y post-proceso si no están corriendo."""
+        if not self._worker_stop.is_set() and self._worker_thread is not None and self._worker_thread.is_alive():
+            return
+        # Un par anterior ya detenido pero todavía vivo comparte conteo,
+        # historial y PLC con el nuevo: esperar a que termine
+        if not self._join_workers(timeout=10.0):
+            log.error("❌ El worker de detección anterior no terminó: no se arranca uno nuevo")
+            return
+        self._result_slots.clear()
+        stop = self._worker_stop = threading.Event()
+        # Cola nueva por arranque: un post-proceso anterior termina con la suya
+        post_queue = self._post_queue = queue.Queue(maxsize=self.post_queue_size)
+        self._post_thread = threading.Thread(
+            target=self._post_worker, args=(post_queue,), name="DetectionPostWorker", daemon=True
+        )
+        self._post_thread.start()
+        self._worker_thread = threading.Thread(
+            target=self._inference_worker, args=(post_queue, stop), name="DetectionWorker", daemon=True
+        )
+        self._worker_thread.start()
+    
+    def _join_workers(self, timeout: float) -> bool:
+        """
+        Espera a los threads del pipeline; suelta sus referencias solo si
+        terminaron. Devuelve True si no queda ninguno vivo.
+        """
+        alive = False
+        for thread in (self._worker_thread, self._post_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+                alive = alive or thread.is_alive()
+        if not alive:
+            self._worker_thread = None
+            self._post_thread = None
+        return not alive
+    
+    def _stop_worker(self):
+        """Detiene los threads del pipeline y descarta frames pendientes."""
+        self._worker_stop.set()
+        self._frame_ready.set()
+        if not self._join_workers(timeout=2.0):
+            log.warning("⚠️ El worker de detección sigue en una inferencia; terminará solo")
+        self._frame_ready.clear()
+        for q in self._frame_queues.values():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+    
+    def submit_frame(self, frame: np.ndarray, cam_id: int):
+        """
+        Encola un frame para el worker de inferencia. Si ya había uno pendiente
+        para esa cámara se descarta: el worker siempre procesa el más reciente.
+        
+        Args:
+            frame: Frame BGR (el worker lo anota, pasar una copia propia)
+            cam_id: ID de la cámara
+        """
+        q = self._frame_queues.get(cam_id)
+        if q is None:
+            q = self._frame_queues.setdefault(cam_id, queue.Queue(maxsize=1))
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(frame)
+        except queue.Full:
+            pass  # Otro productor ganó la carrera; su frame es igual de reciente
+        self._frame_ready.set()
+    
+    def set_draw_enabled(self, cam_id: int, enabled: bool):
+        """
+        Indica si hay un consumidor (vista o grabación con detecciones) para
+        los frames anotados de la cámara. Sin consumidor, el worker sigue
+        contando y activando el PLC pero no dibuja ROI ni detecciones.
+        """
+        if enabled:
+            self._draw_disabled.discard(cam_id)
+        else:
+            self._draw_disabled.add(cam_id)
+    
+    def get_result_if_new(self, cam_id: int, last_seq: int) -> Optional[Tuple[np.ndarray, Dict, int]]:
+        """
+        Devuelve (frame_anotado, info, seq) si el worker publicó un resultado
+        para la cámara con secuencia distinta de last_seq, o None.
+        """
+        entry = self._result_slots.get(cam_id)
+        if entry is None or entry[2] == last_seq:
+            return None
+        return entry
+    
+    def _inference_worker(self, post_queue: queue.Queue, stop: threading.Event):
+        """
+        Loop del worker: toma el último frame de cada cámara, los infiere
+        juntos en una sola llamada al modelo y pasa el lote al thread de
+        post-proceso, así la inferencia del siguiente frame se solapa con
+        el conteo y el dibujo del anterior.
+        """
+        while not stop.is_set():
+            if not self._frame_ready.wait(timeout=0.5):
+                continue
+            self._frame_ready.clear()
+            if stop.is_set():
+                break
+            
+            items = []
+            for cam_id, q in list(self._frame_queues.items()):
+                try:
+                    items.append((q.get_nowait(), cam_id))
+                except queue.Empty:
+                    pass
+            if not items:
+                continue
+            
+            # Solo se dibuja para cámaras con alguien mirando o grabando
+            draws = [cam_id not in self._draw_disabled for _, cam_id in items]
+            try:
+                stage = self._infer_frames(items, draws)
+            except Exception as e:
+                log.error("❌ Error en worker de detección: %s", e)
+                continue
+            
+            # Sin descartar: cada lote inferido debe contarse y activar el PLC.
+            # Si el post-proceso se atrasa, esperar aquí hace que la cola de
+            # 1 frame por cámara descarte los frames viejos.
+            while not stop.is_set():
+                try:
+                    post_queue.put(stage, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+        post_queue.put(None)  # Fin del pipeline para el post-proceso
+    
+    def _post_worker(self, post_queue: queue.Queue):
+        """Loop de post-proceso: conteo, PLC, dibujo y publicación del resultado."""
+        while True:
+            stage = post_queue.get()
+            if stage is None:
+                break
+            
+            try:
+                outputs = self._finish_frames(*stage)
+            except Exception as e:
+                log.error("❌ Error en post-proceso de detección: %s", e)
+                continue
+            
+            for (_, cam_id), (frame, info) in zip(stage[0], outputs):
+                self._result_seq += 1
+                self._result_slots[cam_id] = (frame, info, self._result_seq)
+                if self.result_callback:
+                    try:
+                        self.result_callback(cam_id, frame, info)
+                    except Exception as e:
+                        log.warning("⚠️ Error en callback de resultado: %s", e)
+    
     def is_detecting(self) -> bool:
         """Verifica si la detección está activa."""
         return self.detecting and self.model is not None
@@ -233,6 +756,244 @@ class DetectionHandler:
         Returns:
             Tupla (frame_anotado, info_detecciones)
         """
+        return self.process_frames([(frame, cam_id)], draw_annotations)[0]
+    
+    def process_frames(self, items: List[Tuple[np.ndarray, int]],
+                       draw_annotations: bool = True) -> List[Tuple[np.ndarray, Dict]]:
+        """
+        Procesa varios frames (uno por cámara) con una sola llamada al modelo.
+        
+        Los ROIs se envían juntos como lista: Ultralytics aplica letterbox a
+        cada uno y devuelve las cajas en coordenadas de cada ROI, así que el
+        post-proceso es el mismo que en process_frame.
+        
+        Args:
+            items: Lista de tuplas (frame, cam_id)
+            draw_annotations: Si dibujar las anotaciones
+            
+        Returns:
+            Lista de tuplas (frame_anotado, info_detecciones) en el mismo orden
+        """
+        return self._finish_frames(*self._infer_frames(items, draw_annotations))
+    
+    def _infer_frames(self, items: List[Tuple[np.ndarray, int]],
+                      draw_annotations) -> tuple:
+        """
+        Etapa de inferencia de process_frames: ROI de cada frame y una sola
+        llamada al modelo para los que no reutilizan el resultado anterior.
+        
+        Args:
+            items: Lista de tuplas (frame, cam_id)
+            draw_annotations: bool para todos los frames o lista con uno por frame
+        
+        Returns:
+            Tupla (items, contexts, results, to_infer, detecting) para
+            _finish_frames; cada contexto guarda si su frame se dibuja
+        """
+        if isinstance(draw_annotations, bool):
+            draw_annotations = [draw_annotations] * len(items)
+        contexts = []
+        for (frame, cam_id), draw in zip(items, draw_annotations):
+            ctx = self._prepare_frame(frame, cam_id, draw)
+            ctx['draw'] = draw
+            contexts.append(ctx)
+        
+        detecting = self.is_detecting()
+        # Índices que necesitan inferencia (el resto reutiliza el resultado anterior)
+        to_infer = [i for i, ((_, cam_id), ctx) in enumerate(zip(items, contexts))
+                    if not (detecting and self._can_reuse_result(cam_id, ctx))]
+        
+        results = {}
+        if detecting and to_infer:
+            try:
+                if self._use_gpu_preprocess():
+                    # ROIs ya letterboxeados en GPU, apilados en un solo tensor
+                    sources = []
+                    for i in to_infer:
+                        tensor, contexts[i]['letterbox'] = self._gpu_letterbox(
+                            contexts[i]['roi_frame'], items[i][1]
+                        )
+                        sources.append(tensor)
+                    batched = [torch.cat(sources) if len(sources) > 1 else sources[0]]
+                else:
+                    sources = [contexts[i]['roi_frame'] for i in to_infer]
+                    batched = [sources]
+                # Engines de batch fijo 1: una llamada por ROI
+                calls = batched if self._batch_ok or len(sources) == 1 else sources
+                conf = getattr(self.config, 'min_confidence', 0.5)
+                batch = []
+                with self._model_lock, _inference_mode():
+                    for source in calls:
+                        batch.extend(self.model(source, verbose=False, conf=conf))
+                results = dict(zip(to_infer, batch))
+            except Exception as e:
+                log.error("❌ Error en detección: %s", e)
+        return items, contexts, results, to_infer, detecting
+    
+    def _finish_frames(self, items: List[Tuple[np.ndarray, int]], contexts: List[Dict[str, Any]],
+                       results: Dict[int, Any], to_infer: List[int],
+                       detecting: bool) -> List[Tuple[np.ndarray, Dict]]:
+        """
+        Etapa de post-proceso de process_frames: conteo, PLC y dibujo de
+        cada frame con el resultado de _infer_frames.
+        """
+        outputs = []
+        for i, ((frame, cam_id), ctx) in enumerate(zip(items, contexts)):
+            if detecting and i not in to_infer:
+                outputs.append(self._reuse_result(frame, cam_id, ctx['draw']))
+                continue
+            output = self._finish_frame(frame, cam_id, ctx, results.get(i), ctx['draw'])
+            if i in results:
+                self._remember_result(cam_id, ctx, output[1])
+            outputs.append(output)
+        self._flush_plc()
+        return outputs
+    
+    def _flush_plc(self):
+        """Envía al PLC, agrupados, los pulsos encolados en este lote."""
+        if not self.plc_service:
+            return
+        try:
+            self.plc_service.flush()
+        except Exception as e:
+            log.error("❌ Error enviando pulsos al PLC: %s", e)
+    
+    def _roi_thumbnail(self, roi_frame: np.ndarray) -> Optional[np.ndarray]:
+        """Miniatura 8x8 en gris del ROI (int16 para restar sin desbordes)."""
+        if roi_frame.size == 0:
+            return None
+        small = cv2.resize(roi_frame, (8, 8), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+    
+    def _can_reuse_result(self, cam_id: int, ctx: Dict[str, Any]) -> bool:
+        """
+        True si el ROI es casi igual al último inferido y todavía no se agotó
+        el máximo de reusos seguidos. Guarda la miniatura en ctx.
+        """
+        threshold = int(getattr(self.config, 'frame_skip_threshold', 0))
+        if threshold <= 0:
+            return False
+        thumb = self._roi_thumbnail(ctx['roi_frame'])
+        ctx['thumb'] = thumb
+        state = self._skip_state.get(cam_id)
+        if thumb is None or state is None or state[0].shape != thumb.shape:
+            return False
+        if state[2] >= int(getattr(self.config, 'frame_skip_max_reuse', 5)):
+            return False
+        return int(np.abs(thumb - state[0]).sum()) < threshold
+    
+    def _remember_result(self, cam_id: int, ctx: Dict[str, Any], info: Dict):
+        """Guarda la miniatura y el resultado del último frame inferido."""
+        thumb = ctx.get('thumb')
+        if thumb is None:
+            # Salto desactivado o miniatura no calculada
+            if int(getattr(self.config, 'frame_skip_threshold', 0)) <= 0:
+                return
+            thumb = self._roi_thumbnail(ctx['roi_frame'])
+            if thumb is None:
+                return
+        self._skip_state[cam_id] = [thumb, info, 0]
+    
+    def _reuse_result(self, frame: np.ndarray, cam_id: int,
+                      draw_annotations: bool) -> Tuple[np.ndarray, Dict]:
+        """
+        Devuelve el resultado anterior para un frame casi idéntico, sin
+        inferencia y sin volver a contar, grabar ni activar el PLC.
+        """
+        state = self._skip_state[cam_id]
+        state[2] += 1
+        now = datetime.now()
+        result_info = dict(state[1])
+        result_info['detections'] = [dict(d, timestamp=now) for d in state[1].get('detections', [])]
+        result_info['plc_triggered'] = False
+        result_info['reused'] = True
+        # Sin cambios en el ROI no hay desplazamiento de piezas
+        self.linea_en_movimiento[cam_id] = False
+        result_info['linea_en_movimiento'] = False
+        
+        if draw_annotations:
+            self._draw_detections(frame, result_info['detections'], cam_id)
+        return frame, result_info
+    
+    def _use_gpu_preprocess(self) -> bool:
+        """True si gpu_preprocess está activo y hay CUDA disponible."""
+        if not getattr(self.config, 'gpu_preprocess', False):
+            return False
+        if self._gpu_preprocess_ok is None:
+            self._gpu_preprocess_ok = bool(TORCH_AVAILABLE and torch.cuda.is_available())
+            if not self._gpu_preprocess_ok:
+                print("⚠️ gpu_preprocess activo pero CUDA no está disponible: se usa el preprocesamiento de Ultralytics")
+        return self._gpu_preprocess_ok
+    
+    def _gpu_letterbox(self, roi_frame: np.ndarray, cam_id: int) -> Tuple[Any, Tuple[float, int, int, int, int]]:
+        """
+        Sube el ROI a la GPU como uint8 (1 byte/píxel) desde un buffer pinned,
+        en un stream de copia separado, y hace allí el letterbox: BGR->RGB,
+        /255, resize y padding a imgsz.
+        
+        Ultralytics no aplica letterbox a entradas tensor y devuelve las cajas
+        en coordenadas del tensor, por eso se devuelven los parámetros para
+        deshacer la transformación en _extract_boxes.
+        
+        Returns:
+            Tupla (tensor 1x3xSxS en GPU, (escala, pad_x, pad_y, ancho_roi, alto_roi))
+        """
+        h, w = roi_frame.shape[:2]
+        size = int(getattr(self.config, 'imgsz', 640))
+        
+        ring = self._pinned_buffers.get(cam_id)
+        if ring is None:
+            ring = self._pinned_buffers[cam_id] = [[None, None], 0, [None, None]]
+        buffers, slot, events = ring
+        slot ^= 1
+        ring[1] = slot
+        
+        # No reescribir el buffer mientras su copia anterior siga en vuelo
+        if events[slot] is not None:
+            events[slot].synchronize()
+        pin = buffers[slot]
+        if pin is None or tuple(pin.shape) != roi_frame.shape:
+            pin = buffers[slot] = torch.empty(roi_frame.shape, dtype=torch.uint8, pin_memory=True)
+        np.copyto(pin.numpy(), roi_frame)
+        
+        # Subida en un stream propio: el cómputo del ROI anterior (resize,
+        # inferencia) sigue en el stream actual mientras se copia este
+        if self._upload_stream is None:
+            self._upload_stream = torch.cuda.Stream()
+        compute_stream = torch.cuda.current_stream()
+        with torch.cuda.stream(self._upload_stream):
+            img = pin.to('cuda', non_blocking=True)
+            uploaded = torch.cuda.Event()
+            uploaded.record(self._upload_stream)
+        events[slot] = uploaded
+        compute_stream.wait_event(uploaded)
+        img.record_stream(compute_stream)
+        
+        img = img.permute(2, 0, 1).flip(0).unsqueeze(0).half().div_(255.0)
+        
+        scale = min(size / h, size / w)
+        nh, nw = max(1, round(h * scale)), max(1, round(w * scale))
+        if (nh, nw) != (h, w):
+            img = F.interpolate(img, size=(nh, nw), mode='bilinear', align_corners=False)
+        
+        canvas = self._gpu_canvas.get(cam_id)
+        if canvas is None or canvas.shape[-1] != size:
+            canvas = torch.empty((1, 3, size, size), dtype=torch.float16, device='cuda')
+            self._gpu_canvas[cam_id] = canvas
+        pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+        canvas.fill_(114 / 255.0)
+        canvas[:, :, pad_y:pad_y + nh, pad_x:pad_x + nw] = img
+        return canvas, (scale, pad_x, pad_y, w, h)
+    
+    def _prepare_frame(self, frame: np.ndarray, cam_id: int,
+                       draw_annotations: bool) -> Dict[str, Any]:
+        """
+        Calcula el ROI de la cámara, lo dibuja si corresponde y recorta la
+        vista que se envía al modelo.
+        
+        Returns:
+            Diccionario con roi_coords, roi_polygon, roi_polyline, roi_mask y roi_frame
+        """
         h, w = frame.shape[:2]
         
         # Calcular ROI
@@ -241,133 +1002,145 @@ class DetectionHandler:
         # Verificar si hay puntos de ROI definidos (polígono)
         roi_points = getattr(self.config, f"roi_points_cam{cam_id}", [])
         roi_polygon = None
+        roi_polyline = None
+        roi_mask = None
         
         if roi_points and len(roi_points) >= 3:
             try:
-                # Polígono arbitrario
-                pts = np.array(roi_points, np.int32)
-                # Calcular bounding rect para el recorte
-                x_min = int(np.min(pts[:, 0]))
-                y_min = int(np.min(pts[:, 1]))
-                x_max = int(np.max(pts[:, 0]))
-                y_max = int(np.max(pts[:, 1]))
-                
-                # Asegurar límites
-                x_min = max(0, x_min)
-                y_min = max(0, y_min)
-                x_max = min(w, x_max)
-                y_max = min(h, y_max)
-                
-                roi_coords = (x_min, y_min, x_max, y_max)
+                # Polígono arbitrario (arrays y bounding rect cacheados por cámara)
+                roi_coords, roi_polyline, roi_mask = self._get_roi_polygon_cache(cam_id, roi_points, w, h)
                 roi_polygon = roi_points # Lista de puntos [x,y]
                 
             except Exception as e:
-                print(f"Error ROI Points: {e}")
+                log.error("Error ROI Points: %s", e)
                 roi_coords = calcular_roi_coords(cam_id, w, h, roi_config['scale'], roi_config['offset_x'])
         else:
             # ROI Rectangular vertical (Legacy)
             roi_coords = calcular_roi_coords(cam_id, w, h, roi_config['scale'], roi_config['offset_x'])
         
-        # Información de resultado
-        result_info = {
-            'num_detections': 0,
-            'plc_triggered': False,
-            'operator_detected': False,
-            'broken_pieces': 0,
-            'detections': []
-        }
+        # Muestra de calibración antes de dibujar el contorno del ROI
+        self._save_calibration_sample(frame, cam_id, roi_coords)
         
         # Dibujar ROI
         if draw_annotations:
             if roi_polygon:
                 # Dibujar polígono
-                pts = np.array(roi_polygon, np.int32)
-                pts = pts.reshape((-1, 1, 2))
-                cv2.polylines(frame, [pts], True, (255, 255, 0), 2)
+                cv2.polylines(frame, [roi_polyline], True, (255, 255, 0), 2)
             else:
                 # Dibujar rectángulo simple
                 cv2.rectangle(frame, (roi_coords[0], roi_coords[1]), 
                              (roi_coords[2], roi_coords[3]), (255, 255, 0), 2)
         
-        # Ejecutar detección si está activa
-        if self.is_detecting():
+        # Recortar frame al ROI para reducir falsos positivos y acelerar la inferencia
+        x1_roi, y1_roi, x2_roi, y2_roi = roi_coords
+        # Vista sin copia: el letterbox de Ultralytics ya genera su propio buffer
+        roi_frame = frame[y1_roi:y2_roi, x1_roi:x2_roi]
+        
+        return {
+            'roi_coords': roi_coords,
+            'roi_polygon': roi_polygon,
+            'roi_polyline': roi_polyline,
+            'roi_mask': roi_mask,
+            'roi_frame': roi_frame,
+        }
+    
+    def _finish_frame(self, frame: np.ndarray, cam_id: int, ctx: Dict[str, Any],
+                      result, draw_annotations: bool) -> Tuple[np.ndarray, Dict]:
+        """
+        Post-procesa el resultado YOLO de un frame: conteo, grabación,
+        movimiento de línea y anotaciones.
+        
+        Args:
+            frame: Frame BGR original
+            cam_id: ID de la cámara
+            ctx: Contexto devuelto por _prepare_frame
+            result: Resultado YOLO del ROI (None si no hubo inferencia)
+            draw_annotations: Si dibujar las anotaciones
+            
+        Returns:
+            Tupla (frame_anotado, info_detecciones)
+        """
+        roi_coords = ctx['roi_coords']
+        roi_polygon = ctx['roi_polygon']
+        
+        # Información de resultado
+        result_info = {
+            'num_detections': 0,
+            'plc_triggered': False,
+            'operator_detected': False,
+            'broken_pieces': 0,
+            'detections': []
+        }
+        
+        # Piezas dentro del ROI (movimiento de línea y visualización de quebradas)
+        piezas_roi = []
+        
+        if result is not None:
             try:
-                # Recortar frame al ROI para reducir falsos positivos y acelerar la inferencia
-                x1_roi, y1_roi, x2_roi, y2_roi = roi_coords
-                roi_frame = frame[y1_roi:y2_roi, x1_roi:x2_roi].copy()
-                results = self.model(
-                    roi_frame,
-                    verbose=False,
-                    conf=getattr(self.config, 'min_confidence', 0.5)
+                result_info = self._process_detections(
+                    frame, result, cam_id, roi_coords, draw_annotations, roi_polygon=roi_polygon,
+                    letterbox=ctx.get('letterbox'), roi_mask=ctx.get('roi_mask')
                 )
-                if results and len(results) > 0:
-                    result_info = self._process_detections(
-                        frame, results[0], cam_id, roi_coords, draw_annotations, roi_polygon=roi_polygon
-                    )
+                
+                # Guardar imagen limpia SOLO para clases específicas (excepto pieza y operador)
+                if result_info.get('detections'):
+                    # Filtrar detecciones para grabación (excluir pieza y operador)
+                    detections_to_save = [
+                        d for d in result_info['detections'] 
+                        if d['label_lc'] not in ('pieza', 'operador')
+                    ]
                     
-                    # Guardar imagen limpia SOLO para clases específicas (excepto pieza y operador)
-                    if result_info.get('detections'):
-                        # Filtrar detecciones para grabación (excluir pieza y operador)
-                        detections_to_save = [
-                            d for d in result_info['detections'] 
-                            if d.get('label', '').lower() not in ['pieza', 'operador']
-                        ]
+                    if detections_to_save:
+                        # Aún no se dibujaron las detecciones; cada método de guardado
+                        # copia el frame solo si realmente va a escribir
+                        clean_frame = frame
+                        
+                        # Crear info de detecciones para guardar
+                        save_info = result_info.copy()
+                        save_info['detections'] = detections_to_save
                         
-                        if detections_to_save:
-                            # Hacer una copia del frame limpio (sin anotaciones) para guardar
-                            clean_frame = frame.copy()
-                            
-                            # Crear info de detecciones para guardar
-                            save_info = result_info.copy()
-                            save_info['detections'] = detections_to_save
-                            
-                            # Guardar primera detección (imagen limpia) - solo clases específicas
-                            self._save_first_detection(clean_frame, cam_id, detections_to_save)
-                            
-                            # Guardar detección con timestamp (imagen limpia) - solo clases específicas
-                            self._save_detection_image(clean_frame, cam_id, save_info)
+                        # Guardar primera detección (imagen limpia) - solo clases específicas
+                        self._save_first_detection(clean_frame, cam_id, detections_to_save)
+                        
+                        # Guardar detección con timestamp (imagen limpia) - solo clases específicas
+                        self._save_detection_image(clean_frame, cam_id, save_info)
 
-                    # --- Lógica de desplazamiento de piezas para detectar movimiento de línea ---
-                    piezas_roi = [
-                        d for d in result_info.get('detections', [])
-                        if d.get('label', '').lower() == 'Pieza' and d.get('inside_roi', False)
-                    ]
-                    # Guardar historial de piezas (solo centro)
-                    if piezas_roi:
-                        centros_actuales = [d['center'] for d in piezas_roi]
-                        self.detection_history[cam_id].append(
-                            {'centros': centros_actuales, 'timestamp': datetime.now()}
-                        )
-                        # Mantener historial acotado
-                        if len(self.detection_history[cam_id]) > self.max_history_size:
-                            self.detection_history[cam_id] = self.detection_history[cam_id][-self.max_history_size:]
-                        # Comparar con frame anterior para detectar movimiento
-                        if len(self.detection_history[cam_id]) >= 2:
-                            prev = self.detection_history[cam_id][-2]['centros']
-                            curr = self.detection_history[cam_id][-1]['centros']
-                            movimiento = False
-                            for c1 in prev:
-                                for c2 in curr:
-                                    dist = ((c2[0]-c1[0])**2 + (c2[1]-c1[1])**2)**0.5
-                                    if dist > self.movimiento_umbral_px:
-                                        movimiento = True
-                                        break
-                                if movimiento:
-                                    break
-                            self.linea_en_movimiento[cam_id] = movimiento
-                        else:
-                            self.linea_en_movimiento[cam_id] = False
+                # --- Lógica de desplazamiento de piezas para detectar movimiento de línea ---
+                batch = result_info.get('batch')
+                if batch is not None:
+                    piezas_mask = batch.class_mask(lambda lc: lc == 'pieza') & batch.inside_roi
+                    detections = result_info['detections']
+                    piezas_roi = [detections[i] for i in np.flatnonzero(piezas_mask).tolist()]
+                # Guardar historial de piezas (solo centro)
+                if piezas_roi:
+                    centros_actuales = [d['center'] for d in piezas_roi]
+                    history = self.centros_history.get(cam_id)
+                    if history is None:
+                        history = self.centros_history[cam_id] = deque(maxlen=self.max_history_size)
+                    # El deque descarta solo las entradas más antiguas
+                    history.append({'centros': centros_actuales, 'timestamp': datetime.now()})
+                    # Comparar con frame anterior para detectar movimiento
+                    if len(history) >= 2:
+                        prev = np.asarray(history[-2]['centros'], dtype=np.int32)
+                        curr = np.asarray(history[-1]['centros'], dtype=np.int32)
+                        movimiento = False
+                        if prev.size and curr.size:
+                            # Distancias al cuadrado de todos los pares (prev x curr)
+                            d2 = ((prev[:, None, :] - curr[None, :, :]) ** 2).sum(-1)
+                            movimiento = bool((d2 > self.movimiento_umbral_px ** 2).any())
+                        self.linea_en_movimiento[cam_id] = movimiento
                     else:
                         self.linea_en_movimiento[cam_id] = False
-                    result_info['linea_en_movimiento'] = self.linea_en_movimiento[cam_id]
-                        
+                else:
+                    self.linea_en_movimiento[cam_id] = False
+                result_info['linea_en_movimiento'] = self.linea_en_movimiento[cam_id]
+                    
             except Exception as e:
-                print(f"❌ Error en detección: {e}")
+                log.error("❌ Error en detección: %s", e)
         
         # Dibujar detecciones DESPUÉS del tracking
         if draw_annotations and result_info.get('detections'):
-            for detection in result_info['detections']:
-                self._draw_detection(frame, detection, cam_id)
+            self._draw_detections(frame, result_info['detections'], cam_id)
         
         # === VISUALIZACIÓN AVANZADA DE PIEZAS QUEBRADAS ===
         if (draw_annotations and 
@@ -375,11 +1148,8 @@ class DetectionHandler:
             
             broken_analysis = result_info['broken_analysis']
             
-            # Extraer fragmentos de las detecciones para visualización
-            piece_detections = [
-                d for d in result_info.get('detections', [])
-                if d.get('label', '').lower() == 'pieza' and d.get('inside_roi', False)
-            ]
+            # Fragmentos para visualización: las mismas piezas dentro del ROI
+            piece_detections = piezas_roi
             
             if piece_detections:
                 # Convertir a FragmentInfo para visualización
@@ -407,6 +1177,121 @@ class DetectionHandler:
         
         return frame, result_info
     
+    def _submit_image_write(self, filepath: str, image: np.ndarray, message: str = None) -> bool:
+        """
+        Encola la escritura de una imagen en el thread de guardado.
+        La imagen debe ser propia (no se modifica después de encolarla).
+        
+        Returns:
+            True si se encoló, False si se descartó por haber demasiadas pendientes
+        """
+        with self._save_lock:
+            if self._save_pending >= self.max_pending_saves:
+                return False
+            self._save_pending += 1
+            if self._save_executor is None:
+                self._save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DetectionSave")
+            executor = self._save_executor
+        
+        executor.submit(self._write_image, filepath, image, message)
+        return True
+    
+    def _write_image(self, filepath: str, image: np.ndarray, message: str = None):
+        """Escribe la imagen en disco (ejecutado en el thread de guardado)."""
+        try:
+            if not cv2.imwrite(filepath, image):
+                log.error("❌ No se pudo escribir la imagen: %s", filepath)
+            elif message:
+                log.info(message)
+        except Exception as e:
+            log.error("❌ Error guardando imagen %s: %s", filepath, e)
+        finally:
+            with self._save_lock:
+                self._save_pending -= 1
+    
+    def _shutdown_save_executor(self):
+        """Espera las escrituras pendientes y libera el thread de guardado."""
+        with self._save_lock:
+            executor = self._save_executor
+            self._save_executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _submit_broken_analysis(self, detections: List[Dict], cam_id: int):
+        """
+        Lanza el análisis avanzado de piezas quebradas en su thread. Recibe
+        copias de los dicts: el pipeline sigue modificando los originales.
+        """
+        with self._save_lock:
+            if self._broken_executor is None:
+                self._broken_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="BrokenAnalysis")
+            executor = self._broken_executor
+        self._broken_futures[cam_id] = executor.submit(
+            self.broken_piece_analyzer.analyze_detections, [dict(d) for d in detections], cam_id
+        )
+    
+    def _collect_broken_analysis(self, info: Dict, cam_id: int):
+        """
+        Aplica a info el análisis de quebradas pendiente de la cámara: contador
+        y PLC. Espera al thread solo si el análisis anterior no terminó aún.
+        """
+        future = self._broken_futures.pop(cam_id, None)
+        if future is None:
+            return
+        try:
+            broken_analysis = future.result()
+        except Exception as e:
+            log.error("❌ Error en análisis de piezas quebradas: %s", e)
+            return
+        
+        if broken_analysis.get('broken_pieces_detected', False):
+            log.info("🔧 ANÁLISIS AVANZADO: Pieza quebrada detectada en Cam%d", cam_id)
+            log.debug("   Método: %s", broken_analysis.get('analysis_method', 'unknown'))
+            log.debug("   Confianza: %.2f", broken_analysis.get('confidence_score', 0.0))
+            # Actualizar contador con análisis avanzado
+            info['broken_pieces'] = broken_analysis.get('fragment_count', info['broken_pieces'])
+            info['broken_analysis'] = broken_analysis
+            # Activar PLC para pieza quebrada si está configurado
+            pq_enabled, pq_address, pq_pulse_ms, pq_value = self._pq_plc_cfg
+            if pq_enabled and self.plc_service:
+                try:
+                    self.plc_service.queue_pulse(
+                        pq_address,
+                        pq_pulse_ms,
+                        pq_value,
+                        cam_id,
+                        class_name="pieza_quebrada"
+                    )
+                    log.info("🔧 PLC activado para pieza quebrada (registro %s)", pq_address)
+                except Exception as e:
+                    log.error("❌ Error activando PLC para pieza quebrada: %s", e)
+    
+    def _shutdown_broken_executor(self):
+        """Descarta los análisis pendientes y libera el thread de análisis."""
+        with self._save_lock:
+            executor = self._broken_executor
+            self._broken_executor = None
+        self._broken_futures.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _save_calibration_sample(self, frame: np.ndarray, cam_id: int, roi_coords):
+        """
+        Guarda cada calib_sample_interval_s un recorte limpio del ROI (sin
+        anotaciones) en calib_dir, para la calibración INT8 del modelo.
+        """
+        now = time.monotonic()
+        if now < self._calib_next.get(cam_id, 0.0) or not self.is_detecting():
+            return
+        x1, y1, x2, y2 = roi_coords
+        if x2 <= x1 or y2 <= y1:
+            return
+        slot = self._calib_slot.get(cam_id, 0)
+        filepath = os.path.join(self.calib_dir, f"calib_c{cam_id}_{slot:03d}.jpg")
+        if self._submit_image_write(filepath, frame[y1:y2, x1:x2].copy()):
+            self._calib_slot[cam_id] = (slot + 1) % INT8_CALIB_MAX_IMAGES
+            self._calib_next[cam_id] = now + self.calib_sample_interval_s
+    
     def _save_first_detection(self, frame: np.ndarray, cam_id: int, detections: List[Dict]):
         """
         Guarda la imagen de la primera detección de la sesión.
@@ -426,12 +1311,11 @@ class DetectionHandler:
                  cv2.rectangle(draw_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
                  cv2.putText(draw_frame, d['label'], (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
 
-            cv2.imwrite(filepath, draw_frame)
-            print(f"📸 Primera detección guardada: {filename}")
-            self.primera_guardada[cam_id] = True
+            if self._submit_image_write(filepath, draw_frame, f"📸 Primera detección guardada: {filename}"):
+                self.primera_guardada[cam_id] = True
             
         except Exception as e:
-            print(f"❌ Error guardando primera detección: {e}")
+            log.error("❌ Error guardando primera detección: %s", e)
 
     def _save_detection_image(self, frame: np.ndarray, cam_id: int, info: Dict):
         """
@@ -457,10 +1341,10 @@ class DetectionHandler:
                  x1, y1, x2, y2 = d['bbox']
                  cv2.rectangle(draw_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
                  
-            cv2.imwrite(filepath, draw_frame)
+            self._submit_image_write(filepath, draw_frame)
             
         except Exception as e:
-            print(f"❌ Error guardando imagen de detección: {e}") 
+            log.error("❌ Error guardando imagen de detección: %s", e)
     
     def process_frame_optimized(self, frame: np.ndarray, cam_id: int) -> Tuple[None, Dict]:
         """
@@ -500,54 +1384,46 @@ class DetectionHandler:
         try:
             # Ejecutar detección YOLO solo sobre el ROI para minimizar latencia
             x1_roi, y1_roi, x2_roi, y2_roi = roi_coords
-            roi_frame = frame[y1_roi:y2_roi, x1_roi:x2_roi].copy()
-            result = self.model(
-                roi_frame,
-                verbose=False,
-                conf=getattr(self.config, 'min_confidence', 0.5)
-            )[0]
+            roi_frame = frame[y1_roi:y2_roi, x1_roi:x2_roi]
+            with self._model_lock, _inference_mode():
+                result = self.model(
+                    roi_frame,
+                    verbose=False,
+                    conf=getattr(self.config, 'min_confidence', 0.5)
+                )[0]
             
             if result.boxes is None:
                 return None, result_info
             
             # Procesar detecciones SOLO para lógica, sin dibujos
-            names = self.model.names
+            arrays = self._extract_box_arrays(result, roi_coords)
+            if arrays is None:
+                return None, result_info
+            xyxy, confs, clss, min_confs, table = arrays
             
-            for box in result.boxes:
-                # Extraer información básica (coordenadas relativas al ROI -> ajustar al frame completo)
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                x1 += x1_roi
-                x2 += x1_roi
-                y1 += y1_roi
-                y2 += y1_roi
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                # Obtener nombre de clase y aplicar umbral específico
-                label = names.get(cls, str(cls)) if isinstance(names, dict) else names[cls]
-                min_conf = self._get_min_conf_for_label(label)
-                if conf < min_conf:
-                    continue
-                
-                # Calcular centro (más rápido)
+            # Umbral, ROI (operador en todo el frame) y heurística de quebrada
+            # para todas las cajas en una sola llamada compilada
+            operator_cls = next((c for c, t in table.items() if t[1] == "operador"), -1)
+            keep, inside, broken = det_numba.classify_boxes(
+                xyxy, confs, clss, min_confs, operator_cls, *roi_coords
+            )
+            
+            # Solo contar detecciones dentro del ROI
+            for i in np.flatnonzero(inside).tolist():
+                x1, y1, x2, y2 = xyxy[i].tolist()
+                conf = float(confs[i])
+                label, label_lc, _ = table[int(clss[i])]
                 cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                
-                # Verificar ROI (operador en todo el frame)
-                if label.lower() == "operador":
-                    inside_roi = True
+                inside_roi = True
+                if label_lc == "operador":
                     result_info['operator_detected'] = True
-                else:
-                    inside_roi = punto_en_roi(cx, cy, roi_coords)
-                
-                # Solo contar detecciones dentro del ROI
-                if not inside_roi and label.lower() != "operador":
-                    continue
                 
                 result_info['detections'] += 1
                 
                 # Agregar a la lista de detecciones
                 detection_data = {
                     'label': label,
+                    'label_lc': label_lc,
                     'confidence': conf,
                     'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
                     'cx': cx, 'cy': cy,
@@ -556,55 +1432,112 @@ class DetectionHandler:
                 result_info['detection_list'].append(detection_data)
                 
                 # Detección rápida de piezas quebradas (solo cámara 1)
-                if cam_id == 1 and label.lower() != "operador":
-                    # Análisis básico sin visualización
-                    width_px, height_px = x2 - x1, y2 - y1
-                    aspect_ratio = width_px / max(height_px, 1)
-                    
-                    # Criterios básicos para pieza quebrada
-                    if (aspect_ratio > 3.0 or aspect_ratio < 0.3 or 
-                        width_px < 20 or height_px < 20):
+                if cam_id == 1 and label_lc != "operador":
+                    detection_data['is_broken'] = bool(broken[i])
+                    if broken[i]:
                         result_info['broken_pieces'] += 1
-                        detection_data['is_broken'] = True
-                    else:
-                        detection_data['is_broken'] = False
                 
-                # Log simplificado para debugging
-                if self.config.verbose_mode:
-                    print(f"Detección optimizada - Cam{cam_id}: {label} (conf: {conf:.2f})")
+                # Log simplificado para debugging (visible con verbose_mode)
+                log.debug("Detección optimizada - Cam%d: %s (conf: %.2f)", cam_id, label, conf)
             
             # Trigger PLC si hay detecciones válidas
             if result_info['detections'] > 0:
                 result_info['plc_triggered'] = True
                 
-                # Agregar al historial simplificado
-                if cam_id not in self.detection_history:
-                    self.detection_history[cam_id] = []
+                # Agregar al historial simplificado (últimas 100 detecciones)
+                history = self.optimized_history.get(cam_id)
+                if history is None:
+                    history = self.optimized_history[cam_id] = deque(maxlen=self.optimized_history_size)
                 
-                # Mantener historial limitado (últimas 100 detecciones)
-                if len(self.detection_history[cam_id]) > 100:
-                    self.detection_history[cam_id] = self.detection_history[cam_id][-50:]
-                
-                # Agregar detecciones al historial
+                # Agregar detecciones al historial (mismo timestamp para todo el frame)
+                frame_t = time.time()
                 for detection in result_info['detection_list']:
-                    self.detection_history[cam_id].append({
-                        'timestamp': time.time(),
+                    history.append({
+                        'timestamp': frame_t,
                         'label': detection['label'],
                         'confidence': detection['confidence'],
                         'cam_id': cam_id
                     })
         
         except Exception as e:
-            print(f"❌ Error en proceso optimizado: {e}")
+            log.error("❌ Error en proceso optimizado: %s", e)
         
         return None, result_info
     
+    def _extract_boxes(self, result, roi_coords: Tuple[int, int, int, int],
+                       letterbox: tuple = None) -> List[tuple]:
+        """
+        Extrae las cajas de un resultado YOLO en una sola transferencia a CPU,
+        las desplaza al frame completo y descarta las que no superan el umbral
+        de su clase.
+        
+        Args:
+            result: Resultado YOLO (coordenadas relativas al ROI)
+            roi_coords: (x1, y1, x2, y2) del ROI dentro del frame
+            letterbox: Parámetros de _gpu_letterbox si la entrada fue un tensor
+            
+        Returns:
+            Lista de tuplas (x1, y1, x2, y2, conf, label, label_lc)
+        """
+        arrays = self._extract_box_arrays(result, roi_coords, letterbox)
+        if arrays is None:
+            return []
+        xyxy, confs, clss, min_confs, table = arrays
+        
+        survivors = []
+        for i in np.flatnonzero(confs >= min_confs).tolist():
+            x1, y1, x2, y2 = xyxy[i].tolist()
+            label, label_lc, _ = table[int(clss[i])]
+            survivors.append((x1, y1, x2, y2, float(confs[i]), label, label_lc))
+        return survivors
+    
+    def _extract_box_arrays(self, result, roi_coords: Tuple[int, int, int, int],
+                            letterbox: tuple = None) -> Optional[tuple]:
+        """
+        Arrays de cajas de un resultado YOLO (ver _extract_boxes), sin filtrar.
+        
+        Returns:
+            Tupla (xyxy int32 Nx4 en el frame, confs, clss, min_confs, tabla
+            cls -> (label, label_lc, min_conf)) o None si no hay cajas
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return None
+        
+        xyxy = boxes.xyxy.detach().cpu().numpy()
+        if letterbox is not None:
+            # Deshacer el letterbox hecho en GPU: tensor -> coordenadas del ROI
+            scale, pad_x, pad_y, roi_w, roi_h = letterbox
+            xyxy = (xyxy - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / scale
+            xyxy = np.clip(xyxy, 0, [roi_w, roi_h, roi_w, roi_h])
+        xyxy = xyxy.astype(np.int32)
+        confs = boxes.conf.detach().cpu().numpy()
+        clss = boxes.cls.detach().cpu().numpy().astype(np.int32)
+        
+        # Ajustar al frame completo usando las coordenadas del ROI
+        x_offset, y_offset = roi_coords[0], roi_coords[1]
+        xyxy += np.array([x_offset, y_offset, x_offset, y_offset], dtype=np.int32)
+        
+        # Etiqueta y umbral una vez por clase presente en el frame
+        names = self.model.names
+        table = {}
+        for cls in np.unique(clss).tolist():
+            label = names.get(cls, str(cls)) if isinstance(names, dict) else names[cls]
+            label_lc = label.lower()
+            table[cls] = (label, label_lc, self._get_min_conf_for_label(label_lc))
+        min_confs = np.array([table[c][2] for c in clss.tolist()], dtype=np.float32)
+        return xyxy, confs.astype(np.float32), clss, min_confs, table
+    
     def _process_detections(self, frame: np.ndarray, result,
                            cam_id: int,
                            roi_coords: Tuple[int, int, int, int],
                            draw_annotations: bool,
-                           roi_polygon: list = None) -> Dict:
+                           roi_polygon: list = None,
+                           letterbox: tuple = None,
+                           roi_mask: np.ndarray = None) -> Dict:
         """Procesa las detecciones de YOLO."""
+        # Un solo timestamp para todas las detecciones del frame
+        frame_ts = datetime.now()
         info = {
             'num_detections': 0,
             'plc_triggered': False,
@@ -613,55 +1546,51 @@ class DetectionHandler:
             'detections': []
         }
         
-        if result.boxes is None:
+        # Cajas ya filtradas por umbral de clase y ajustadas al frame completo
+        arrays = self._extract_box_arrays(result, roi_coords, letterbox)
+        if arrays is None:
+            if cam_id == 1:
+                # Sin cajas igual se aplica el análisis de quebradas pendiente
+                self._collect_broken_analysis(info, cam_id)
             return info
+        batch = DetectionBatch.from_arrays(*arrays)
         
-        names = self.model.names
-        detection_list = []
-        
-        for box in result.boxes:
-            # Extraer información de la detección (coordenadas relativas al ROI -> ajustar al frame completo)
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            # Ajustar al frame completo usando las coordenadas del ROI
-            x_offset, y_offset, _, _ = roi_coords
-            x1 += x_offset
-            x2 += x_offset
-            y1 += y_offset
-            y2 += y_offset
-            conf = float(box.conf[0])
-            cls = int(box.cls[0])
-            
-            # Obtener nombre de clase y aplicar umbral específico
-            label = names.get(cls, str(cls)) if isinstance(names, dict) else names[cls]
-            min_conf = self._get_min_conf_for_label(label)
-            if conf < min_conf:
-                continue
-            
-            # Calcular centro y dimensiones
-            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-            width_px, height_px = x2 - x1, y2 - y1
-            
-            # Verificar si está en ROI (operador se detecta en todo el frame)
-            if label.lower() == "operador":
-                inside_roi = True
-                info['operator_detected'] = True
-            else:
-                inside_roi = punto_en_roi(cx, cy, roi_polygon if roi_polygon else roi_coords)
-            
-            # Solo procesar detecciones dentro del ROI (excepto operador)
-            if not inside_roi and label.lower() != "operador":
-                continue
-            
-            info['num_detections'] += 1
-            
+        # Verificar si está en ROI (operador se detecta en todo el frame)
+        is_operator = batch.class_mask(lambda lc: lc == "operador")
+        rx1, ry1, rx2, ry2 = roi_coords
+        cx, cy = batch.center[:, 0], batch.center[:, 1]
+        if roi_polygon and roi_mask is not None:
+            # Lookup en la máscara precalculada del polígono (relativa al bounding rect)
+            lx, ly = cx - rx1, cy - ry1
+            valid = (lx >= 0) & (ly >= 0) & (lx < roi_mask.shape[1]) & (ly < roi_mask.shape[0])
+            in_roi = np.zeros(len(batch), dtype=bool)
+            in_roi[valid] = roi_mask[ly[valid], lx[valid]]
+        elif roi_polygon:
+            in_roi = np.array([punto_en_roi(x, y, roi_polygon) for x, y in batch.center.tolist()],
+                              dtype=bool)
+        else:
+            in_roi = (rx1 <= cx) & (cx <= rx2) & (ry1 <= cy) & (cy <= ry2)
+        batch.inside_roi = in_roi | is_operator
+        info['operator_detected'] = bool(is_operator.any())
+        
+        # Solo procesar detecciones dentro del ROI (excepto operador)
+        batch = batch.select(batch.inside_roi)
+        detection_list = batch.to_list_of_dicts()
+        
+        # Alias locales para el loop por detección
+        process_measurements = self._process_measurements
+        check_broken_piece = self._check_broken_piece
+        
+        for i, detection_data in enumerate(detection_list):
             # Procesar mediciones solo en cámara 1
             if cam_id == 1:
-                measurements = self._process_measurements(
-                    label, width_px, height_px, cam_id, inside_roi
-                )
+                label = detection_data['label']
+                label_lc = detection_data['label_lc']
+                x1, y1, x2, y2 = detection_data['bbox']
+                measurements = process_measurements(label, x2 - x1, y2 - y1, cam_id, True, label_lc)
                 
                 # Detectar piezas quebradas solo en cámara 1
-                is_broken = self._check_broken_piece(label, measurements, inside_roi)
+                is_broken = check_broken_piece(label, measurements, True, label_lc)
                 if is_broken:
                     info['broken_pieces'] += 1
             else:
@@ -669,23 +1598,18 @@ class DetectionHandler:
                 measurements = {}
                 is_broken = False
             
-            # Crear información de detección
-            detection_data = {
-                'label': label,
-                'confidence': conf,
-                'bbox': (x1, y1, x2, y2),
-                'center': (cx, cy),
-                'inside_roi': inside_roi,
-                'measurements': measurements,
-                'is_broken': is_broken,
-                'timestamp': datetime.now()
-            }
-            
-            detection_list.append(detection_data)
-            info['detections'].append(detection_data)
+            batch.is_broken[i] = is_broken
+            detection_data['measurements'] = measurements
+            detection_data['is_broken'] = is_broken
+            detection_data['timestamp'] = frame_ts
+            detection_data['track_id'] = -1  # Sin tracking por defecto
             
             # NO dibujar aquí - se dibuja después del tracking
-            
+        
+        info['batch'] = batch
+        info['detections'] = detection_list
+        info['num_detections'] = len(detection_list)
+        
         # ========================================
         # DETECCIÓN DIRECTA + TRACKING PARALELO
         # ========================================
@@ -694,133 +1618,77 @@ class DetectionHandler:
         
         # Procesar detecciones directamente (sin tracking)
         if detection_list:
-            info['detections'] = detection_list
-            info['num_detections'] = len(detection_list)
-            
-            # Procesar cada detección para análisis adicional
-            for detection in detection_list:
-                # Verificar si está en ROI para PLC y alertas
-                label = detection.get('label', '')
-                bbox = detection.get('bbox')
-                
-                if bbox:
-                    x1, y1, x2, y2 = bbox
-                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                    if label.lower() == "operador":
-                        inside_roi = True
-                        info['operator_detected'] = True
-                    else:
-                        inside_roi = punto_en_roi(cx, cy, roi_coords)
-                    detection['inside_roi'] = inside_roi
-                    detection['track_id'] = -1  # Sin tracking por defecto
-                    # Solo procesar para PLC si está dentro del ROI y es cámara 1
-                    if inside_roi and cam_id == 1 and self._should_trigger_plc(label):
-                        self._trigger_plc(label, cam_id)
+            plc_enabled = self.config.plc_enabled
+            if cam_id == 1:
+                # Solo procesar para PLC en cámara 1; inside_roi ya se calculó
+                # una vez al armar el lote (todas las filas están dentro del ROI)
+                for detection in (detection_list if plc_enabled else ()):
+                    if self._should_trigger_plc(detection['label']):
+                        self._trigger_plc(detection['label'], cam_id)
                         info['plc_triggered'] = True
-                    # Activar PLC solo si el modelo detecta explícitamente la clase 'quebrada'
-                    if label.lower() == "quebrada" and inside_roi and cam_id == 1:
-                        detection['is_broken'] = True
-                        info['broken_pieces'] += 1
-                        if self._should_trigger_plc("quebrada"):
-                            self._trigger_plc("quebrada", cam_id)
-                            info['plc_triggered_broken'] = True
+                
+                # Activar PLC solo si el modelo detecta explícitamente la clase 'quebrada'
+                quebradas = np.flatnonzero(batch.class_mask(lambda lc: lc == "quebrada"))
+                for i in quebradas.tolist():
+                    batch.is_broken[i] = True
+                    detection_list[i]['is_broken'] = True
+                    info['broken_pieces'] += 1
+                    if plc_enabled and self._should_trigger_plc("quebrada"):
+                        self._trigger_plc("quebrada", cam_id)
+                        info['plc_triggered_broken'] = True
             
             # === SISTEMA SIMPLIFICADO: SIN TRACKING ===
             # Las detecciones ya están procesadas, no necesitamos tracking
-            
-            # === ANÁLISIS AVANZADO DE PIEZAS QUEBRADAS ===
-            # Solo en cámara 1
-            if self.config.detectar_piezas_quebradas and cam_id == 1:
-                broken_analysis = self.broken_piece_analyzer.analyze_detections(
-                    info['detections'], cam_id
-                )
-                
-                if broken_analysis.get('broken_pieces_detected', False):
-                    print(f"🔧 ANÁLISIS AVANZADO: Pieza quebrada detectada en Cam{cam_id}")
-                    print(f"   Método: {broken_analysis.get('analysis_method', 'unknown')}")
-                    print(f"   Confianza: {broken_analysis.get('confidence_score', 0.0):.2f}")
-                    # Actualizar contador con análisis avanzado
-                    info['broken_pieces'] = broken_analysis.get('fragment_count', info['broken_pieces'])
-                    info['broken_analysis'] = broken_analysis
-                    # Activar PLC para pieza quebrada si está configurado
-                    if (self.config.alertar_pieza_quebrada and 
-                        self.plc_service and 
-                        self.config.plc_enabled):
-                        try:
-                            self.plc_service.pulse(
-                                "register",
-                                self.config.plc_reg_addr_pieza_quebrada,
-                                self.config.plc_pulse_ms,
-                                self.config.plc_reg_pulse_value,
-                                cam_id,
-                                class_name="pieza_quebrada"
-                            )
-                            print(
-                                f"🔧 PLC activado para pieza quebrada "
-                                f"(registro {self.config.plc_reg_addr_pieza_quebrada})"
-                            )
-                        except Exception as e:
-                            print(f"❌ Error activando PLC para pieza quebrada: {e}")
+        
+        # === ANÁLISIS AVANZADO DE PIEZAS QUEBRADAS ===
+        # Solo en cámara 1, en el thread de análisis: se aplica el resultado
+        # del frame anterior y se lanza el de este (un frame de latencia)
+        if cam_id == 1:
+            self._collect_broken_analysis(info, cam_id)
+            if detection_list and self.config.detectar_piezas_quebradas:
+                self._submit_broken_analysis(detection_list, cam_id)
         
         # === CONTEO DIRECTO Y SIMPLIFICADO ===
         # SOLO contar detecciones de cámara 1 (excluir operador)
         if cam_id == 1:
             # Obtener TODAS las detecciones válidas para conteo (EXCEPTO operador)
-            countable_objects = [
-                detection for detection in info['detections']
-                if detection.get('inside_roi', False)
-                and 'operador' not in detection.get('label', '').lower()
-            ]
+            batch = info.get('batch')
+            if batch is not None:
+                countable_idx = np.flatnonzero(
+                    batch.inside_roi & ~batch.class_mask(lambda lc: 'operador' in lc)
+                )
+            else:
+                countable_idx = np.empty(0, dtype=np.intp)
             
-            # print(f"🔍 Cam1: {len(countable_objects)} objetos válidos detectados")
+            # print(f"🔍 Cam1: {len(countable_idx)} objetos válidos detectados")
             
-            if countable_objects:
+            if len(countable_idx):
                 # Sistema simplificado: contar CADA detección válida
-                new_detections = []
                 
-                for obj in countable_objects:
-                    # Crear entrada simple sin tracking
-                    detection_entry = {
-                        'label': obj.get('label', 'Unknown'),
-                        'bbox': obj.get('bbox', [0, 0, 0, 0]),
-                        'confidence': obj.get('confidence', 0.0),
-                        'timestamp': datetime.now(),
+                # Verificar duplicados (misma clase a < DUP_CELL_PX en DUP_WINDOW_S)
+                # con centros y clases del lote, vectorizado
+                now_mono = time.monotonic()
+                is_new = self._filter_duplicates(
+                    cam_id, batch.center[countable_idx], batch.cls_id[countable_idx], now_mono
+                )
+                
+                # Entradas simples sin tracking, directo al historial en una pasada
+                # (los dicts vienen de to_list_of_dicts: todas las claves presentes)
+                detections = info['detections']
+                self._append_history(cam_id, (
+                    {
+                        'label': obj['label'],
+                        'bbox': obj['bbox'],
+                        'confidence': obj['confidence'],
+                        'timestamp': frame_ts,
                         'camera_id': cam_id,
-                        'inside_roi': obj.get('inside_roi', False),
-                        'is_broken': obj.get('is_broken', False),
-                        'measurements': obj.get('measurements', {}),
+                        'inside_roi': obj['inside_roi'],
+                        'is_broken': obj['is_broken'],
+                        'measurements': obj['measurements'],
                         'detection_method': 'direct_simple'
                     }
-                    # Verificar si no es un duplicado muy reciente (mismo frame)
-                    is_duplicate = False
-                    bbox = obj.get('bbox', [0, 0, 0, 0])
-                    cx = (bbox[0] + bbox[2]) // 2
-                    cy = (bbox[1] + bbox[3]) // 2
-                    # Verificar contra las últimas 3 detecciones para evitar duplicados
-                    for recent in self.detection_history.get(cam_id, [])[-3:]:
-                        recent_bbox = recent.get('bbox', [0, 0, 0, 0])
-                        recent_cx = (recent_bbox[0] + recent_bbox[2]) // 2
-                        recent_cy = (recent_bbox[1] + recent_bbox[3]) // 2
-                        # Si está muy cerca y es la misma clase, es probable duplicado
-                        distance = ((cx - recent_cx)**2 + (cy - recent_cy)**2)**0.5
-                        same_label = recent.get('label') == obj.get('label')
-                        time_diff = (datetime.now() - recent.get('timestamp', datetime.now())).total_seconds()
-                        if distance < 30 and same_label and time_diff < 1.0:
-                            is_duplicate = True
-                            break
-                    if not is_duplicate:
-                        new_detections.append(detection_entry)
-                
-                if new_detections:
-                    # Agregar directamente al historial
-                    if cam_id not in self.detection_history:
-                        self.detection_history[cam_id] = []
-                    self.detection_history[cam_id].extend(new_detections)
-                    # print(f"📊 CONTADO: {len(new_detections)} objetos NUEVOS en Cam1")
-                    # for obj in new_detections:
-                    #     label = obj.get('label', 'Unknown')
-                    #     print(f"   ✅ {label.title()} agregado al contador")
-                    # print(f"📊 TOTAL en historial Cam1: {len(self.detection_history[cam_id])}")
+                    for obj in (detections[i] for i in countable_idx[is_new].tolist())
+                ))
         else:
             pass # print(f"📋 Cam{cam_id}: Detecciones no cuentan para historial (solo Cam1)")
         
@@ -828,21 +1696,57 @@ class DetectionHandler:
     
     # Método _add_simple_tracking eliminado - Sistema simplificado SIN tracking
     
+    def _filter_duplicates(self, cam_id: int, centers: np.ndarray, cls_ids: np.ndarray,
+                           now_mono: float) -> np.ndarray:
+        """
+        Marca qué objetos son nuevos para el conteo: no hay otro de la misma
+        clase a menos de DUP_CELL_PX entre los contados en los últimos
+        DUP_WINDOW_S segundos ni entre los ya aceptados de este frame.
+        Los aceptados se agregan al buffer circular de centros recientes.
+        
+        Args:
+            centers: Array (N, 2) int32 de centros
+            cls_ids: Array (N,) int32 de clases
+            now_mono: time.monotonic() del frame
+            
+        Returns:
+            Máscara booleana (N,) de objetos nuevos
+        """
+        ring = self._recent_centers.get(cam_id)
+        if ring is None:
+            size = self.DUP_RING_SIZE
+            ring = self._recent_centers[cam_id] = [
+                np.zeros((size, 2), dtype=np.int32),
+                np.full(size, -1, dtype=np.int32),
+                np.full(size, -np.inf),
+                0,
+            ]
+        rc, rcls, rt, head = ring
+        # Kernel compilado (det_numba): comparación entera contra el radio al
+        # cuadrado; actualiza el buffer circular in situ
+        is_new, ring[3] = det_numba.filter_duplicates(
+            np.ascontiguousarray(centers, dtype=np.int32),
+            np.ascontiguousarray(cls_ids, dtype=np.int32),
+            rc, rcls, rt, head, now_mono,
+            self.DUP_WINDOW_S, self.DUP_CELL_PX * self.DUP_CELL_PX,
+        )
+        return is_new
+    
     def _process_measurements(self, label: str, width_px: float, height_px: float,
-                            cam_id: int, inside_roi: bool) -> Optional[Dict]:
-        """Procesa las mediciones de una detección."""
-        if not self.config.medicion_enabled or not inside_roi:
+                            cam_id: int, inside_roi: bool,
+                            label_lc: str = None) -> Optional[Dict]:
+        """Procesa las mediciones de una detección (label_lc: etiqueta ya en minúsculas)."""
+        cfg = self.config
+        if not cfg.medicion_enabled or not inside_roi:
             return None
         
-        # Obtener escala para la cámara
-        if cam_id == 1:
-            scale = self.config.escala_px_por_mm_cam1
-        else:
-            scale = self.config.escala_px_por_mm_cam2
+        # Factor píxel -> unidades reales precalculado para la cámara
+        factor = self._px_to_real_cam1 if cam_id == 1 else self._px_to_real_cam2
+        units = cfg.medicion_units
         
         # Convertir a unidades reales
-        width_real = pixel_to_real_units(width_px, scale, self.config.medicion_units)
-        height_real = pixel_to_real_units(height_px, scale, self.config.medicion_units)
+        width_real = width_px * factor
+        height_real = height_px * factor
         area_real = width_real * height_real
         
         measurements = {
@@ -851,14 +1755,13 @@ class DetectionHandler:
             'width_real': width_real,
             'height_real': height_real,
             'area_real': area_real,
-            'units': self.config.medicion_units
+            'units': units
         }
         
         # Para piezas, calcular largo y ancho
-        if label.lower() == "pieza":
+        if (label_lc if label_lc is not None else label.lower()) == "pieza":
             # Determinar largo como la dimensión mayor que se acerque a 4000mm
-            largo_ref = 4000.0 if self.config.medicion_units == "mm" else \
-                       400.0 if self.config.medicion_units == "cm" else 4.0
+            largo_ref = self._largo_ref
             
             diff1 = abs(width_real - largo_ref)
             diff2 = abs(height_real - largo_ref)
@@ -874,19 +1777,44 @@ class DetectionHandler:
             })
             
             # Sugerir calibración si las dimensiones están muy fuera de rango
-            max_diff_allowed = largo_ref * 0.5
-            if min(diff1, diff2) > max_diff_allowed:
+            if min(diff1, diff2) > self._max_diff_allowed:
                 pixel_length_max = max(width_px, height_px)
                 suggest_scale_calibration(pixel_length_max, largo_ref)
         
         # Log de mediciones
-        if self.config.log_mediciones:
+        if cfg.log_mediciones:
             log_detection(cam_id, label, 0.0, measurements)  # confidence se pasará después
         
         return measurements
     
+    def _recompute_measurement_constants(self):
+        """
+        Precalcula las constantes de medición que dependen de las unidades
+        configuradas (llamado al iniciar y desde invalidate_config_caches).
+        """
+        units = getattr(self.config, 'medicion_units', 'mm')
+        # Largo de referencia de una pieza (4000 mm) en las unidades actuales
+        self._largo_ref = 4000.0 if units == "mm" else 400.0 if units == "cm" else 4.0
+        self._max_diff_allowed = self._largo_ref * 0.5
+        
+        largo_min = getattr(self.config, 'largo_minimo_pieza_mm', 50.0)
+        if units == "cm":
+            largo_min = largo_min / 10.0
+        elif units == "m":
+            largo_min = largo_min / 1000.0
+        self._largo_min_converted = largo_min
+        
+        # Escala y unidades son fijas por cámara: pixel_to_real_units es lineal,
+        # así que se reduce a un solo factor (incluye el fallback sin escala)
+        self._px_to_real_cam1 = pixel_to_real_units(
+            1.0, getattr(self.config, 'escala_px_por_mm_cam1', 1.0), units
+        )
+        self._px_to_real_cam2 = pixel_to_real_units(
+            1.0, getattr(self.config, 'escala_px_por_mm_cam2', 1.0), units
+        )
+    
     def _check_broken_piece(self, label: str, measurements: Optional[Dict],
-                           inside_roi: bool) -> bool:
+                           inside_roi: bool, label_lc: str = None) -> bool:
         """
         Verifica si una pieza está quebrada (método básico de respaldo).
         
@@ -894,96 +1822,195 @@ class DetectionHandler:
         El análisis avanzado se ejecuta posteriormente en _process_detections.
         """
         if (not self.config.detectar_piezas_quebradas or 
-            label.lower() != "pieza" or 
+            (label_lc if label_lc is not None else label.lower()) != "pieza" or 
             not measurements or 
             not inside_roi):
             return False
         
         largo = measurements.get('largo', 0)
         
-        # Convertir largo mínimo a las unidades actuales
-        largo_min = self.config.largo_minimo_pieza_mm
-        if self.config.medicion_units == "cm":
-            largo_min = largo_min / 10.0
-        elif self.config.medicion_units == "m":
-            largo_min = largo_min / 1000.0
+        # Largo mínimo ya convertido a las unidades actuales
+        largo_min = self._largo_min_converted
         
         if largo < largo_min:
-            print(
-                f"⚠️ PIEZA QUEBRADA (básica): "
-                f"{largo:.1f}{self.config.medicion_units} < {largo_min:.1f}{self.config.medicion_units}"
-            )
+            units = self.config.medicion_units
+            log.info("⚠️ PIEZA QUEBRADA (básica): %.1f%s < %.1f%s", largo, units, largo_min, units)
             return True
         
         return False
     
-    def _get_min_conf_for_label(self, label: str) -> float:
+    def _rebuild_min_conf_table(self):
+        """
+        Tabula los umbrales mínimos de confianza por clase a partir de la
+        configuración (llamado al iniciar y desde invalidate_config_caches).
+        """
+        base = getattr(self.config, 'min_confidence', 0.5)
+        self._base_conf = base
+        self._min_conf_table = {
+            # Podemos relajar un poco el umbral para operador para no perderlo
+            'operador': max(0.2, base * 0.6),
+        }
+    
+    def _get_min_conf_for_label(self, label_lc: str) -> float:
         """
         Devuelve el umbral mínimo de confianza para una clase dada.
         Permite afinar la sensibilidad por tipo de objeto.
+        
+        Args:
+            label_lc: Etiqueta en minúsculas
         """
-        base = getattr(self.config, 'min_confidence', 0.5)
-        name = label.lower()
-        # Podemos relajar un poco el umbral para operador para no perderlo
-        if name == 'Operador':
-            return max(0.2, base * 0.6)
         # Otras clases usan el umbral global
-        return base
+        return self._min_conf_table.get(label_lc, self._base_conf)
+    
+    def _rebuild_plc_dispatch(self):
+        """
+        Vacía la cache PLC por etiqueta (_plc_entry) y precalcula la salida de
+        pieza quebrada (llamado al iniciar y desde invalidate_config_caches).
+        """
+        cfg = self.config
+        self._plc_entry.cache_clear()
+        self._pq_plc_cfg = (
+            bool(getattr(cfg, 'alertar_pieza_quebrada', False) and getattr(cfg, 'plc_enabled', False)),
+            getattr(cfg, 'plc_reg_addr_pieza_quebrada', None),
+            getattr(cfg, 'plc_pulse_ms', 0),
+            getattr(cfg, 'plc_reg_pulse_value', 0),
+        )
+        if self.plc_service:
+            self.plc_service.refresh_config()
+    
+    def _resolve_plc_entry(self, label: str) -> tuple:
+        """
+        Tupla (enabled, address, pulse_ms, pulse_value) de la etiqueta. Se usa
+        a través de _plc_entry (lru_cache): una inmutable por etiqueta en vez
+        del dict que copia get_plc_config_for_class en cada llamada.
+        """
+        plc_config = self.config.get_plc_config_for_class(label)
+        return (
+            plc_config['enabled'],
+            plc_config['address'],
+            plc_config['pulse_ms'],
+            plc_config['pulse_value'],
+        )
     
     def _should_trigger_plc(self, label: str) -> bool:
         """Determina si una clase debe activar el PLC."""
         if not self.config.plc_enabled:
             return False
-        
-        plc_config = self.config.get_plc_config_for_class(label)
-        return plc_config['enabled']
+        return self._plc_entry(label)[0]
     
     def _trigger_plc(self, label: str, cam_id: int):
         """Activa el PLC para una detección."""
         if not self.plc_service:
             return
         
-        plc_config = self.config.get_plc_config_for_class(label)
-        if not plc_config['enabled'] or plc_config['address'] is None:
+        enabled, address, pulse_ms, pulse_value = self._plc_entry(label)
+        if not enabled or address is None:
             return
         
-        success = self.plc_service.pulse(
-            "register",
-            plc_config['address'],
-            plc_config['pulse_ms'],
-            plc_config['pulse_value'],
-            cam_id,
-            label
-        )
+        # Se envía con el resto de pulsos del lote en _flush_plc
+        success = self.plc_service.queue_pulse(address, pulse_ms, pulse_value, cam_id, label)
         
         if success:
-            print(f"🔌 PLC activado: {label} cam{cam_id} -> addr:{plc_config['address']}")
+            log.info("🔌 PLC activado: %s cam%d -> addr:%s", label, cam_id, address)
     
     def _handle_operator_alert(self, operator_detected: bool):
         """Maneja las alertas de operador."""
         if self.alert_callback:
             self.alert_callback(operator_detected)
     
+    def _text_size(self, text: str, scale: float, thickness: int) -> Tuple[int, int]:
+        """cv2.getTextSize memoizado: las etiquetas y confianzas son un conjunto finito."""
+        key = (text, scale, thickness)
+        size = self._text_size_cache.get(key)
+        if size is None:
+            size = self._text_size_cache[key] = cv2.getTextSize(
+                text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness
+            )[0]
+        return size
+    
+    def _label_glyph(self, text: str) -> Tuple[np.ndarray, int]:
+        """
+        Máscara booleana del texto de clase (escala 0.7, grosor 2) rasterizada
+        una sola vez: los nombres de clase son un conjunto fijo.
+        
+        Returns:
+            Tupla (máscara (alto, ancho) con 1 px de margen, alto sobre la línea base)
+        """
+        glyph = self._glyph_cache.get(text)
+        if glyph is None:
+            (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+            # 1 px de margen: el trazo de grosor 2 sobresale del origen
+            canvas = np.zeros((h + baseline + 3, w + 3), dtype=np.uint8)
+            cv2.putText(canvas, text, (1, h + 1), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 255, 2)
+            glyph = self._glyph_cache[text] = (canvas > 0, h)
+        return glyph
+    
+    def _blit_glyph(self, frame: np.ndarray, glyph: Tuple[np.ndarray, int],
+                    org: Tuple[int, int], color: Tuple[int, int, int]):
+        """Copia una máscara de _label_glyph al frame con org como en cv2.putText (recortada al frame)."""
+        mask, ascent = glyph
+        x0, y0 = org[0] - 1, org[1] - ascent - 1
+        fh, fw = frame.shape[:2]
+        mx0, my0 = max(0, -x0), max(0, -y0)
+        mx1 = min(mask.shape[1], fw - x0)
+        my1 = min(mask.shape[0], fh - y0)
+        if mx1 <= mx0 or my1 <= my0:
+            return
+        region = frame[y0 + my0:y0 + my1, x0 + mx0:x0 + mx1]
+        region[mask[my0:my1, mx0:mx1]] = color
+    
+    def _draw_detections(self, frame: np.ndarray, detections: List[Dict], cam_id: int):
+        """
+        Dibuja todas las detecciones de un frame: primero los recuadros,
+        agrupados por color en una llamada a cv2.polylines cada grupo, y
+        después las etiquetas encima.
+        """
+        if not detections:
+            return
+        
+        quads_by_color: Dict[tuple, list] = {}
+        outside_quads = []
+        labels = []
+        for detection in detections:
+            label = detection['label']
+            x1, y1, x2, y2 = detection['bbox']
+            inside_roi = detection['inside_roi']
+            # Obtener color basado en la clase
+            color = get_detection_color(label, inside_roi, False)
+            quad = ((x1, y1), (x2, y1), (x2, y2), (x1, y2))
+            quads_by_color.setdefault(color, []).append(quad)
+            if not inside_roi:
+                outside_quads.append(quad)
+            labels.append((detection, color))
+        
+        # Rectángulos de detección
+        for color, quads in quads_by_color.items():
+            cv2.polylines(frame, np.array(quads, dtype=np.int32), True, color, 2)
+        # Rectángulo gris fino para objetos fuera del ROI
+        if outside_quads:
+            cv2.polylines(frame, np.array(outside_quads, dtype=np.int32), True, (128, 128, 128), 1)
+        
+        for detection, color in labels:
+            self._draw_detection_label(frame, detection, color)
+    
     def _draw_detection(self, frame: np.ndarray, detection: Dict, cam_id: int):
         """Dibuja una detección en el frame - Rectángulo con nombre de clase."""
+        self._draw_detections(frame, [detection], cam_id)
+    
+    def _draw_detection_label(self, frame: np.ndarray, detection: Dict, color: Tuple[int, int, int]):
+        """Dibuja el nombre de clase y la confianza de una detección."""
         label = detection['label']
         x1, y1, x2, y2 = detection['bbox']
         inside_roi = detection['inside_roi']
         confidence = detection.get('confidence', 0.0)
         
-        # Obtener color basado en la clase
-        color = get_detection_color(label, inside_roi, False)
-        
-        # Dibujar rectángulo de detección
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        
         # Preparar texto con clase y confianza
         class_text = f"{label.title()}"
         confidence_text = f"{confidence:.2f}"
         
         # Fondo para el texto (mejor legibilidad)
-        text_size = cv2.getTextSize(class_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-        conf_size = cv2.getTextSize(confidence_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+        text_size = self._text_size(class_text, 0.7, 2)
+        conf_size = self._text_size(confidence_text, 0.5, 1)
         
         # Calcular posición del texto
         text_x = x1
@@ -998,16 +2025,8 @@ class DetectionHandler:
             -1
         )
         
-        # Dibujar texto de clase en blanco
-        cv2.putText(
-            frame,
-            class_text,
-            (text_x + 5, text_y - 3),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2
-        )
+        # Dibujar texto de clase en blanco (máscara pre-rasterizada)
+        self._blit_glyph(frame, self._label_glyph(class_text), (text_x + 5, text_y - 3), (255, 255, 255))
         
         # Dibujar confianza debajo (solo si está en ROI)
         if inside_roi:
@@ -1020,11 +2039,8 @@ class DetectionHandler:
                 (255, 255, 255),
                 1
             )
-        
-        # Mostrar indicador de ROI
-        if not inside_roi:
-            # Dibujar rectángulo punteado para objetos fuera del ROI
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (128, 128, 128), 1)
+        else:
+            # Mostrar indicador de ROI para objetos fuera del ROI
             cv2.putText(
                 frame,
                 "FUERA ROI",
@@ -1038,28 +2054,30 @@ class DetectionHandler:
     def _draw_dashed_rectangle(self, img: np.ndarray, pt1: Tuple[int, int], 
                               pt2: Tuple[int, int], color: Tuple[int, int, int], 
                               thickness: int = 2, dash_length: int = 10):
-        """Dibuja un rectángulo con líneas segmentadas."""
+        """Dibuja un rectángulo con líneas segmentadas (todos los trazos en una llamada)."""
         x1, y1 = pt1
         x2, y2 = pt2
         
-        # Líneas del rectángulo
-        lines = [
-            ((x1, y1), (x2, y1)),  # superior
-            ((x2, y1), (x2, y2)),  # derecha
-            ((x2, y2), (x1, y2)),  # inferior
-            ((x1, y2), (x1, y1))   # izquierda
-        ]
-        
-        for line in lines:
-            pt_start, pt_end = line
-            length = int(((pt_end[0] - pt_start[0]) ** 2 + (pt_end[1] - pt_start[1]) ** 2) ** 0.5)
-            for i in range(0, length, dash_length * 2):
-                start = (
-                    int(pt_start[0] + (pt_end[0] - pt_start[0]) * (i / length)),
-                    int(pt_start[1] + (pt_end[1] - pt_start[1]) * (i / length))
-                )
-                end = (
-                    int(pt_start[0] + (pt_end[0] - pt_start[0]) * ((i + dash_length) / length)),
-                    int(pt_start[1] + (pt_end[1] - pt_start[1]) * ((i + dash_length) / length))
-                )
-                cv2.line(img, start, end, color, thickness)
+        # Lados del rectángulo (superior, derecha, inferior, izquierda); son
+        # ejes alineados, así que el largo es la diferencia de coordenadas
+        sides = (
+            ((x1, y1), (x2, y1), abs(x2 - x1)),
+            ((x2, y1), (x2, y2), abs(y2 - y1)),
+            ((x2, y2), (x1, y2), abs(x2 - x1)),
+            ((x1, y2), (x1, y1), abs(y2 - y1)),
+        )
+        
+        segments = []
+        for pt_start, pt_end, length in sides:
+            if length == 0:
+                continue
+            start = np.array(pt_start, dtype=np.float64)
+            direction = (np.array(pt_end, dtype=np.float64) - start) / length
+            t = np.arange(0, length, dash_length * 2, dtype=np.float64)
+            t_end = np.minimum(t + dash_length, length)
+            # (M, 2, 2): inicio y fin de cada trazo
+            segments.append(np.stack(
+                (start + direction * t[:, None], start + direction * t_end[:, None]), axis=1
+            ))
+        if segments:
+            cv2.polylines(img, np.concatenate(segments).astype(np.int32), False, color, thickness)
@@ -4,12 +4,15 @@ Monitor diagnóstico de comunicación Modbus TCP con PLC.
 - Lee periódicamente los registros %MW10203 y %MW10204.
 - Muestra todos los frames Modbus enviados/recibidos en consola (logging DEBUG).
 - Permite escritura manual a registros mediante comandos (opcional, comentado).
+- Lee los tramos de registros en paralelo (cliente async + asyncio.gather).
+- Mantiene una conexión persistente con TCP keepalive y reconecta si se cae.
 - Maneja excepciones y cierra conexión correctamente.
 """
 
+import asyncio
 import logging
-import time
-from pymodbus.client import ModbusTcpClient
+import socket
+from pymodbus.client import AsyncModbusTcpClient
 from pymodbus.exceptions import ModbusException
 
 # Configuración de logging
@@ -34,68 +37,142 @@ REGS_EXTRA = [
     22006,  # plc_reg_addr_alaveo
 ]
 READ_INTERVAL = 1.0  # segundos
+MAX_READ_COUNT = 125  # Máximo de registros por petición read_holding_registers
+# TCP keepalive: inactividad antes del primer sondeo, intervalo y sondeos fallidos
+KEEPALIVE_IDLE_S = 5
+KEEPALIVE_INTERVAL_S = 2
+KEEPALIVE_COUNT = 3
 
 
-def read_register(client, address):
-    """Lee un registro Modbus y retorna su valor o None si hay error."""
+def _client_socket(client):
+    """Socket TCP del cliente Modbus (síncrono o async), o None si no está conectado."""
+    sock = getattr(client, "socket", None)
+    if isinstance(sock, socket.socket):
+        return sock
+    # pymodbus >= 3.7 guarda el transporte async en client.ctx
+    for owner in (getattr(client, "ctx", None), client):
+        transport = getattr(owner, "transport", None)
+        if transport is not None and hasattr(transport, "get_extra_info"):
+            return transport.get_extra_info("socket")
+    return None
+
+
+def enable_keepalive(client):
+    """
+    Activa TCP keepalive en la conexión del cliente para detectar un PLC caído
+    sin esperar al timeout de una petición. Ignora opciones que el SO no tiene.
+    """
+    sock = _client_socket(client)
+    if sock is None:
+        logging.warning("No se encontró el socket del cliente Modbus: TCP keepalive no activado")
+        return
     try:
-        response = client.read_holding_registers(address)
-        if response.isError():
-            logging.error(f"Error leyendo registro {address}: {response}")
-            return None
-        value = response.registers[0]
-        print(f"📥 Reg {address} = {value}")
-        return value
-    except Exception as e:
-        logging.error(f"Excepción leyendo registro {address}: {e}")
-        return None
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE_S)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL_S)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+        elif hasattr(socket, "SIO_KEEPALIVE_VALS") and hasattr(sock, "ioctl"):
+            # Windows: (activar, inactividad ms, intervalo ms). El TransportSocket
+            # de asyncio no expone ioctl: ahí quedan los tiempos del sistema
+            sock.ioctl(socket.SIO_KEEPALIVE_VALS,
+                       (1, KEEPALIVE_IDLE_S * 1000, KEEPALIVE_INTERVAL_S * 1000))
+    except OSError as e:
+        logging.warning(f"No se pudo activar TCP keepalive: {e}")
+
+
+async def ensure_connected_async(client):
+    """Reconecta el cliente si la conexión se cayó. Devuelve True si está conectado."""
+    if client.connected:
+        return True
+    logging.warning("Conexión con el PLC perdida, reconectando...")
+    if not await client.connect():
+        logging.error("No se pudo reconectar al PLC.")
+        return False
+    enable_keepalive(client)
+    logging.info("Conexión restablecida.")
+    return True
+
+
+def group_register_runs(addresses, max_count=MAX_READ_COUNT):
+    """
+    Agrupa direcciones en tramos (start, count) de a lo sumo max_count registros,
+    para leer cada tramo con una sola petición Modbus.
+    """
+    runs = []
+    for addr in sorted(set(addresses)):
+        if runs and addr - runs[-1][0] < max_count:
+            runs[-1][1] = addr - runs[-1][0] + 1
+        else:
+            runs.append([addr, 1])
+    return [(start, count) for start, count in runs]
 
 
-def write_register(client, address, value):
-    """Escribe un valor en un registro Modbus."""
+async def _read_run_async(client, start, count):
+    """Lee un tramo de registros con el cliente async; None por registro si hay error."""
     try:
-        response = client.write_register(address, value, unit=PLC_UNIT_ID)
+        response = await client.read_holding_registers(start, count=count)
         if response.isError():
-            logging.error(f"Error escribiendo registro {address}: {response}")
-            return False
-        logging.info(f"Registro {address} escrito con valor {value}")
-        return True
+            logging.error(f"Error leyendo registros {start}-{start + count - 1}: {response}")
+            return [None] * count
+        return response.registers
     except Exception as e:
-        logging.error(f"Excepción escribiendo registro {address}: {e}")
-        return False
+        logging.error(f"Excepción leyendo registros {start}-{start + count - 1}: {e}")
+        return [None] * count
+
 
+async def read_registers_async(client, addresses):
+    """
+    Lee varios registros agrupándolos en tramos contiguos (una petición por
+    tramo); los tramos se leen en paralelo con asyncio.gather. Cada tramo
+    maneja sus propias excepciones, así un error no cancela el resto del lote.
+    
+    Returns:
+        Diccionario {dirección: valor}; las direcciones de un tramo con error quedan en None
+    """
+    runs = group_register_runs(addresses)
+    results = await asyncio.gather(*[_read_run_async(client, start, count) for start, count in runs])
+    values = {}
+    for (start, _), regs in zip(runs, results):
+        for offset, value in enumerate(regs):
+            values[start + offset] = value
+    wanted = set(addresses)
+    for addr in sorted(wanted):
+        print(f"📥 Reg {addr} = {values.get(addr)}")
+    return {addr: values.get(addr) for addr in wanted}
 
-def main():
+
+async def main():
     print("Monitor Modbus TCP - PLC diagnóstico")
     print(f"Conectando a PLC {PLC_IP}:{PLC_PORT} (Unit ID: {PLC_UNIT_ID})...")
-    client = ModbusTcpClient(host=PLC_IP, port=PLC_PORT, timeout=1.0)
+    client = AsyncModbusTcpClient(PLC_IP, port=PLC_PORT, timeout=1.0)
     try:
-        if not client.connect():
+        if not await client.connect():
             logging.error("No se pudo conectar al PLC.")
             return
+        enable_keepalive(client)
         logging.info("Conexión establecida.")
         # Modo interactivo (opcional)
         # import threading
+        # loop = asyncio.get_running_loop()
         # def input_thread():
         #     while True:
         #         cmd = input()
         #         if cmd.startswith("w "):
         #             try:
         #                 _, addr, val = cmd.split()
-        #                 addr = int(addr)
-        #                 val = int(val)
-        #                 write_register(client, addr, val)
+        #                 asyncio.run_coroutine_threadsafe(
+        #                     client.write_register(int(addr), int(val)), loop).result()
         #             except Exception as e:
         #                 print(f"Comando inválido: {e}")
         # threading.Thread(target=input_thread, daemon=True).start()
+        addresses = [REG_SHORT, REG_LONG] + REGS_EXTRA
         while True:
-            read_register(client, REG_SHORT)
-            read_register(client, REG_LONG)
-            for reg in REGS_EXTRA:
-                read_register(client, reg)
-            time.sleep(READ_INTERVAL)
-    except KeyboardInterrupt:
-        print("\n⏹️ Monitor detenido por el usuario (CTRL+C)")
+            if await ensure_connected_async(client):
+                await read_registers_async(client, addresses)
+            await asyncio.sleep(READ_INTERVAL)
+    except asyncio.CancelledError:
+        pass
     except Exception as e:
         logging.error(f"Error inesperado: {e}")
     finally:
@@ -104,4 +181,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n⏹️ Monitor detenido por el usuario (CTRL+C)")
@@ -1,23 +1,38 @@
 """
 Servicio de comunicación PLC Modbus TCP.
 
-Compatible con pymodbus 3.6+
+Compatible con pymodbus 3.8+
 -----------------------------------------------------------------
 • Lee registros con: client.read_holding_registers(addr)
 • Escribe registros con: client.write_register(addr, value)
-• Sin device_id, unit_id, ni slave (tu versión NO los acepta)
+• Sin device_id ni slave: id por defecto (el nombre cambió entre versiones)
 -----------------------------------------------------------------
+Usa AsyncModbusTcpClient en un event loop propio (thread "PLCLoop").
+Los métodos públicos siguen siendo síncronos para la GUI y el worker de
+detección: envían la corrutina *_async al loop y esperan su resultado.
+La bajada a 0 de cada pulso se programa con call_later, así el sostén
+no bloquea al que llama, ni las lecturas de estado, ni otros pulsos.
 """
 
+import sys
 import time
+import asyncio
 import logging
-from pymodbus.client import ModbusTcpClient
+import threading
+import concurrent.futures
+from collections import deque
+from pymodbus.client import AsyncModbusTcpClient
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("PLCService")
 
 
 class PLCService:
+    # Timeout de cada petición Modbus (s)
+    REQUEST_TIMEOUT = 2.5
+    # Máximo de registros por escritura FC16 (write_registers)
+    MAX_REGS_PER_WRITE = 125
+
     # ---------------------------------------------------------------
     #  Parámetro de reenganche
     # ---------------------------------------------------------------
@@ -55,12 +70,7 @@ class PLCService:
 
         enable_addr = getattr(self.cfg, "plc_reg_addr_enable", None)
         if enable_addr is not None:
-            try:
-                resp = self.client.write_register(enable_addr, 0)
-                if resp.isError():
-                    log.error(f"Error deshabilitando señal en registro {enable_addr}: {resp}")
-            except Exception as e:
-                log.error(f"Excepción deshabilitando señal en registro {enable_addr}: {e}")
+            self._run(self._write_enable_async(enable_addr, 0), default=None)
 
     def reconectar_senal(self):
         """
@@ -77,12 +87,17 @@ class PLCService:
 
         enable_addr = getattr(self.cfg, "plc_reg_addr_enable", None)
         if enable_addr is not None:
-            try:
-                resp = self.client.write_register(enable_addr, 1)
-                if resp.isError():
-                    log.error(f"Error habilitando señal en registro {enable_addr}: {resp}")
-            except Exception as e:
-                log.error(f"Excepción habilitando señal en registro {enable_addr}: {e}")
+            self._run(self._write_enable_async(enable_addr, 1), default=None)
+
+    async def _write_enable_async(self, enable_addr: int, value: int):
+        """Escribe el registro de habilitación de señal (0 = deshabilitar, 1 = habilitar)."""
+        action = "habilitando" if value else "deshabilitando"
+        try:
+            resp = await self.client.write_register(enable_addr, value)
+            if resp.isError():
+                log.error(f"Error {action} señal en registro {enable_addr}: {resp}")
+        except Exception as e:
+            log.error(f"Excepción {action} señal en registro {enable_addr}: {e}")
 
     # ---------------------------------------------------------------
     #  INIT
@@ -92,8 +107,17 @@ class PLCService:
         cfg = CamConfig con parámetros del PLC
         """
         self.cfg = cfg
-        self.client: ModbusTcpClient | None = None
+        self.client: AsyncModbusTcpClient | None = None
         self._connected = False
+        # Estado del transporte TCP, lo actualiza pymodbus (trace_connect)
+        # al conectar/desconectar; is_connected() no consulta al cliente
+        self._link_up = False
+        self._client_gen = 0  # Descarta callbacks de clientes anteriores
+        # Event loop dedicado: todo el I/O Modbus corre ahí, así la GUI y el
+        # worker de detección no comparten el cliente entre threads
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._loop_lock = threading.Lock()
         
         # Estado de aislamiento por seguridad (Operador)
         self.is_isolated = False
@@ -104,6 +128,20 @@ class PLCService:
         # Cooldowns por clase / cámara
         self.last_pulse_time = {}
 
+        # Escrituras del frame en curso {addr: valor}; flush() las agrupa en
+        # rangos contiguos y las manda con una sola write_registers por rango.
+        # Solo se tocan desde el loop del PLC.
+        self.pending_writes: dict[int, int] = {}
+        # Pulsos armados en pending_writes: (addr, pulse_ms, cooldown_key, last)
+        self._armed_pulses: list[tuple[int, int, str, float]] = []
+        # Registros en alto hasta su bajada {addr: handle de call_later}; la
+        # entrada sale recién cuando el 0 ya se escribió
+        self._held: dict[int, asyncio.TimerHandle] = {}
+        # Pulsos pedidos sobre un registro todavía en alto: salen tras su
+        # bajada, así el PLC ve un flanco por pulso
+        self._deferred: dict[int, deque] = {}
+        self._clear_tasks: set = set()
+
         # Parámetro de reenganche desde config (plc_reenganche_param en JSON)
         default_reenganche = getattr(cfg, "plc_reenganche_param", 10)
         try:
@@ -115,7 +153,8 @@ class PLCService:
         # ===============================================
         #  MAPEOS DE REGISTROS PLC  (desde config JSON)
         # ===============================================
-        self.class_address_map = {
+        # Claves en minúsculas: send_detection() normaliza la clase recibida
+        self.class_address_map = {sys.intern(k.lower()): v for k, v in {
             "Cruzamiento": cfg.plc_reg_addr_1,
             "CruzyMont": cfg.plc_reg_addr_2,
             "Montada": cfg.plc_reg_addr_3,
@@ -123,36 +162,103 @@ class PLCService:
             "Quebrada": cfg.plc_reg_addr_pieza_quebrada,
             "Alaveo": cfg.plc_reg_addr_alaveo,
             "Pieza": cfg.plc_reg_addr_pieza,
-        }
+        }.items()}
+
+        # Claves de cooldown "{cam}_{clase}" por (cam_id, class_name) tal como
+        # llega a pulse(); las clases nuevas se agregan en _cooldown_key
+        self._cooldown_keys = {}
+        for cls in (*self.class_address_map, "pieza_quebrada"):
+            for cam in (1, 2):
+                self._cooldown_keys[(cam, cls)] = sys.intern(f"{cam}_{cls}")
+        # Nombre de clase recibido -> minúsculas internado (send_detection)
+        self._class_lower = {cls: cls for cls in self.class_address_map}
+
+        self.refresh_config()
+
+    def refresh_config(self):
+        """
+        Copia a atributos propios los parámetros de cfg que usa cada pulso.
+        Llamar si cfg cambia con el servicio en marcha (invalidate_config_caches).
+        """
+        self._pulse_value = self.cfg.plc_reg_pulse_value
+        self._cooldown_s = self.cfg.plc_cooldown_s
+        self._pulse_ms = self.cfg.plc_pulse_ms
+
+    # ==========================================================
+    #  EVENT LOOP
+    # ==========================================================
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Arranca (una vez) el thread con el event loop del cliente Modbus."""
+        with self._loop_lock:
+            if self._loop is None or self._loop_thread is None or not self._loop_thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self._loop_main, args=(loop,), name="PLCLoop", daemon=True
+                )
+                self._loop, self._loop_thread = loop, thread
+                thread.start()
+            return self._loop
+
+    @staticmethod
+    def _loop_main(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def _run(self, coro, timeout: float | None = None, default=False):
+        """
+        Ejecuta una corrutina en el loop del PLC desde cualquier otro thread
+        y espera su resultado (default si falla o vence el timeout).
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout if timeout is not None else self.REQUEST_TIMEOUT * 3)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            log.error("⏱️ Timeout esperando respuesta del PLC")
+        except Exception as e:
+            log.error(f"❌ Error en operación PLC: {e}")
+        return default
 
     # ==========================================================
     #  CONEXIÓN
     # ==========================================================
     def connect(self) -> bool:
         """Intenta conectar con el PLC via Modbus TCP."""
+        return self._run(self.connect_async(), timeout=self.REQUEST_TIMEOUT * 4)
+
+    async def connect_async(self) -> bool:
         try:
             log.info(f"🔌 Intentando conectar a PLC: {self.cfg.plc_ip}:{self.cfg.plc_port}")
 
-            self.client = ModbusTcpClient(
-                host=self.cfg.plc_ip,
+            self._client_gen += 1
+            gen = self._client_gen
+            self.client = AsyncModbusTcpClient(
+                self.cfg.plc_ip,
                 port=self.cfg.plc_port,
-                timeout=2.5,
+                timeout=self.REQUEST_TIMEOUT,
+                trace_connect=lambda up: self._on_link_change(gen, up),
             )
 
-            if not self.client.connect():
+            if not await self.client.connect():
                 log.error("❌ No se pudo conectar al PLC.")
                 self._connected = False
                 return False
+            self._link_up = bool(self.client.connected)
 
             # Lectura de prueba (registro 0 o cualquier registro válido)
             try:
-                test = self.client.read_holding_registers(0)
+                test = await self.client.read_holding_registers(0)
                 if test.isError():
                     log.warning("⚠️ Conectado, pero error en la lectura de prueba.")
                     self._connected = False
                 else:
                     log.info("✅ PLC conectado exitosamente.")
                     self._connected = True
+                    self.refresh_config()
             except Exception as e:
                 log.error(f"⚠️ Error verificando lectura Modbus: {e}")
                 self._connected = False
@@ -164,24 +270,44 @@ class PLCService:
             self._connected = False
             return False
 
+    def _on_link_change(self, gen: int, connected: bool):
+        """Callback de pymodbus: el transporte TCP se conectó o se cayó."""
+        if gen == self._client_gen:
+            self._link_up = bool(connected)
+
     def is_connected(self) -> bool:
         """
-        Verifica el estado lógico de conexión y el cliente Modbus.
+        Verifica el estado lógico de conexión y el del transporte Modbus.
         """
-        if self.client is None:
-            return False
-        return bool(self._connected and getattr(self.client, "connected", True))
+        return self._connected and self._link_up
 
     def close(self):
-        """Cierra la conexión con el PLC."""
-        if self.client:
+        """Cierra la conexión con el PLC y detiene su event loop."""
+        if self._loop is not None and (self._held or self._clear_tasks):
+            self._run(self._drain_clears_async(), default=None)
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = None
+            self._loop_thread = None
+        client = self.client
+        if client is not None and loop is not None and loop.is_running():
             try:
-                self.client.close()
+                loop.call_soon_threadsafe(client.close)
             except Exception:
                 pass
-            finally:
-                self.client = None
-                self._connected = False
+        elif client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+        self.client = None
+        self._client_gen += 1
+        self._connected = False
+        self._link_up = False
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
 
     # ==========================================================
     #  MODO DE AISLAMIENTO (SEGURIDAD)
@@ -208,9 +334,11 @@ class PLCService:
         """
         if not self.is_connected():
             return -1
+        return self._run(self.read_status_register_async(address), default=-1)
 
+    async def read_status_register_async(self, address: int) -> int:
         try:
-            resp = self.client.read_holding_registers(address)
+            resp = await self.client.read_holding_registers(address)
             if resp.isError():
                 log.error(f"Error leyendo registro {address}: {resp}")
                 return -1
@@ -221,12 +349,149 @@ class PLCService:
             log.error(f"Excepción leyendo registro {address}: {e}")
             return -1
 
+    # ==========================================================
+    #  ESCRITURAS AGRUPADAS (FC16)
+    # ==========================================================
+    @classmethod
+    def _contiguous_runs(cls, writes: dict[int, int]) -> list[tuple[int, list[int]]]:
+        """
+        Agrupa {addr: valor} en rangos de direcciones consecutivas:
+        [(addr_inicial, [valores...]), ...] de a lo sumo MAX_REGS_PER_WRITE.
+        """
+        runs = []
+        for addr in sorted(writes):
+            if runs:
+                start, values = runs[-1]
+                if addr == start + len(values) and len(values) < cls.MAX_REGS_PER_WRITE:
+                    values.append(writes[addr])
+                    continue
+            runs.append((addr, [writes[addr]]))
+        return runs
+
+    async def _write_runs_async(self, writes: dict[int, int]) -> bool:
+        """Escribe los registros con una transacción Modbus por rango contiguo."""
+        ok = True
+        for start, values in self._contiguous_runs(writes):
+            try:
+                if len(values) == 1:
+                    resp = await self.client.write_register(start, values[0])
+                else:
+                    resp = await self.client.write_registers(start, values)
+                if resp.isError():
+                    log.error(f"❌ Error escribiendo registros {start}..{start + len(values) - 1}: {resp}")
+                    ok = False
+            except Exception as e:
+                log.error(f"❌ Error escribiendo registros {start}..{start + len(values) - 1}: {e}")
+                ok = False
+        return ok
+
+    async def _clear_registers_async(self, addrs: list[int]):
+        """
+        Baja a 0, en una sola escritura agrupada, los pulsos del mismo ancho,
+        libera esos registros y envía los pulsos que esperaban por ellos.
+        """
+        if self.is_connected():
+            if not await self._write_runs_async(dict.fromkeys(addrs, 0)):
+                log.error(f"❌ Error desactivando registros {addrs}")
+        for addr in addrs:
+            self._held.pop(addr, None)
+        if not self.is_connected():
+            self._drop_deferred(addrs)
+            return
+        staged = False
+        for addr in addrs:
+            waiting = self._deferred.get(addr)
+            if waiting:
+                self._stage(addr, *waiting.popleft())
+                staged = True
+                if not waiting:
+                    del self._deferred[addr]
+        if staged:
+            await self._flush_async()
+
+    def _drop_deferred(self, addrs):
+        """Descarta los pulsos en espera de addrs y les devuelve el cooldown."""
+        for addr in addrs:
+            for _, _, cooldown_key, last in self._deferred.pop(addr, ()):
+                self.last_pulse_time[cooldown_key] = last
+
+    def _schedule_clear(self, pulse_ms: int, addrs: list[int]):
+        """Programa en el loop la bajada de addrs dentro de pulse_ms."""
+        loop = asyncio.get_running_loop()
+
+        def fire():
+            task = loop.create_task(self._clear_registers_async(addrs))
+            self._clear_tasks.add(task)
+            task.add_done_callback(self._clear_tasks.discard)
+
+        handle = loop.call_later(pulse_ms / 1000.0, fire)
+        for addr in addrs:
+            self._held[addr] = handle
+
+    async def _drain_clears_async(self):
+        """Adelanta las bajadas pendientes (al cerrar): ningún registro queda en alto."""
+        self._drop_deferred(list(self._deferred))
+        for handle in set(self._held.values()):
+            handle.cancel()
+        if self._clear_tasks:
+            await asyncio.gather(*self._clear_tasks, return_exceptions=True)
+        pending = list(self._held)
+        if pending:
+            await self._clear_registers_async(pending)
+
+    async def _flush_async(self) -> bool:
+        """Envía pending_writes y programa la bajada a 0 de los pulsos armados."""
+        if not self.pending_writes:
+            return True
+        writes, self.pending_writes = self.pending_writes, {}
+        armed, self._armed_pulses = self._armed_pulses, []
+
+        ok = self.is_connected() and await self._write_runs_async(writes)
+
+        by_width: dict[int, list[int]] = {}
+        for addr, pulse_ms, cooldown_key, last in armed:
+            if ok:
+                by_width.setdefault(pulse_ms, []).append(addr)
+            else:
+                self.last_pulse_time[cooldown_key] = last
+        if not ok:
+            self._drop_deferred(writes)
+
+        for pulse_ms, addrs in by_width.items():
+            self._schedule_clear(pulse_ms, addrs)
+        return ok
+
+    def flush(self) -> bool:
+        """Envía las escrituras acumuladas (llamar una vez por frame)."""
+        if not self.pending_writes:
+            return True
+        return self._run(self.flush_async())
+
+    async def flush_async(self) -> bool:
+        return await self._flush_async()
+
     # ==========================================================
     #  ENVÍO DE PULSOS (ESCRITURA)
     # ==========================================================
-    def pulse(
+    def queue_pulse(
+        self,
+        addr: int,
+        pulse_ms: int,
+        reg_val: int | None = None,
+        cam_id: int = 1,
+        class_name: str = "",
+    ) -> bool:
+        """
+        Deja un pulso en pending_writes sin tocar la red; se envía, junto con
+        los demás del mismo frame, en el próximo flush().
+        """
+        if not self.is_connected():
+            log.warning("⚠️ No conectado al PLC → no se envió pulso.")
+            return False
+        return self._run(self.queue_pulse_async(addr, pulse_ms, reg_val, cam_id, class_name))
+
+    async def queue_pulse_async(
         self,
-        mode: str,
         addr: int,
         pulse_ms: int,
         reg_val: int | None = None,
@@ -237,6 +502,7 @@ class PLCService:
         if not self.is_connected():
             log.warning("⚠️ No conectado al PLC → no se envió pulso.")
             return False
+        cooldown_s = self._cooldown_s
 
         # Verificar si el sistema está "100% en linea" (señales habilitadas)
         if not self.signals_enabled:
@@ -250,62 +516,103 @@ class PLCService:
 
         # Default del valor del pulso
         if reg_val is None:
-            reg_val = self.cfg.plc_reg_pulse_value
+            reg_val = self._pulse_value
 
-        cooldown_key = f"{cam_id}_{class_name.lower()}"
+        cooldown_key = self._cooldown_key(cam_id, class_name)
         now = time.time()
 
-        # Cooldown
+        # Cooldown (solo se toca desde el loop del PLC)
         last = self.last_pulse_time.get(cooldown_key, 0)
-        if now - last < self.cfg.plc_cooldown_s:
+        if now - last < cooldown_s:
             # log.debug(f"🔄 Cooldown activo para {class_name}") # Silenciado para optimización
             return False
+        # Reservar al encolar: otro pulso de la misma clase antes del flush
+        # o durante el sostén respeta el cooldown
+        self.last_pulse_time[cooldown_key] = now
+
+        if addr in self.pending_writes or addr in self._held:
+            # Registro ya en alto (otra cámara/clase con la misma dirección):
+            # se envía tras su bajada para no fundir dos pulsos en un flanco
+            self._deferred.setdefault(addr, deque()).append((reg_val, pulse_ms, cooldown_key, last))
+        else:
+            self._stage(addr, reg_val, pulse_ms, cooldown_key, last)
+        return True
+
+    def _stage(self, addr: int, reg_val: int, pulse_ms: int, cooldown_key: str, last: float):
+        self.pending_writes[addr] = reg_val
+        self._armed_pulses.append((addr, pulse_ms, cooldown_key, last))
+
+    def _cooldown_key(self, cam_id: int, class_name: str) -> str:
+        key = self._cooldown_keys.get((cam_id, class_name))
+        if key is None:
+            key = sys.intern(f"{cam_id}_{class_name.lower()}")
+            self._cooldown_keys[(cam_id, class_name)] = key
+        return key
 
-        try:
-            # ===============================
-            #  ESCRIBIR PULSO
-            # ===============================
-            resp1 = self.client.write_register(addr, reg_val)
-            if resp1.isError():
-                log.error(f"❌ Error activando registro {addr}")
-                return False
-
-            time.sleep(pulse_ms / 1000.0)
-
-            resp2 = self.client.write_register(addr, 0)
-            if resp2.isError():
-                log.error(f"❌ Error desactivando registro {addr}")
+    def pulse(
+        self,
+        mode: str,
+        addr: int,
+        pulse_ms: int,
+        reg_val: int | None = None,
+        cam_id: int = 1,
+        class_name: str = "",
+    ) -> bool:
+        """
+        Envía un pulso (valor y luego 0 tras pulse_ms) desde un thread
+        cualquiera. Vuelve apenas se escribe el valor: la bajada a 0 queda
+        programada en el loop del PLC (call_later).
+        """
+        if not self.is_connected():
+            log.warning("⚠️ No conectado al PLC → no se envió pulso.")
+            return False
 
-            # Registrar cooldown
-            self.last_pulse_time[cooldown_key] = now
+        return self._run(self.pulse_async(mode, addr, pulse_ms, reg_val, cam_id, class_name))
 
-            log.info(f"✅ Pulso enviado: {class_name} → Registro {addr}")
-            return True
+    async def pulse_async(
+        self,
+        mode: str,
+        addr: int,
+        pulse_ms: int,
+        reg_val: int | None = None,
+        cam_id: int = 1,
+        class_name: str = "",
+    ) -> bool:
+        """Encola el pulso y lo envía (con lo que hubiera pendiente)."""
+        if not await self.queue_pulse_async(addr, pulse_ms, reg_val, cam_id, class_name):
+            return False
 
-        except Exception as e:
-            log.error(f"❌ Error enviando pulso a {addr}: {e}")
+        if not await self._flush_async():
+            log.error(f"❌ Error activando registro {addr}")
             return False
 
+        log.info(f"✅ Pulso enviado: {class_name} → Registro {addr}")
+        return True
+
     # ==========================================================
     #  ENVÍO AUTOMÁTICO SEGÚN CLASE DETECTADA
     # ==========================================================
     def send_detection(self, class_name: str) -> bool:
         """
-        Envia al PLC la clase detectada desde YOLO.
+        Envia al PLC la clase detectada desde YOLO. El pulso queda en
+        pending_writes hasta el próximo flush().
         """
         if not self.cfg.plc_enabled:
             return False
         if not self.is_connected():
             return False
 
-        class_name = class_name.lower()
+        lower = self._class_lower.get(class_name)
+        if lower is None:
+            lower = self._class_lower[class_name] = sys.intern(class_name.lower())
+        class_name = lower
 
         if class_name not in self.class_address_map:
             log.warning(f"Clase no mapeada: {class_name}")
             return False
 
         register = self.class_address_map[class_name]
-        return self.pulse("register", register, self.cfg.plc_pulse_ms, class_name=class_name)
+        return self.queue_pulse(register, self._pulse_ms, class_name=class_name)
 
     # ==========================================================
     #  ESTADO GENERAL
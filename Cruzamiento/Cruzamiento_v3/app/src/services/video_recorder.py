@@ -1,16 +1,77 @@
 import os
+import re
+import queue
+import atexit
+import logging
+import logging.handlers
 import cv2
-from typing import Any
+from typing import Any, Optional
 from datetime import datetime
 
 DEFAULT_TARGET_FPS = 30.0
 
+# Logging en segundo plano: el thread que graba solo encola el registro y el
+# formateo/escritura a consola los hace el QueueListener en su propio thread
+log = logging.getLogger("VideoRecorder")
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+if not any(isinstance(h, logging.handlers.QueueHandler) for h in log.handlers):
+    log.addHandler(logging.handlers.QueueHandler(_log_queue))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+# Pipelines GStreamer con encoder H.264 por hardware, en orden de preferencia.
+# {location} es la ruta del archivo de salida.
+HW_PIPELINES = {
+    # NVENC con la conversión BGR -> NV12 en la GPU (cudaconvert, GStreamer >= 1.20):
+    # por PCIe viaja el BGR tal cual y la CPU no toca el espacio de color
+    'nvh264enc-cuda': (
+        'appsrc ! video/x-raw,format=BGR ! cudaupload ! cudaconvert ! '
+        'video/x-raw(memory:CUDAMemory),format=NV12 ! nvh264enc ! h264parse ! mp4mux ! '
+        'filesink location="{location}"'
+    ),
+    # NVENC (GPU NVIDIA), conversión en CPU
+    'nvh264enc': (
+        'appsrc ! videoconvert ! nvh264enc ! h264parse ! mp4mux ! '
+        'filesink location="{location}"'
+    ),
+    # Jetson / ARM (v4l2m2m)
+    'v4l2h264enc': (
+        'appsrc ! videoconvert ! video/x-raw,format=I420 ! v4l2h264enc ! '
+        'h264parse ! mp4mux ! filesink location="{location}"'
+    ),
+}
+
+
+def _gstreamer_available() -> bool:
+    """True si OpenCV se compiló con soporte GStreamer."""
+    try:
+        info = cv2.getBuildInformation()
+    except Exception:
+        return False
+    return re.search(r'GStreamer:\s*YES', info) is not None
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
 def now_str() -> str:
     """Retorna la fecha y hora actual en formato YYYYMMDD_HHMMSS."""
     return datetime.now().strftime('%Y%m%d_%H%M%S')
 
 class VideoRecorder:
     """Manejador de grabación de video dual."""
+    # Encoder por hardware que abrió bien (None = sin HW, usar mp4v).
+    # Se detecta una sola vez por proceso en la primera grabación.
+    _hw_encoder: Optional[str] = None
+    _hw_checked = False
+
     def __init__(self, target_fps: float = DEFAULT_TARGET_FPS):
         self.target_fps = target_fps
         self.recording = False
@@ -19,6 +80,12 @@ class VideoRecorder:
         self.writer2 = None
         self.writer_size1 = None
         self.writer_size2 = None
+        # Shape de los frames de cada writer y si hay que redimensionarlos
+        # (se decide una vez por grabación en register_shape)
+        self._shape1 = None
+        self._shape2 = None
+        self._resize1 = False
+        self._resize2 = False
         self.grab_dir = None
 
     def setup_directories(self, base_dir: str):
@@ -30,51 +97,98 @@ class VideoRecorder:
             return False
         if frame1 is None and frame2 is None:
             return False
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         timestamp = now_str()
         success = False
         if frame1 is not None:
             h1, w1 = frame1.shape[:2]
             self.writer_size1 = (w1, h1)
+            self.register_shape(1, frame1.shape)
             filename1 = f"{'conDet' if with_detections else 'sinDet'}_C1_{timestamp}.mp4"
             path1 = os.path.join(self.grab_dir, filename1)
-            self.writer1 = cv2.VideoWriter(path1, fourcc, self.target_fps, self.writer_size1)
+            self.writer1 = self._open_writer(path1, self.writer_size1)
             if self.writer1.isOpened():
-                print(f"📹 Grabación C1 iniciada: {path1}")
+                log.info(f"📹 Grabación C1 iniciada: {path1}")
                 success = True
             else:
                 self.writer1 = None
         if frame2 is not None:
             h2, w2 = frame2.shape[:2]
             self.writer_size2 = (w2, h2)
+            self.register_shape(2, frame2.shape)
             filename2 = f"{'conDet' if with_detections else 'sinDet'}_C2_{timestamp}.mp4"
             path2 = os.path.join(self.grab_dir, filename2)
-            self.writer2 = cv2.VideoWriter(path2, fourcc, self.target_fps, self.writer_size2)
+            self.writer2 = self._open_writer(path2, self.writer_size2)
             if self.writer2.isOpened():
-                print(f"📹 Grabación C2 iniciada: {path2}")
+                log.info(f"📹 Grabación C2 iniciada: {path2}")
                 success = True
             else:
                 self.writer2 = None
         if success:
             self.recording = True
             self.record_with_detections = with_detections
-            print(f"🔴 Grabación {'con' if with_detections else 'sin'} detecciones iniciada")
+            log.info(f"🔴 Grabación {'con' if with_detections else 'sin'} detecciones iniciada")
         return success
 
+    def _open_writer(self, path: str, size: tuple) -> cv2.VideoWriter:
+        """
+        Abre el writer con el encoder H.264 por hardware si hay uno
+        disponible (GStreamer); si no, con mp4v por software.
+        """
+        cls = type(self)
+        candidates = [cls._hw_encoder] if cls._hw_checked else self._hw_candidates()
+        for name in candidates:
+            if name is None:
+                continue
+            pipeline = HW_PIPELINES[name].format(location=path.replace('\\', '/'))
+            writer = cv2.VideoWriter(pipeline, cv2.CAP_GSTREAMER, 0, self.target_fps, size)
+            if writer.isOpened():
+                if not cls._hw_checked:
+                    log.info(f"🎞️ Grabación con encoder por hardware: {name}")
+                cls._hw_encoder, cls._hw_checked = name, True
+                return writer
+            writer.release()
+        if not cls._hw_checked:
+            log.info("🎞️ Sin encoder por hardware, grabando con mp4v (CPU)")
+            cls._hw_encoder, cls._hw_checked = None, True
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(path, fourcc, self.target_fps, size)
+
+    @staticmethod
+    def _hw_candidates() -> list:
+        if not _gstreamer_available():
+            return []
+        if _cuda_available():
+            return ['nvh264enc-cuda', 'nvh264enc', 'v4l2h264enc']
+        return ['v4l2h264enc']
+
     def stop_recording(self):
         for writer in [self.writer1, self.writer2]:
             if writer:
                 try:
                     writer.release()
                 except Exception as e:
-                    print(f"⚠️ Error cerrando writer: {e}")
+                    log.warning(f"⚠️ Error cerrando writer: {e}")
         self.writer1 = None
         self.writer2 = None
         self.writer_size1 = None
         self.writer_size2 = None
+        self._shape1 = None
+        self._shape2 = None
+        self._resize1 = False
+        self._resize2 = False
         self.recording = False
         self.record_with_detections = False
-        print("⏹️ Grabación detenida")
+        log.info("⏹️ Grabación detenida")
+
+    def register_shape(self, writer_id: int, shape: tuple):
+        """Fija el shape de los frames del writer y si necesitan cv2.resize."""
+        shape = tuple(shape)
+        if writer_id == 1:
+            self._shape1 = shape
+            self._resize1 = (shape[1], shape[0]) != self.writer_size1
+        else:
+            self._shape2 = shape
+            self._resize2 = (shape[1], shape[0]) != self.writer_size2
 
     def write_frames(self, frame1: Any, frame2: Any, frame1_det: Any = None, frame2_det: Any = None):
         """
@@ -88,13 +202,18 @@ class VideoRecorder:
         """
         if not self.recording:
             return
+        use_det = self.record_with_detections
         if self.writer1 and frame1 is not None:
-            frame_to_write = frame1_det if (self.record_with_detections and frame1_det is not None) else frame1
-            if frame_to_write.shape[:2][::-1] != self.writer_size1:
+            frame_to_write = frame1_det if use_det and frame1_det is not None else frame1
+            if frame_to_write.shape != self._shape1:
+                self.register_shape(1, frame_to_write.shape)
+            if self._resize1:
                 frame_to_write = cv2.resize(frame_to_write, self.writer_size1)
             self.writer1.write(frame_to_write)
         if self.writer2 and frame2 is not None:
-            frame_to_write = frame2_det if (self.record_with_detections and frame2_det is not None) else frame2
-            if frame_to_write.shape[:2][::-1] != self.writer_size2:
+            frame_to_write = frame2_det if use_det and frame2_det is not None else frame2
+            if frame_to_write.shape != self._shape2:
+                self.register_shape(2, frame_to_write.shape)
+            if self._resize2:
                 frame_to_write = cv2.resize(frame_to_write, self.writer_size2)
             self.writer2.write(frame_to_write)
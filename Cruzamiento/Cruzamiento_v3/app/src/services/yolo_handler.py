@@ -14,6 +14,7 @@ Objetivos:
 
 import os
 import sys
+import shutil
 import logging
 from typing import Optional, Tuple, List
 
@@ -42,6 +43,10 @@ except ImportError:
 
 log = logging.getLogger("YOLOModelHandler")
 
+# Imágenes usadas para calibrar el engine INT8
+INT8_CALIB_MIN_IMAGES = 50
+INT8_CALIB_MAX_IMAGES = 500
+
 
 class YOLOModelHandler:
     """
@@ -53,10 +58,22 @@ class YOLOModelHandler:
         self.model: Optional["YOLO"] = None
         self.model_path: Optional[str] = None
 
+    @property
+    def supports_batch(self) -> bool:
+        """
+        True si el modelo cargado acepta lotes de varias imágenes. Los engine
+        TensorRT y modelos OpenVINO se exportan con batch=1 fijo.
+        """
+        return bool(self.model_path) and self.model_path.endswith('.pt')
+
     # ------------------------------------------------------------------
     # API pública principal
     # ------------------------------------------------------------------
-    def load_model(self, explicit_path: Optional[str] = None) -> Tuple[bool, str]:
+    def load_model(self, explicit_path: Optional[str] = None,
+                   use_tensorrt: bool = False, imgsz: int = 640,
+                   precision: str = "fp16",
+                   calibration_dir: Optional[str] = None,
+                   use_openvino: bool = False) -> Tuple[bool, str]:
         """
         Carga el modelo YOLO.
 
@@ -66,6 +83,18 @@ class YOLOModelHandler:
             Ruta recibida desde la configuración (CamConfig.model_path) u otro lugar.
             Puede ser absoluta o relativa. Si es None o no existe, se intentará
             encontrar el mejor modelo disponible en la carpeta `models/`.
+        use_tensorrt : bool
+            Si es True y hay CUDA, carga (o exporta la primera vez) un engine
+            TensorRT junto al `.pt`. Si falla, se usa el `.pt`.
+        imgsz : int
+            Tamaño de entrada con el que se exporta el engine.
+        precision : str
+            Precisión del engine: "fp32", "fp16" o "int8".
+        calibration_dir : str | None
+            Carpeta con JPGs de la línea para calibrar INT8 (p.ej. `detecciones/calibracion/`).
+        use_openvino : bool
+            Si es True y no hay CUDA, carga (o exporta la primera vez) un modelo
+            OpenVINO INT8 junto al `.pt`. Si falla, se usa el `.pt`.
 
         Returns
         -------
@@ -132,12 +161,42 @@ class YOLOModelHandler:
             device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
             device_name = torch.cuda.get_device_name(0) if device == 'cuda:0' else 'CPU'
             log.info(f"🖥️ Dispositivo de inferencia seleccionado: {device} ({device_name})")
+            if device != 'cpu':
+                self._configure_cuda_backends(torch)
         except ImportError:
             device = 'cpu'
             log.warning("⚠️ Torch no importable para chequear CUDA, usando CPU")
 
         for path in candidate_paths:
             try:
+                if use_tensorrt and device != 'cpu' and path.endswith('.pt'):
+                    engine_path = self._get_tensorrt_engine(path, imgsz, precision, calibration_dir)
+                    if engine_path:
+                        try:
+                            model = YOLO(engine_path, task='detect')  # type: ignore[call-arg]
+                            self.model = model
+                            self.model_path = engine_path
+                            msg = (f"Engine TensorRT cargado desde '{engine_path}'. "
+                                   f"{self._describe_model(model)}")
+                            log.info(msg)
+                            return True, msg
+                        except Exception as e:
+                            log.warning(f"No se pudo cargar el engine TensorRT, usando .pt: {e}")
+
+                if use_openvino and device == 'cpu' and path.endswith('.pt'):
+                    ov_path = self._get_openvino_model(path, imgsz, calibration_dir)
+                    if ov_path:
+                        try:
+                            model = YOLO(ov_path, task='detect')  # type: ignore[call-arg]
+                            self.model = model
+                            self.model_path = ov_path
+                            msg = (f"Modelo OpenVINO INT8 cargado desde '{ov_path}'. "
+                                   f"{self._describe_model(model)}")
+                            log.info(msg)
+                            return True, msg
+                        except Exception as e:
+                            log.warning(f"No se pudo cargar el modelo OpenVINO, usando .pt: {e}")
+
                 log.info(f"Intentando cargar modelo YOLO desde: {path}")
                 model = YOLO(path)  # type: ignore[call-arg]
                 
@@ -177,6 +236,184 @@ class YOLOModelHandler:
         # Estamos en src/services/yolo_handler.py, subir 2 niveles a app/
         return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
+    @staticmethod
+    def _configure_cuda_backends(torch) -> None:
+        """
+        Habilita TF32 en matmul/convoluciones (Tensor Cores, Ampere+) y el
+        autotune de cuDNN, útil porque el ROI tiene tamaño fijo.
+        """
+        try:
+            torch.set_float32_matmul_precision('high')
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.backends.cudnn.benchmark = True
+            log.info("⚙️ CUDA: precisión matmul FP32 'high' (TF32), cuDNN benchmark activo")
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo configurar precisión CUDA: {e}")
+
+    def _get_tensorrt_engine(self, pt_path: str, imgsz: int, precision: str = "fp16",
+                             calibration_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Devuelve la ruta del engine TensorRT junto a pt_path (`.engine` para
+        FP16, `_int8.engine` / `_fp32.engine` para las otras precisiones),
+        exportándolo si no existe o es más viejo que el .pt (el INT8 también
+        si no se calibró con calibration_dir).
+        Devuelve None si la exportación falla (p.ej. sin tensorrt instalado).
+        Si INT8 no se puede calibrar se usa el engine FP16.
+        """
+        precision = (precision or "fp16").lower()
+        if precision not in ("fp32", "fp16", "int8"):
+            log.warning(f"Precisión TensorRT desconocida '{precision}', se usa fp16")
+            precision = "fp16"
+
+        suffix = ".engine" if precision == "fp16" else f"_{precision}.engine"
+        engine_path = os.path.splitext(pt_path)[0] + suffix
+        try:
+            if (os.path.getmtime(engine_path) >= os.path.getmtime(pt_path)
+                    and (precision != "int8" or self._calibrated_from(pt_path, calibration_dir))):
+                return engine_path
+        except OSError:
+            pass
+
+        if precision == "int8":
+            exported = self.calibrate_and_export_int8(pt_path, imgsz, calibration_dir)
+            if exported:
+                return exported
+            log.warning("No se pudo exportar el engine INT8, se usará FP16")
+            return self._get_tensorrt_engine(pt_path, imgsz, "fp16")
+
+        try:
+            log.info(f"Exportando engine TensorRT {precision.upper()} (imgsz={imgsz}) desde: {pt_path}")
+            exported = YOLO(pt_path).export(  # type: ignore[call-arg]
+                format="engine", half=(precision == "fp16"), imgsz=imgsz, dynamic=False,
+                batch=1, workspace=4, simplify=True,
+            )
+            # Ultralytics siempre escribe `<modelo>.engine`; las otras precisiones
+            # se renombran para no confundirse con el engine FP16
+            if exported and os.path.exists(exported):
+                if os.path.abspath(exported) != os.path.abspath(engine_path):
+                    os.replace(exported, engine_path)
+                return engine_path
+        except Exception as e:
+            log.warning(f"Exportación a TensorRT falló, se usará el .pt: {e}")
+        return None
+
+    def _get_openvino_model(self, pt_path: str, imgsz: int,
+                            calibration_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Devuelve la carpeta del modelo OpenVINO INT8 junto a pt_path
+        (`<modelo>_int8_openvino_model/`), exportándolo si no existe, es más
+        viejo que el .pt o no se calibró con calibration_dir. Para CPUs Intel
+        sin GPU NVIDIA.
+        Devuelve None si la exportación falla (p.ej. sin openvino instalado).
+        """
+        ov_path = os.path.splitext(pt_path)[0] + "_int8_openvino_model"
+        try:
+            if (os.path.getmtime(ov_path) >= os.path.getmtime(pt_path)
+                    and self._calibrated_from(pt_path, calibration_dir)):
+                return ov_path
+        except OSError:
+            pass
+        return self.calibrate_and_export_int8(pt_path, imgsz, calibration_dir, export_format="openvino")
+
+    @staticmethod
+    def _calibrated_from(pt_path: str, calibration_dir: Optional[str]) -> bool:
+        """
+        True si la última exportación INT8 de pt_path se calibró con imágenes
+        de calibration_dir (según la lista `<modelo>_int8_calib.txt`).
+        """
+        if not calibration_dir:
+            return True
+        list_path = os.path.splitext(pt_path)[0] + "_int8_calib.txt"
+        try:
+            with open(list_path, "r", encoding="utf-8") as f:
+                first = f.readline().strip()
+        except OSError:
+            return False
+        used_dir = os.path.normcase(os.path.dirname(first))
+        return used_dir == os.path.normcase(os.path.abspath(calibration_dir))
+
+    def calibrate_and_export_int8(self, pt_path: str, imgsz: int,
+                                  calibration_dir: Optional[str],
+                                  max_images: int = INT8_CALIB_MAX_IMAGES,
+                                  export_format: str = "engine") -> Optional[str]:
+        """
+        Exporta un engine TensorRT INT8 (`<modelo>_int8.engine`) calibrado con
+        imágenes reales de la línea: los recortes limpios del ROI que guarda
+        DetectionHandler en `detecciones/calibracion/` (hasta max_images, los
+        más recientes).
+        Con export_format="openvino" exporta en cambio un modelo OpenVINO INT8
+        (`<modelo>_int8_openvino_model/`) con las mismas imágenes.
+
+        Se arma un dataset YAML temporal cuyo split `val` es una lista de esas
+        imágenes; Ultralytics lo usa para la calibración (entropy calibrator).
+
+        Returns
+        -------
+        Ruta del engine/modelo o None si no hay imágenes suficientes o la exportación falla.
+        """
+        if not calibration_dir or not os.path.isdir(calibration_dir):
+            log.warning(f"Sin carpeta de calibración INT8: {calibration_dir}")
+            return None
+
+        images = [
+            os.path.join(calibration_dir, name) for name in os.listdir(calibration_dir)
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        ]
+        if len(images) < INT8_CALIB_MIN_IMAGES:
+            log.warning(f"Calibración INT8: {len(images)} imágenes en {calibration_dir}, "
+                        f"se necesitan al menos {INT8_CALIB_MIN_IMAGES}")
+            return None
+        images.sort(key=os.path.getmtime, reverse=True)
+        images = images[:max_images]
+
+        base = os.path.splitext(pt_path)[0]
+        list_path = base + "_int8_calib.txt"
+        yaml_path = base + "_int8_calib.yaml"
+        if export_format == "openvino":
+            target_path = base + "_int8_openvino_model"
+            export_kwargs = {}
+            engine_name = "OpenVINO"
+        else:
+            target_path = base + "_int8.engine"
+            export_kwargs = {"workspace": 4, "simplify": True}
+            engine_name = "TensorRT"
+        try:
+            model = YOLO(pt_path)  # type: ignore[call-arg]
+            names = model.names if isinstance(model.names, dict) else dict(enumerate(model.names))
+
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(os.path.abspath(p) for p in images))
+            with open(yaml_path, "w", encoding="utf-8") as f:
+                f.write(f"path: {os.path.dirname(os.path.abspath(list_path))}\n")
+                f.write(f"train: {os.path.abspath(list_path)}\n")
+                f.write(f"val: {os.path.abspath(list_path)}\n")
+                f.write("names:\n")
+                for idx, name in sorted(names.items()):
+                    f.write(f"  {idx}: '{name}'\n")
+
+            log.info(f"Exportando {engine_name} INT8 (imgsz={imgsz}, "
+                     f"{len(images)} imágenes de calibración) desde: {pt_path}")
+            exported = model.export(  # type: ignore[call-arg]
+                format=export_format, int8=True, data=yaml_path, imgsz=imgsz,
+                dynamic=False, batch=1, **export_kwargs,
+            )
+            if exported and os.path.exists(exported):
+                if os.path.abspath(exported) != os.path.abspath(target_path):
+                    if os.path.isdir(target_path):
+                        shutil.rmtree(target_path, ignore_errors=True)
+                    os.replace(exported, target_path)
+                return target_path
+        except Exception as e:
+            log.warning(f"Exportación {engine_name} INT8 falló: {e}")
+        finally:
+            for tmp in (list_path, yaml_path):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        return None
+
     def _resolve_model_path(self, path: str, base_dir: str, models_dir: str) -> Optional[str]:
         """
         Intenta resolver una ruta de modelo que puede ser:
@@ -316,8 +316,8 @@ class DetectionHistoryWindow(QDialog):
         """Carga el historial de detecciones y consolida por ID único."""
         try:
             # Obtener historial de ambas cámaras
-            history_cam1 = self.detection_handler.detection_history.get(1, [])
-            history_cam2 = self.detection_handler.detection_history.get(2, [])
+            history_cam1 = self.detection_handler.get_history_snapshot(1)
+            history_cam2 = self.detection_handler.get_history_snapshot(2)
             
             # Crear diccionario consolidado por track_id
             consolidated_pieces = {}
@@ -600,9 +600,9 @@ class DetectionHistoryWindow(QDialog):
     def clear_history(self):
         """Limpia el historial de detecciones."""
         try:
-            # Limpiar historial en el detection handler
-            self.detection_handler.detection_history[1].clear()
-            self.detection_handler.detection_history[2].clear()
+            # Limpiar historial en el detection handler (incluye los totales
+            # de entradas ya descartadas del deque)
+            self.detection_handler.clear_detection_history()
             
             # Resetear tracking
             self.detection_handler.reset_tracking()
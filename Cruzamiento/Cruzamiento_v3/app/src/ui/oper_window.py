@@ -68,6 +68,11 @@ class OperWindow(QWidget):
         
         # Últimos frames
         self.last_frame1_det = None
+        self.last_frame2_det = None
+        self.last_seq1 = 0  # Secuencia del último frame de Cam1 procesado
+        self.last_seq2 = 0  # Secuencia del último frame de Cam2 enviado al worker
+        self.last_result_seq1 = 0  # Secuencias del último resultado del worker mostrado
+        self.last_result_seq2 = 0
 
         # --- 3. Construir UI ---
         self._init_ui()
@@ -359,6 +364,7 @@ class OperWindow(QWidget):
         # Detection Handler
         self.detection_handler.config = self.cfg
         self.detection_handler.plc_service = self.plc_service
+        self.detection_handler.invalidate_config_caches()
         
         # Re-inicializar componentes internos del DetectionHandler
         # (BrokenPieceAnalyzer se crea en __init__, necesitamos actualizarlo)
@@ -394,18 +400,35 @@ class OperWindow(QWidget):
         if frame1 is None and frame2 is None:
             return
 
-        # 2. Procesar (solo frame 1 para visualización principal, o ambos si necesario)
-        # OperWindow muestra Cam1 principalmente, pero DetectionHandler puede procesar ambos.
-        # Por eficiencia, si solo mostramos Cam1, procesamos Cam1 para display.
-        # Pero DetectionHandler puede que quiera procesar Cam2 para logs?
-        # Procesaremos Cam1 para mostrar.
-        
-        info = {}
-        if frame1 is not None:
-            # Procesar frame
-            frame1_display, info = self.detection_handler.process_frame(
-                frame1.copy(), 1, self.detection_handler.is_detecting()
-            )
+        # 2. Procesar Cam1 (la que se muestra), solo cuando la cámara publicó
+        # un frame nuevo: si el timer corre más rápido que la cámara se evita
+        # repetir la inferencia. Con detección activa la inferencia corre en el
+        # worker del DetectionHandler: aquí solo se encola el frame y se
+        # muestra el último resultado publicado, así la GUI no espera al modelo.
+        info = None
+        detecting = self.detection_handler.is_detecting()
+        frame1_display = None
+        # Cam1 se dibuja si la ventana está a la vista o se graba con
+        # detecciones; minimizada y sin grabar solo se cuenta
+        recording_det = self.video_recorder.recording and self.video_recorder.record_with_detections
+        self.detection_handler.set_draw_enabled(
+            1, recording_det or (self.isVisible() and not self.isMinimized())
+        )
+        new1 = self.camera_handler.get_frame_if_new(1, self.last_seq1)
+        if new1 is not None:
+            frame1, self.last_seq1 = new1
+            if detecting:
+                self.detection_handler.submit_frame(frame1.copy(), 1)
+            else:
+                # Sin detección solo se dibuja el ROI (no hay inferencia)
+                frame1_display, info = self.detection_handler.process_frame(frame1.copy(), 1, False)
+        
+        if detecting:
+            result1 = self.detection_handler.get_result_if_new(1, self.last_result_seq1)
+            if result1 is not None:
+                frame1_display, info, self.last_result_seq1 = result1
+        
+        if frame1_display is not None:
             self.last_frame1_det = frame1_display
             
             # Mostrar en GUI
@@ -413,6 +436,8 @@ class OperWindow(QWidget):
             
             # Actualizar info panel
             self._update_info_panel(info)
+        elif frame1 is None:
+            info = {}
 
         # 3. Grabar si activo
         if self.video_recorder.recording:
@@ -420,13 +445,24 @@ class OperWindow(QWidget):
             # Si frame2 existe, deberíamos procesarlo también si queremos grabar con detecciones
             frame2_det = None
             if frame2 is not None and self.video_recorder.record_with_detections:
-                 frame2_det, _ = self.detection_handler.process_frame(
-                     frame2.copy(), 2, self.detection_handler.is_detecting()
-                 )
+                if detecting:
+                    # Cam2 va al mismo worker (se procesa en lote con Cam1)
+                    new2 = self.camera_handler.get_frame_if_new(2, self.last_seq2)
+                    if new2 is not None:
+                        self.last_seq2 = new2[1]
+                        self.detection_handler.submit_frame(new2[0].copy(), 2)
+                    result2 = self.detection_handler.get_result_if_new(2, self.last_result_seq2)
+                    if result2 is not None:
+                        self.last_frame2_det, _, self.last_result_seq2 = result2
+                    frame2_det = self.last_frame2_det
+                else:
+                    frame2_det, _ = self.detection_handler.process_frame(frame2.copy(), 2, False)
             self.video_recorder.write_frames(frame1, frame2, self.last_frame1_det, frame2_det)
 
-        # 3.5 Actualizar estado operador (para lógica PLC)
-        self.is_operator_detected = info.get('operator_detected', False)
+        # 3.5 Actualizar estado operador (para lógica PLC); sin frame nuevo se
+        # mantiene el estado del último frame procesado
+        if info is not None:
+            self.is_operator_detected = info.get('operator_detected', False)
         
         # 4. Actualizar estado PLC
         self._update_plc_status_logic()
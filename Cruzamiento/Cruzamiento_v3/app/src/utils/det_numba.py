@@ -0,0 +1,196 @@
+"""
+Filtros de cajas YOLO compilados con numba.
+
+Clasifica todas las cajas de un frame en una sola llamada (umbral por clase,
+pertenencia al ROI rectangular y heurística de pieza quebrada) y filtra los
+duplicados del conteo contra el buffer circular de centros recientes. Si
+numba no está instalado se usan versiones equivalentes con NumPy.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _classify_boxes_py(xyxy, confs, clss, min_confs, operator_cls,
+                       roi_x1, roi_y1, roi_x2, roi_y2):
+    """
+    Clasifica las cajas de un frame.
+
+    Args:
+        xyxy: Array (N, 4) int32 de cajas en coordenadas del frame
+        confs: Array (N,) float32 de confianzas
+        clss: Array (N,) int32 de ids de clase
+        min_confs: Array (N,) float32 con el umbral de la clase de cada caja
+        operator_cls: Id de la clase operador (-1 si el modelo no la tiene)
+        roi_x1, roi_y1, roi_x2, roi_y2: ROI rectangular
+
+    Returns:
+        Tupla (keep, inside, broken) de arrays booleanos (N,). El operador
+        siempre cuenta como dentro del ROI y nunca como quebrado.
+    """
+    n = xyxy.shape[0]
+    keep = np.zeros(n, dtype=np.bool_)
+    inside = np.zeros(n, dtype=np.bool_)
+    broken = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        if confs[i] < min_confs[i]:
+            continue
+        keep[i] = True
+        if clss[i] == operator_cls:
+            inside[i] = True
+            continue
+        x1, y1, x2, y2 = xyxy[i, 0], xyxy[i, 1], xyxy[i, 2], xyxy[i, 3]
+        cx = (x1 + x2) // 2
+        cy = (y1 + y2) // 2
+        inside[i] = roi_x1 <= cx <= roi_x2 and roi_y1 <= cy <= roi_y2
+        w = x2 - x1
+        h = y2 - y1
+        aspect = w / max(h, 1)
+        broken[i] = aspect > 3.0 or aspect < 0.3 or w < 20 or h < 20
+    return keep, inside, broken
+
+
+def _classify_boxes_np(xyxy, confs, clss, min_confs, operator_cls,
+                       roi_x1, roi_y1, roi_x2, roi_y2):
+    """Versión NumPy vectorizada de _classify_boxes_py (sin numba)."""
+    keep = confs >= min_confs
+    is_operator = clss == operator_cls
+    cx = (xyxy[:, 0] + xyxy[:, 2]) // 2
+    cy = (xyxy[:, 1] + xyxy[:, 3]) // 2
+    in_rect = (roi_x1 <= cx) & (cx <= roi_x2) & (roi_y1 <= cy) & (cy <= roi_y2)
+    w = xyxy[:, 2] - xyxy[:, 0]
+    h = xyxy[:, 3] - xyxy[:, 1]
+    aspect = w / np.maximum(h, 1)
+    shape_broken = (aspect > 3.0) | (aspect < 0.3) | (w < 20) | (h < 20)
+    inside = keep & (is_operator | in_rect)
+    broken = keep & ~is_operator & shape_broken
+    return keep, inside, broken
+
+
+def _filter_duplicates_py(centers, cls_ids, ring_centers, ring_cls, ring_t, head,
+                          now_t, window_s, limit_sq):
+    """
+    Marca qué objetos son nuevos para el conteo y agrega los aceptados al
+    buffer circular (modificado in situ).
+
+    Un objeto es duplicado si hay otro de la misma clase a distancia al
+    cuadrado menor que limit_sq entre los centros del buffer de los últimos
+    window_s segundos o entre los ya aceptados del mismo frame.
+
+    Args:
+        centers: Array (N, 2) int32 de centros
+        cls_ids: Array (N,) int32 de clases
+        ring_centers: Array (K, 2) int32 del buffer circular
+        ring_cls: Array (K,) int32 de clases del buffer (-1 = vacío)
+        ring_t: Array (K,) float64 de tiempos monotónicos del buffer
+        head: Próxima posición a escribir en el buffer
+        now_t: Tiempo monotónico del frame
+        window_s: Ventana de duplicados en segundos
+        limit_sq: Radio de duplicado al cuadrado (píxeles)
+
+    Returns:
+        Tupla (is_new, head): máscara booleana (N,) y nueva posición del buffer
+    """
+    n = centers.shape[0]
+    k = ring_t.shape[0]
+    is_new = np.ones(n, dtype=np.bool_)
+    accepted = np.empty(n, dtype=np.int64)
+    n_acc = 0
+    for i in range(n):
+        cx = centers[i, 0]
+        cy = centers[i, 1]
+        c = cls_ids[i]
+        dup = False
+        for j in range(k):
+            if ring_cls[j] == c and now_t - ring_t[j] < window_s:
+                dx = cx - ring_centers[j, 0]
+                dy = cy - ring_centers[j, 1]
+                if dx * dx + dy * dy < limit_sq:
+                    dup = True
+                    break
+        if not dup:
+            for a in range(n_acc):
+                j = accepted[a]
+                if cls_ids[j] == c:
+                    dx = cx - centers[j, 0]
+                    dy = cy - centers[j, 1]
+                    if dx * dx + dy * dy < limit_sq:
+                        dup = True
+                        break
+        if dup:
+            is_new[i] = False
+        else:
+            accepted[n_acc] = i
+            n_acc += 1
+    for a in range(n_acc):
+        i = accepted[a]
+        ring_centers[head, 0] = centers[i, 0]
+        ring_centers[head, 1] = centers[i, 1]
+        ring_cls[head] = cls_ids[i]
+        ring_t[head] = now_t
+        head = (head + 1) % k
+    return is_new, head
+
+
+def _filter_duplicates_np(centers, cls_ids, ring_centers, ring_cls, ring_t, head,
+                          now_t, window_s, limit_sq):
+    """Versión NumPy de _filter_duplicates_py (sin numba)."""
+    # Contra el historial reciente: solo las entradas dentro de la ventana,
+    # distancias al cuadrado (N x K) en un solo paso
+    fresh = np.flatnonzero((now_t - ring_t) < window_s)
+    if fresh.size:
+        d2 = ((centers[:, None, :] - ring_centers[fresh][None, :, :]) ** 2).sum(-1)
+        dup_hist = ((d2 < limit_sq) & (cls_ids[:, None] == ring_cls[fresh][None, :])).any(axis=1)
+    else:
+        dup_hist = np.zeros(len(centers), dtype=bool)
+
+    # Dentro del frame: un objeto es duplicado de uno anterior ya aceptado
+    close = (((centers[:, None, :] - centers[None, :, :]) ** 2).sum(-1) < limit_sq) \
+        & (cls_ids[:, None] == cls_ids[None, :])
+    is_new = ~dup_hist
+    accepted = []
+    for j in np.flatnonzero(is_new).tolist():
+        if accepted and close[j, accepted].any():
+            is_new[j] = False
+        else:
+            accepted.append(j)
+
+    # Guardar los aceptados en el buffer circular
+    for j in accepted:
+        ring_centers[head] = centers[j]
+        ring_cls[head] = cls_ids[j]
+        ring_t[head] = now_t
+        head = (head + 1) % len(ring_t)
+    return is_new, head
+
+
+if NUMBA_AVAILABLE:
+    classify_boxes = njit(cache=True)(_classify_boxes_py)
+    filter_duplicates = njit(cache=True)(_filter_duplicates_py)
+else:
+    classify_boxes = _classify_boxes_np
+    filter_duplicates = _filter_duplicates_np
+
+
+def warmup():
+    """Compila los kernels con llamadas de 1 elemento (evita el JIT en el primer frame)."""
+    classify_boxes(
+        np.zeros((1, 4), dtype=np.int32),
+        np.zeros(1, dtype=np.float32),
+        np.zeros(1, dtype=np.int32),
+        np.ones(1, dtype=np.float32),
+        -1, 0, 0, 0, 0,
+    )
+    filter_duplicates(
+        np.zeros((1, 2), dtype=np.int32),
+        np.zeros(1, dtype=np.int32),
+        np.zeros((1, 2), dtype=np.int32),
+        np.full(1, -1, dtype=np.int32),
+        np.full(1, -np.inf),
+        0, 0.0, 1.0, 1,
+    )
@@ -0,0 +1,43 @@
+"""Huella de las entradas del build (build_exe._compute_fingerprint)."""
+
+import os
+
+import pytest
+
+pytest.importorskip("PyInstaller")
+
+import build_exe
+
+
+@pytest.fixture
+def build_tree(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "main.py").write_text("print('hola')\n")
+    (tmp_path / "config_camera.json").write_text("{}")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_fingerprint_is_stable(build_tree):
+    assert build_exe._compute_fingerprint() == build_exe._compute_fingerprint()
+
+
+def test_fingerprint_changes_with_sources(build_tree):
+    before = build_exe._compute_fingerprint()
+    (build_tree / "src" / "nuevo.py").write_text("x = 1\n")
+    assert build_exe._compute_fingerprint() != before
+
+
+def test_fingerprint_changes_with_mtime(build_tree):
+    before = build_exe._compute_fingerprint()
+    main = build_tree / "src" / "main.py"
+    st = os.stat(main)
+    os.utime(main, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert build_exe._compute_fingerprint() != before
+
+
+def test_fingerprint_ignores_pycache(build_tree):
+    before = build_exe._compute_fingerprint()
+    (build_tree / "src" / "__pycache__").mkdir()
+    (build_tree / "src" / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\0")
+    assert build_exe._compute_fingerprint() == before
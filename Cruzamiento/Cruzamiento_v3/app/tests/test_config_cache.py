@@ -0,0 +1,45 @@
+"""Cache de CamConfig.load: clones independientes e invalidación al guardar."""
+
+import os
+
+from src.config import CamConfig
+
+
+def _saved_config(tmp_path):
+    path = str(tmp_path / "config_camera.json")
+    cfg = CamConfig()
+    cfg.roi_points_cam1 = [[1, 2], [3, 4], [5, 6]]
+    cfg.save(path)
+    return path
+
+
+def test_load_returns_independent_clones(tmp_path):
+    path = _saved_config(tmp_path)
+    first = CamConfig.load(path)
+    first.roi_points_cam1.append([9, 9])
+    first.min_confidence = 0.11
+    second = CamConfig.load(path)
+    assert second is not first
+    assert second.roi_points_cam1 == [[1, 2], [3, 4], [5, 6]]
+    assert second.min_confidence != 0.11
+
+
+def test_save_invalidates_cache_even_with_same_mtime(tmp_path):
+    path = _saved_config(tmp_path)
+    cfg = CamConfig.load(path)
+    mtime = os.stat(path).st_mtime_ns
+    cfg.min_confidence = 0.33
+    cfg.save(path)
+    os.utime(path, ns=(mtime, mtime))
+    assert CamConfig.load(path).min_confidence == 0.33
+
+
+def test_load_rereads_after_external_change(tmp_path):
+    path = _saved_config(tmp_path)
+    CamConfig.load(path)
+    other = CamConfig()
+    other.min_confidence = 0.44
+    other.save(path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert CamConfig.load(path).min_confidence == 0.44
@@ -0,0 +1,87 @@
+"""Paridad entre los kernels de det_numba (numba / Python puro) y la versión NumPy."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.utils import det_numba
+
+
+def _random_boxes(rng, n):
+    x1 = rng.integers(0, 600, n)
+    y1 = rng.integers(0, 400, n)
+    w = rng.integers(1, 200, n)
+    h = rng.integers(1, 200, n)
+    xyxy = np.stack([x1, y1, x1 + w, y1 + h], axis=1).astype(np.int32)
+    confs = rng.random(n).astype(np.float32)
+    clss = rng.integers(0, 4, n).astype(np.int32)
+    min_confs = rng.choice(np.array([0.2, 0.5, 0.7], dtype=np.float32), n)
+    return xyxy, confs, clss, min_confs
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_classify_boxes_matches_numpy(seed):
+    rng = np.random.default_rng(seed)
+    args = (*_random_boxes(rng, 64), 3, 100, 50, 500, 350)
+    expected = det_numba._classify_boxes_np(*args)
+    for impl in (det_numba._classify_boxes_py, det_numba.classify_boxes):
+        for got, want in zip(impl(*args), expected):
+            np.testing.assert_array_equal(got, want)
+
+
+def test_classify_boxes_operator_always_inside_never_broken():
+    xyxy = np.array([[0, 0, 5, 5]], dtype=np.int32)  # Fuera del ROI y diminuta
+    args = (xyxy, np.array([0.9], np.float32), np.array([7], np.int32),
+            np.array([0.5], np.float32), 7, 100, 100, 200, 200)
+    keep, inside, broken = det_numba.classify_boxes(*args)
+    assert keep[0] and inside[0] and not broken[0]
+
+
+def _empty_ring(k):
+    return (np.zeros((k, 2), np.int32), np.full(k, -1, np.int32), np.full(k, -np.inf))
+
+
+def _run_frames(impl, frames, k=8):
+    ring_centers, ring_cls, ring_t = _empty_ring(k)
+    head = 0
+    outputs = []
+    for now_t, centers, cls_ids in frames:
+        is_new, head = impl(centers, cls_ids, ring_centers, ring_cls, ring_t, head,
+                            now_t, 1.0, 30 * 30)
+        outputs.append(np.asarray(is_new).copy())
+    return outputs, head, ring_centers, ring_cls
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_filter_duplicates_matches_numpy(seed):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(12):
+        n = int(rng.integers(0, 6))
+        centers = rng.integers(0, 120, (n, 2)).astype(np.int32)
+        cls_ids = rng.integers(0, 2, n).astype(np.int32)
+        frames.append((i * 0.3, centers, cls_ids))
+    expected = _run_frames(det_numba._filter_duplicates_np, frames)
+    for impl in (det_numba._filter_duplicates_py, det_numba.filter_duplicates):
+        got = _run_frames(impl, frames)
+        for a, b in zip(got[0], expected[0]):
+            np.testing.assert_array_equal(a, b)
+        assert got[1] == expected[1]
+        np.testing.assert_array_equal(got[2], expected[2])
+        np.testing.assert_array_equal(got[3], expected[3])
+
+
+def test_filter_duplicates_window_and_class():
+    centers = np.array([[10, 10]], np.int32)
+    frames = [
+        (0.0, centers, np.array([0], np.int32)),
+        (0.5, centers, np.array([0], np.int32)),   # Duplicado dentro de la ventana
+        (0.6, centers, np.array([1], np.int32)),   # Otra clase: nuevo
+        (2.0, centers, np.array([0], np.int32)),   # Fuera de la ventana: nuevo
+    ]
+    outputs, *_ = _run_frames(det_numba.filter_duplicates, frames)
+    assert [bool(o[0]) for o in outputs] == [True, False, True, True]
+
+
+def test_warmup_runs():
+    det_numba.warmup()
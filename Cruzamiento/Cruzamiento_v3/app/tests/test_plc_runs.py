@@ -0,0 +1,34 @@
+"""Agrupación de registros Modbus en tramos contiguos (PLCService y plc_monitor)."""
+
+import pytest
+
+pytest.importorskip("pymodbus")
+
+from src.services import plc_monitor
+from src.services.plc_service import PLCService
+
+
+def test_contiguous_runs_groups_consecutive_addresses():
+    writes = {12: 0, 10: 1, 11: 2, 20: 3}
+    assert PLCService._contiguous_runs(writes) == [(10, [1, 2, 0]), (20, [3])]
+
+
+def test_contiguous_runs_splits_at_fc16_limit():
+    limit = PLCService.MAX_REGS_PER_WRITE
+    writes = {addr: 1 for addr in range(limit + 5)}
+    runs = PLCService._contiguous_runs(writes)
+    assert [(start, len(values)) for start, values in runs] == [(0, limit), (limit, 5)]
+
+
+def test_contiguous_runs_empty():
+    assert PLCService._contiguous_runs({}) == []
+
+
+def test_group_register_runs_merges_within_window():
+    assert plc_monitor.group_register_runs([22003, 10204, 22001, 10203, 22003]) == [
+        (10203, 2), (22001, 3)
+    ]
+
+
+def test_group_register_runs_respects_max_count():
+    assert plc_monitor.group_register_runs([0, 4, 5, 9], max_count=5) == [(0, 5), (5, 5)]